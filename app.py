@@ -1,4 +1,4 @@
-from typing import Dict, List, Optional, Tuple
+from typing import Dict, List, Optional
 import os
 import streamlit as st
 import psycopg2
@@ -9,13 +9,16 @@ from pdf2image import convert_from_path
 import tempfile
 from pathlib import Path
 import uuid
-import json
 import requests
 import base64
-from io import BytesIO
 from openai import OpenAI
 from PIL import Image
 
+# schemas.py is a copy of the PDF processor service's structured-output schemas
+# (pdf-processor-service/sam/pdf-processor-lambda/hello_world/schemas.py); its
+# unit tests keep the two identical
+from schemas import EXTRACTION_RESPONSE_FORMAT, SlideExtraction, parse_model, reask_message
+
 # Load environment variables
 load_dotenv()
 
@@ -31,6 +34,7 @@ WEBHOOK_URL = "https://sciwell.app.n8n.cloud/webhook-test/fe0534c3-345f-421f-b34
 # OpenAI Configuration
 openai_client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
 
+
 def init_connection() -> psycopg2.extensions.connection:
     """Initialize database connection.
     
@@ -113,48 +117,64 @@ def extract_slide_info(image_path: str) -> Dict:
         image_data = base64.b64encode(image_file.read()).decode('utf-8')
     
     try:
-        response = openai_client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[
-                {
-                    "role": "system",
-                    "content": [
+        messages = [
+            {
+                "role": "system",
+                "content": [
+                    {
+                        "type": "text",
+                        "text": """Extract information from a slide image and format it as a structured JSON object.
+                        Please ensure the content field contains all visible text from the slide.
+                        If there are bullet points, include them with proper formatting.
+                        
+                        Required format:
                         {
-                            "type": "text",
-                            "text": """Extract information from a slide image and format it as a structured JSON object.
-                            Please ensure the content field contains all visible text from the slide.
-                            If there are bullet points, include them with proper formatting.
-                            
-                            Required format:
-                            {
-                                "title": "The main title or heading of the slide",
-                                "content": "All visible text content from the slide, including bullet points and paragraphs",
-                                "type": "regular",
-                                "links": []
-                            }
-                            """
+                            "title": "The main title or heading of the slide",
+                            "content": "All visible text content from the slide, including bullet points and paragraphs",
+                            "type": "regular",
+                            "links": []
                         }
-                    ]
-                },
-                {
-                    "role": "user",
-                    "content": [
-                        {
-                            "type": "image_url",
-                            "image_url": {
-                                "url": f"data:image/jpeg;base64,{image_data}"
-                            }
+                        """
+                    }
+                ]
+            },
+            {
+                "role": "user",
+                "content": [
+                    {
+                        "type": "image_url",
+                        "image_url": {
+                            "url": f"data:image/jpeg;base64,{image_data}"
                         }
-                    ]
-                }
-            ],
-            response_format={"type": "json_object"},
+                    }
+                ]
+            }
+        ]
+        response = openai_client.chat.completions.create(
+            model="gpt-4o-mini",
+            messages=messages,
+            response_format=EXTRACTION_RESPONSE_FORMAT,
             temperature=0,  # Lower temperature for more consistent output
             max_completion_tokens=2048
         )
         
-        # Parse the response
-        extracted_info = json.loads(response.choices[0].message.content)
+        # Validate the response; re-ask once only if it does not match the schema
+        reply = response.choices[0].message.content
+        parsed, diags = parse_model(SlideExtraction, reply)
+        if parsed is None:
+            messages.append({"role": "assistant", "content": reply or ""})
+            messages.append(reask_message(diags["error"]))
+            response = openai_client.chat.completions.create(
+                model="gpt-4o-mini",
+                messages=messages,
+                response_format=EXTRACTION_RESPONSE_FORMAT,
+                temperature=0,
+                max_completion_tokens=2048
+            )
+            parsed, diags = parse_model(SlideExtraction, response.choices[0].message.content)
+            if parsed is None:
+                raise ValueError(f"Invalid extraction reply: {diags['error']}")
+        extracted_info = parsed.model_dump()
         
         # Debug log
         st.write(f"Extracted content: {extracted_info.get('content', '')}")
@@ -472,53 +492,6 @@ def delete_existing_slides(module_id: int, pdf_name: str) -> None:
     finally:
         conn.close()
 
-def clean_content(content: any) -> str:
-    """Clean and format content to ensure it's a string.
-    
-    Args:
-        content: Content to clean, can be string, dict, or any other type
-        
-    Returns:
-        str: Cleaned content as a string
-    """
-    try:
-        # If it's already a string, just clean it
-        if isinstance(content, str):
-            # Remove quotes and brackets
-            cleaned = content.strip('{}[]"\'')
-            # Remove text markers
-            cleaned = cleaned.replace("'text': ", "").replace('"text": ', "")
-            # Remove type markers
-            cleaned = cleaned.replace("'type': ", "").replace('"type": ', "")
-            # Remove resource markers
-            cleaned = cleaned.replace("'resource'", "").replace('"resource"', "")
-            # Clean up multiple spaces and newlines
-            cleaned = ' '.join(cleaned.split())
-            return cleaned
-            
-        # If it's a dictionary
-        if isinstance(content, dict):
-            # Try to get the text content directly
-            if "text" in content:
-                return clean_content(content["text"])
-            # Or try content field
-            if "content" in content:
-                return clean_content(content["content"])
-            # Convert dict to string and clean
-            return clean_content(str(content))
-            
-        # If it's a list, join the items
-        if isinstance(content, list):
-            # Clean each item and join
-            cleaned_items = [clean_content(item) for item in content if item]
-            return " ".join(cleaned_items)
-            
-        # For any other type, convert to string and clean
-        return clean_content(str(content))
-    except Exception as e:
-        st.error(f"Error cleaning content: {str(e)}")
-        return ""
-
 def process_pdf(file_path: str, course_id: int, module_id: int, original_filename: str, module_title: str, course_title: str) -> List[str]:
     """Process PDF file and upload pages as images to S3.
     
@@ -568,8 +541,7 @@ def process_pdf(file_path: str, course_id: int, module_id: int, original_filenam
             # Extract information from the slide
             extracted_info = extract_slide_info(temp_path)
             
-            # Clean up the content text
-            content_text = clean_content(extracted_info.get("content", ""))
+            content_text = extracted_info["content"]
             
             # Define S3 path with simpler structure
             s3_path = f"{pdf_name}/{filename}"
@@ -592,7 +564,7 @@ def process_pdf(file_path: str, course_id: int, module_id: int, original_filenam
                 
                 # Store slide information with only the text content
                 slide_id = store_slide(
-                    title=clean_content(extracted_info.get("title", f"Slide {i}")),
+                    title=extracted_info["title"] or f"Slide {i}",
                     content=content_text,
                     media_id=media_id,
                     image_url=url,
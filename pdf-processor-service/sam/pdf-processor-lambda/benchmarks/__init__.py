@@ -0,0 +1,7 @@
+import os
+import sys
+
+# Same layout as the Lambda bundle: hello_world/ modules are top-level imports.
+_HELLO_WORLD = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "hello_world")
+if _HELLO_WORLD not in sys.path:
+    sys.path.insert(0, _HELLO_WORLD)
@@ -0,0 +1,105 @@
+"""Cold-start profiler for the Lambda handler.
+
+Starts a fresh interpreter with ``-X importtime``, imports ``app`` (the
+Mangum handler module) and serves one ``GET /health`` through the handler,
+then reports the slowest imports and the total against a budget.
+
+    python -m benchmarks.coldstart
+    python -m benchmarks.coldstart --budget-ms 600 --top 15
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+from typing import Any, Dict, List, Optional
+
+HELLO_WORLD = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "hello_world")
+
+# Modules /health must not load; they belong to the routes that use them
+HEAVY_MODULES = ("fitz", "PIL", "openai", "boto3", "botocore", "numpy")
+
+DEFAULT_BUDGET_MS = 800.0
+
+_PROBE = r"""
+import json, sys, time
+t0 = time.perf_counter()
+import app
+t1 = time.perf_counter()
+event = {
+    "resource": "/{proxy+}", "path": "/health", "httpMethod": "GET",
+    "headers": {"Host": "localhost"}, "multiValueHeaders": {}, "queryStringParameters": None,
+    "multiValueQueryStringParameters": None, "pathParameters": {"proxy": "health"},
+    "stageVariables": None, "body": None, "isBase64Encoded": False,
+    "requestContext": {"resourcePath": "/{proxy+}", "httpMethod": "GET", "path": "/Prod/health",
+                       "stage": "Prod", "requestId": "coldstart", "identity": {"sourceIp": "127.0.0.1"}},
+}
+resp = app.handler(event, None)
+t2 = time.perf_counter()
+heavy = sorted(m for m in %r if m in sys.modules)
+print(json.dumps({"import_ms": (t1 - t0) * 1000, "first_health_ms": (t2 - t1) * 1000,
+                  "status": resp["statusCode"], "heavy_loaded": heavy}))
+"""
+
+
+def parse_importtime(stderr: str) -> List[Dict[str, Any]]:
+    """Parse ``-X importtime`` lines into {module, self_us, cumulative_us, depth}."""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        try:
+            self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+            row = {"module": name.strip(), "self_us": int(self_us), "cumulative_us": int(cumulative_us)}
+        except ValueError:
+            continue
+        # one leading space, then two per nesting level
+        row["depth"] = (len(name) - len(name.lstrip(" ")) - 1) // 2
+        rows.append(row)
+    return rows
+
+
+def profile(env: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
+    run_env = dict(os.environ, **(env or {}))
+    run_env.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+    run_env["LOG_LEVEL"] = "WARNING"
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", _PROBE % (HEAVY_MODULES,)],
+        cwd=HELLO_WORLD,
+        env=run_env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    result = json.loads(proc.stdout.strip().splitlines()[-1])
+    result["imports"] = parse_importtime(proc.stderr)
+    result["total_ms"] = result["import_ms"] + result["first_health_ms"]
+    return result
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--budget-ms", type=float, default=DEFAULT_BUDGET_MS)
+    parser.add_argument("--top", type=int, default=20)
+    parser.add_argument("--json", action="store_true", help="print the full result as JSON")
+    args = parser.parse_args(argv)
+
+    result = profile()
+    if args.json:
+        print(json.dumps(result, indent=2))
+    else:
+        top_level = [r for r in result["imports"] if r["depth"] <= 1]
+        for row in sorted(top_level, key=lambda r: r["cumulative_us"], reverse=True)[: args.top]:
+            print(f"{row['cumulative_us'] / 1000:>9.1f} ms  {row['module']}")
+        print(f"import app: {result['import_ms']:.1f} ms, first /health: {result['first_health_ms']:.1f} ms, "
+              f"total: {result['total_ms']:.1f} ms (budget {args.budget_ms:.0f} ms)")
+    ok = result["status"] == 200 and not result["heavy_loaded"] and result["total_ms"] <= args.budget_ms
+    if result["heavy_loaded"]:
+        print(f"FAIL: /health loaded {', '.join(result['heavy_loaded'])}")
+    elif result["total_ms"] > args.budget_ms:
+        print("FAIL: cold start over budget")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,91 @@
+"""Event-loop responsiveness under load.
+
+Sends ``--concurrent`` large documents to ``/convert-pdf`` and, while they
+are processing, probes ``GET /health`` on the same event loop. If blocking
+work leaked onto the loop, /health latency grows with render time; with the
+CPU/I-O executors it should stay flat.
+
+    python -m benchmarks.concurrency --pages 20 --concurrent 3
+"""
+import argparse
+import asyncio
+import sys
+import time
+from typing import Any, Dict, List, Optional
+
+from benchmarks.corpus import CorpusDoc
+from benchmarks.run import percentile
+
+
+async def _probe_health(client, stop: asyncio.Event, interval: float, starts: Optional[List[float]] = None) -> List[float]:
+    latencies = []
+    while not stop.is_set():
+        t0 = time.perf_counter()
+        if starts is not None:
+            starts.append(t0)
+        resp = await client.get("/health")
+        latencies.append((time.perf_counter() - t0) * 1000.0)
+        assert resp.status_code == 200
+        await asyncio.sleep(interval)
+    return latencies
+
+
+async def health_under_load(pdf: bytes, concurrent: int = 2, interval: float = 0.02) -> Dict[str, Any]:
+    import httpx
+
+    import main
+
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        stop = asyncio.Event()
+        idle = await _probe_for(client, interval, 0.3)
+        starts: List[float] = []
+        probe = asyncio.create_task(_probe_health(client, stop, interval, starts))
+        t0 = time.perf_counter()
+        responses = await asyncio.gather(*(
+            client.post("/convert-pdf", files={"file": ("load.pdf", pdf, "application/pdf")})
+            for _ in range(concurrent)
+        ))
+        load_s = time.perf_counter() - t0
+        stop.set()
+        loaded = await probe
+    # A blocked loop shows up as a long gap between probes, not as slow probes
+    gaps = [(b - a - interval) * 1000.0 for a, b in zip(starts, starts[1:])]
+    return {
+        "load_seconds": round(load_s, 2),
+        "load_status": [r.status_code for r in responses],
+        "idle_p50_ms": round(percentile(idle, 50), 1),
+        "idle_p99_ms": round(percentile(idle, 99), 1),
+        "health_samples": len(loaded),
+        "health_p50_ms": round(percentile(loaded, 50), 1),
+        "health_p99_ms": round(percentile(loaded, 99), 1),
+        "health_max_ms": round(max(loaded, default=0.0), 1),
+        "max_stall_ms": round(max(gaps, default=load_s * 1000.0), 1),
+    }
+
+
+async def _probe_for(client, interval: float, seconds: float) -> List[float]:
+    stop = asyncio.Event()
+    task = asyncio.create_task(_probe_health(client, stop, interval))
+    await asyncio.sleep(seconds)
+    stop.set()
+    return await task
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=20)
+    parser.add_argument("--concurrent", type=int, default=3)
+    parser.add_argument("--budget-ms", type=float, default=100.0, help="max allowed /health p99 and loop stall under load")
+    args = parser.parse_args(argv)
+
+    pdf = CorpusDoc(f"load-{args.pages}p", "text", args.pages, "letter").build()
+    result = asyncio.run(health_under_load(pdf, args.concurrent))
+    for k, v in result.items():
+        print(f"{k}: {v}")
+    ok = result["health_p99_ms"] <= args.budget_ms and result["max_stall_ms"] <= args.budget_ms
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
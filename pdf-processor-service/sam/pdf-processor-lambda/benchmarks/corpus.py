@@ -0,0 +1,131 @@
+"""Synthetic PDF corpus for the benchmark suite.
+
+Every document is generated with PyMuPDF from a fixed seed, so a corpus built
+on two machines is byte-for-byte comparable.
+"""
+import io
+import random
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Tuple
+
+import fitz  # PyMuPDF
+from PIL import Image
+
+# (width, height) in points
+PAGE_SIZES: Dict[str, Tuple[float, float]] = {
+    "letter": (612, 792),
+    "a4": (595, 842),
+    "slide_16_9": (960, 540),
+    "slide_4_3": (720, 540),
+    "receipt": (226, 1200),
+    "poster": (1684, 2384),
+    "tiny": (144, 144),
+}
+
+
+@dataclass(frozen=True)
+class CorpusDoc:
+    name: str
+    kind: str
+    pages: int
+    size: str
+
+    def build(self, seed: int = 0) -> bytes:
+        return BUILDERS[self.kind](self.pages, PAGE_SIZES[self.size], random.Random(f"{seed}:{self.name}"))
+
+
+def _noise_png(rng: random.Random, width: int, height: int) -> bytes:
+    # Blocky noise compresses like a photo rather than like a flat fill
+    img = Image.new("RGB", (max(1, width // 8), max(1, height // 8)))
+    img.putdata([(rng.randrange(256), rng.randrange(256), rng.randrange(256)) for _ in range(img.width * img.height)])
+    img = img.resize((width, height), Image.BILINEAR)
+    buf = io.BytesIO()
+    img.save(buf, format="PNG")
+    return buf.getvalue()
+
+
+def _scan_jpeg(rng: random.Random, width: int, height: int, page_no: int) -> bytes:
+    img = Image.new("L", (width, height), 245)
+    px = img.load()
+    for _ in range(width * height // 40):
+        px[rng.randrange(width), rng.randrange(height)] = rng.randrange(0, 120)
+    buf = io.BytesIO()
+    img.convert("RGB").save(buf, format="JPEG", quality=80)
+    return buf.getvalue()
+
+
+def _text_doc(pages: int, size: Tuple[float, float], rng: random.Random) -> bytes:
+    doc = fitz.open()
+    width, height = size
+    for i in range(pages):
+        page = doc.new_page(width=width, height=height)
+        page.insert_text((36, 48), f"Section {i + 1}: Work zone safety", fontsize=min(24, width / 20))
+        y = 90
+        while y < height - 36:
+            words = " ".join(rng.choice(("lane", "closure", "flagger", "taper", "signal", "night", "crew")) for _ in range(8))
+            page.insert_text((36, y), f"- {words}", fontsize=min(12, width / 30))
+            y += 18
+    data = doc.tobytes(garbage=3, deflate=True, no_new_id=True)
+    doc.close()
+    return data
+
+
+def _image_doc(pages: int, size: Tuple[float, float], rng: random.Random) -> bytes:
+    doc = fitz.open()
+    width, height = size
+    for i in range(pages):
+        page = doc.new_page(width=width, height=height)
+        page.insert_text((36, 36), f"Photo slide {i + 1}", fontsize=14)
+        for j in range(3):
+            w, h = int(width / 3), int(height / 3)
+            x0, y0 = 24 + j * (width - 48) / 3, height / 3
+            page.insert_image(fitz.Rect(x0, y0, x0 + w - 12, y0 + h), stream=_noise_png(rng, w, h))
+    data = doc.tobytes(garbage=3, deflate=True, no_new_id=True)
+    doc.close()
+    return data
+
+
+def _scanned_doc(pages: int, size: Tuple[float, float], rng: random.Random) -> bytes:
+    doc = fitz.open()
+    width, height = size
+    for i in range(pages):
+        page = doc.new_page(width=width, height=height)
+        # 150 DPI scan of the page, placed edge to edge
+        jpeg = _scan_jpeg(rng, int(width * 150 / 72), int(height * 150 / 72), i + 1)
+        page.insert_image(page.rect, stream=jpeg)
+    data = doc.tobytes(garbage=3, deflate=True, no_new_id=True)
+    doc.close()
+    return data
+
+
+BUILDERS: Dict[str, Callable[[int, Tuple[float, float], random.Random], bytes]] = {
+    "text": _text_doc,
+    "image": _image_doc,
+    "scanned": _scanned_doc,
+}
+
+CORPORA: Dict[str, List[CorpusDoc]] = {
+    "smoke": [
+        CorpusDoc("text-1p-letter", "text", 1, "letter"),
+        CorpusDoc("scanned-2p-a4", "scanned", 2, "a4"),
+    ],
+    "quick": [
+        CorpusDoc("text-1p-letter", "text", 1, "letter"),
+        CorpusDoc("text-10p-16x9", "text", 10, "slide_16_9"),
+        CorpusDoc("image-10p-4x3", "image", 10, "slide_4_3"),
+        CorpusDoc("scanned-10p-a4", "scanned", 10, "a4"),
+        CorpusDoc("text-5p-receipt", "text", 5, "receipt"),
+        CorpusDoc("text-5p-tiny", "text", 5, "tiny"),
+    ],
+    "full": [
+        CorpusDoc("text-1p-letter", "text", 1, "letter"),
+        CorpusDoc("text-50p-16x9", "text", 50, "slide_16_9"),
+        CorpusDoc("text-500p-letter", "text", 500, "letter"),
+        CorpusDoc("image-50p-4x3", "image", 50, "slide_4_3"),
+        CorpusDoc("image-200p-16x9", "image", 200, "slide_16_9"),
+        CorpusDoc("scanned-100p-a4", "scanned", 100, "a4"),
+        CorpusDoc("text-20p-receipt", "text", 20, "receipt"),
+        CorpusDoc("image-5p-poster", "image", 5, "poster"),
+        CorpusDoc("text-20p-tiny", "text", 20, "tiny"),
+    ],
+}
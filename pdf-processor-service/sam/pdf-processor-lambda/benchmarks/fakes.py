@@ -0,0 +1,144 @@
+"""In-memory stand-ins for S3 and SQS used by the benchmark suite and unit tests."""
+import io
+import threading
+import uuid
+from typing import Any, Dict, List, Optional
+
+from botocore.exceptions import ClientError
+from s3transfer.manager import TransferManager
+
+
+def _check_extra_args(extra_args: Optional[Dict[str, Any]], allowed: List[str]) -> None:
+    # The managed transfers reject these before any request, with this message
+    for key in extra_args or {}:
+        if key not in allowed:
+            raise ValueError(f"Invalid extra_args key '{key}', must be one of: {', '.join(allowed)}")
+
+
+class FakeS3Client:
+    """Implements the subset of the boto3 S3 client the service calls."""
+
+    def __init__(self):
+        self.objects: Dict[str, Dict[str, Any]] = {}
+        self.uploads: Dict[str, Dict[str, Any]] = {}  # multipart uploads in progress
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self._lock = threading.Lock()
+
+    def _missing(self, op: str, key: str) -> ClientError:
+        return ClientError({"Error": {"Code": "404", "Message": f"Not Found: {key}"}}, op)
+
+    def put_object(self, Bucket: str, Key: str, Body: Any = b"", **kwargs) -> Dict[str, Any]:
+        data = Body if isinstance(Body, (bytes, bytearray)) else Body.read()
+        etag = f'"{hash(bytes(data)) & 0xffffffff:08x}"'
+        with self._lock:
+            self.objects[Key] = {"Body": bytes(data), "ETag": etag, **kwargs}
+            self.bytes_in += len(data)
+        return {"ETag": etag}
+
+    def get_object(self, Bucket: str, Key: str, IfMatch: Optional[str] = None, **kwargs) -> Dict[str, Any]:
+        obj = self.objects.get(Key)
+        if obj is None:
+            raise self._missing("GetObject", Key)
+        if IfMatch is not None and IfMatch != obj["ETag"]:
+            raise ClientError({"Error": {"Code": "PreconditionFailed", "Message": "At least one of the "
+                               "pre-conditions you specified did not hold"}}, "GetObject")
+        with self._lock:
+            self.bytes_out += len(obj["Body"])
+        return {"Body": io.BytesIO(obj["Body"]), "ContentLength": len(obj["Body"])}
+
+    def head_object(self, Bucket: str, Key: str, **kwargs) -> Dict[str, Any]:
+        obj = self.objects.get(Key)
+        if obj is None:
+            raise self._missing("HeadObject", Key)
+        return {"ContentLength": len(obj["Body"]), **{k: v for k, v in obj.items() if k != "Body"}}
+
+    def download_fileobj(self, Bucket: str, Key: str, Fileobj, ExtraArgs: Dict[str, Any] = None, **kwargs) -> None:
+        _check_extra_args(ExtraArgs, TransferManager.ALLOWED_DOWNLOAD_ARGS)
+        Fileobj.write(self.get_object(Bucket=Bucket, Key=Key, **(ExtraArgs or {}))["Body"].read())
+
+    def upload_file(self, Filename: str, Bucket: str, Key: str, ExtraArgs: Dict[str, Any] = None, **kwargs) -> None:
+        _check_extra_args(ExtraArgs, TransferManager.ALLOWED_UPLOAD_ARGS)
+        with open(Filename, "rb") as f:
+            self.put_object(Bucket=Bucket, Key=Key, Body=f.read(), **(ExtraArgs or {}))
+
+    def copy_object(self, Bucket: str, Key: str, CopySource: Dict[str, str], **kwargs) -> Dict[str, Any]:
+        source = self.objects.get(CopySource["Key"])
+        if source is None:
+            raise self._missing("CopyObject", CopySource["Key"])
+        # Like S3, metadata arguments are ignored unless asked to replace the source's
+        replace = kwargs.pop("MetadataDirective", "COPY") == "REPLACE"
+        with self._lock:
+            self.objects[Key] = {**source, **kwargs} if replace else dict(source)
+        return {}
+
+    def create_multipart_upload(self, Bucket: str, Key: str, **kwargs) -> Dict[str, Any]:
+        upload_id = uuid.uuid4().hex
+        with self._lock:
+            self.uploads[upload_id] = {"Key": Key, "Parts": {}, "Args": kwargs}
+        return {"Bucket": Bucket, "Key": Key, "UploadId": upload_id}
+
+    def _upload(self, op: str, upload_id: str) -> Dict[str, Any]:
+        upload = self.uploads.get(upload_id)
+        if upload is None:
+            raise ClientError({"Error": {"Code": "NoSuchUpload", "Message": upload_id}}, op)
+        return upload
+
+    def upload_part(self, Bucket: str, Key: str, UploadId: str, PartNumber: int, Body: Any = b"", **kwargs) -> Dict[str, Any]:
+        upload = self._upload("UploadPart", UploadId)
+        data = bytes(Body if isinstance(Body, (bytes, bytearray)) else Body.read())
+        etag = f'"{hash(data) & 0xffffffff:08x}"'
+        with self._lock:
+            upload["Parts"][PartNumber] = (data, etag)
+            self.bytes_in += len(data)
+        return {"ETag": etag}
+
+    def list_parts(self, Bucket: str, Key: str, UploadId: str, PartNumberMarker: int = 0, MaxParts: int = 1000,
+                   **kwargs) -> Dict[str, Any]:
+        parts = self._upload("ListParts", UploadId)["Parts"]
+        numbers = sorted(n for n in parts if n > PartNumberMarker)
+        page = numbers[:MaxParts]
+        resp: Dict[str, Any] = {
+            "Parts": [{"PartNumber": n, "ETag": parts[n][1], "Size": len(parts[n][0])} for n in page],
+            "IsTruncated": len(numbers) > MaxParts,
+        }
+        if resp["IsTruncated"]:
+            resp["NextPartNumberMarker"] = page[-1]
+        return resp
+
+    def complete_multipart_upload(self, Bucket: str, Key: str, UploadId: str, MultipartUpload: Dict[str, Any],
+                                  **kwargs) -> Dict[str, Any]:
+        upload = self._upload("CompleteMultipartUpload", UploadId)
+        chunks = []
+        for part in MultipartUpload["Parts"]:
+            stored = upload["Parts"].get(part["PartNumber"])
+            if stored is None or stored[1] != part["ETag"]:
+                raise ClientError({"Error": {"Code": "InvalidPart", "Message": str(part["PartNumber"])}},
+                                  "CompleteMultipartUpload")
+            chunks.append(stored[0])
+        etag = f'"{hash(b"".join(chunks)) & 0xffffffff:08x}-{len(chunks)}"'
+        with self._lock:
+            self.objects[Key] = {"Body": b"".join(chunks), "ETag": etag, **upload["Args"]}
+            del self.uploads[UploadId]
+        return {"Bucket": Bucket, "Key": Key, "ETag": etag}
+
+    def abort_multipart_upload(self, Bucket: str, Key: str, UploadId: str, **kwargs) -> Dict[str, Any]:
+        self._upload("AbortMultipartUpload", UploadId)
+        with self._lock:
+            del self.uploads[UploadId]
+        return {}
+
+    def generate_presigned_url(self, ClientMethod: str, Params: Dict[str, Any] = None, ExpiresIn: int = 3600, **kwargs) -> str:
+        params = Params or {}
+        return f"https://fake-s3.local/{params.get('Bucket')}/{params.get('Key')}?op={ClientMethod}&expires={ExpiresIn}"
+
+
+class FakeSQSClient:
+    """Records ``send_message`` calls; ``messages`` holds the bodies in order."""
+
+    def __init__(self):
+        self.messages: List[str] = []
+
+    def send_message(self, QueueUrl: str, MessageBody: str, **kwargs) -> Dict[str, Any]:
+        self.messages.append(MessageBody)
+        return {"MessageId": uuid.uuid4().hex}
@@ -0,0 +1,78 @@
+"""Bulk URL signing: ``presign.UrlSigner`` against per-key ``generate_presigned_url``.
+
+Signs ``--keys`` output keys both ways with a real boto3 client and static
+dummy credentials (signing is local, so no AWS access is needed), checks the
+URLs agree, and fails if the signer is not at least ``--min-speedup`` times
+faster.
+
+    python -m benchmarks.presign --keys 500
+"""
+import argparse
+import datetime
+import sys
+import time
+from typing import Any, Dict, List, Optional
+from urllib.parse import parse_qs, urlsplit
+
+BUCKET = "bench-bucket"
+
+
+def _client():
+    import boto3
+    from botocore.config import Config
+
+    return boto3.client("s3", region_name="us-east-1", aws_access_key_id="AKIDEXAMPLE",
+                        aws_secret_access_key="bench-secret", config=Config(signature_version="s3v4"))
+
+
+def compare(n_keys: int = 500, repeat: int = 3) -> Dict[str, Any]:
+    import presign
+
+    client = _client()
+    keys = [f"outputs/{i // 50:064x}/default/1.23.8/page-{i % 50 + 1}.png" for i in range(n_keys)]
+
+    per_key: List[float] = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        expected = [client.generate_presigned_url("get_object", Params={"Bucket": BUCKET, "Key": k}, ExpiresIn=3600)
+                    for k in keys]
+        per_key.append(time.perf_counter() - t0)
+
+    # The first batch includes resolving the bucket's endpoint and fetching credentials
+    signer = presign.UrlSigner(client)
+    batched: List[float] = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        signer.sign(BUCKET, keys, 3600)
+        batched.append(time.perf_counter() - t0)
+
+    last = urlsplit(expected[-1])
+    signed_at = datetime.datetime.strptime(parse_qs(last.query)["X-Amz-Date"][0], "%Y%m%dT%H%M%SZ")
+    check = urlsplit(signer.sign(BUCKET, keys[-1:], 3600, now=signed_at)[0])
+    return {
+        "keys": n_keys,
+        "per_key_ms": round(min(per_key) * 1000.0, 1),
+        "per_key_us_per_url": round(min(per_key) / n_keys * 1e6, 1),
+        "batch_first_ms": round(batched[0] * 1000.0, 2),
+        "batch_ms": round(min(batched) * 1000.0, 2),
+        "batch_us_per_url": round(min(batched) / n_keys * 1e6, 1),
+        "speedup": round(min(per_key) / min(batched), 1),
+        "urls_match": check[:3] == last[:3] and parse_qs(check.query) == parse_qs(last.query),
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--keys", type=int, default=500)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--min-speedup", type=float, default=10.0)
+    args = parser.parse_args(argv)
+
+    result = compare(args.keys, args.repeat)
+    for k, v in result.items():
+        print(f"{k}: {v}")
+    return 0 if result["urls_match"] and result["speedup"] >= args.min_speedup else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
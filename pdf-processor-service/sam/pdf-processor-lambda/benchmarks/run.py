@@ -0,0 +1,246 @@
+"""End-to-end benchmark of the PDF processor endpoints.
+
+Runs each endpoint in-process against the FastAPI app with an in-memory S3
+and the fake vision backend, over a synthetic corpus, and reports pages/sec,
+p50/p95/p99 latency, peak RSS and response bytes. Results can be saved as a
+JSON baseline and compared against on later runs.
+
+    python -m benchmarks.run --corpus quick --repeat 3
+    python -m benchmarks.run --corpus quick --save-baseline benchmarks/baselines/quick.json
+    python -m benchmarks.run --corpus quick --baseline benchmarks/baselines/quick.json
+"""
+import argparse
+import json
+import math
+import os
+import platform
+import resource
+import sys
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from benchmarks.corpus import CORPORA, CorpusDoc
+from benchmarks.fakes import FakeS3Client
+
+ENDPOINTS = ["convert-pdf", "process-pdf-with-ai", "convert-from-s3", "process-from-s3"]
+BUCKET = "bench-bucket"
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile; 0.0 for an empty list."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100.0 * len(ordered)))
+    return ordered[rank - 1]
+
+
+class RssSampler:
+    """Samples resident set size on a background thread; reports the peak in MB."""
+
+    def __init__(self, interval: float = 0.01):
+        self.interval = interval
+        self.peak_kb = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @staticmethod
+    def current_kb() -> int:
+        try:
+            with open("/proc/self/statm") as f:
+                return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") // 1024
+        except (OSError, ValueError, IndexError):
+            # macOS reports bytes, Linux kilobytes; only the peak is available
+            peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            return peak // 1024 if sys.platform == "darwin" else peak
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.peak_kb = max(self.peak_kb, self.current_kb())
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self.peak_kb = self.current_kb()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak_kb = max(self.peak_kb, self.current_kb())
+
+    @property
+    def peak_mb(self) -> float:
+        return round(self.peak_kb / 1024.0, 1)
+
+
+def install_fakes(vision_latency_ms: float, vision_jitter_ms: float, seed: int) -> None:
+    """Point the service at in-memory S3 (a fresh bucket per run, see
+    run_scenario) and the deterministic vision backend."""
+    import main
+    from vision import FakeVisionBackend, set_vision_backend
+
+    main.BUCKET_NAME = BUCKET
+    set_vision_backend(FakeVisionBackend(latency_ms=vision_latency_ms, jitter_ms=vision_jitter_ms, seed=seed))
+
+
+def _request(client, endpoint: str, doc: CorpusDoc, pdf: bytes, s3_key: str):
+    if endpoint in ("convert-pdf", "process-pdf-with-ai"):
+        return client.post(f"/{endpoint}", files={"file": (f"{doc.name}.pdf", pdf, "application/pdf")})
+    return client.post(f"/{endpoint}", json={"payload": {"key": s3_key}})
+
+
+def _fresh_s3(s3_key: str, pdf: bytes) -> FakeS3Client:
+    """A new in-memory bucket holding only the source PDF."""
+    from clients import set_s3_client
+
+    s3 = FakeS3Client()
+    s3.put_object(Bucket=BUCKET, Key=s3_key, Body=pdf)
+    set_s3_client(s3)
+    return s3
+
+
+def run_scenario(client, endpoint: str, doc: CorpusDoc, pdf: bytes, repeat: int) -> Dict[str, Any]:
+    import dedup
+
+    s3_key = f"uploads/{doc.name}.pdf"
+    latencies: List[float] = []
+    bytes_out = 0
+    errors = 0
+    with RssSampler() as rss:
+        started = time.perf_counter()
+        for _ in range(repeat):
+            # Every run is a cold document: no page analyses, stored outputs
+            # or manifests carried over from other runs or endpoints
+            dedup.set_store(None)
+            _fresh_s3(s3_key, pdf)
+            t0 = time.perf_counter()
+            resp = _request(client, endpoint, doc, pdf, s3_key)
+            latencies.append((time.perf_counter() - t0) * 1000.0)
+            bytes_out += len(resp.content)
+            if resp.status_code != 200:
+                errors += 1
+        elapsed = time.perf_counter() - started
+    return {
+        "doc": doc.name,
+        "kind": doc.kind,
+        "endpoint": endpoint,
+        "pages": doc.pages,
+        "pdf_bytes": len(pdf),
+        "runs": repeat,
+        "errors": errors,
+        "pages_per_sec": round(doc.pages * repeat / elapsed, 2) if elapsed else 0.0,
+        "p50_ms": round(percentile(latencies, 50), 1),
+        "p95_ms": round(percentile(latencies, 95), 1),
+        "p99_ms": round(percentile(latencies, 99), 1),
+        "peak_rss_mb": rss.peak_mb,
+        "bytes_out": bytes_out // repeat,
+    }
+
+
+def run(
+    corpus: str = "quick",
+    endpoints: Optional[List[str]] = None,
+    repeat: int = 3,
+    vision_latency_ms: float = 0.0,
+    vision_jitter_ms: float = 0.0,
+    seed: int = 0,
+    log: Callable[[str], None] = print,
+) -> Dict[str, Any]:
+    from fastapi.testclient import TestClient
+
+    import main
+
+    install_fakes(vision_latency_ms, vision_jitter_ms, seed)
+    results = []
+    # One event loop for the whole run, as in a long-lived instance: background
+    # work such as persisting documents to S3 finishes between requests
+    with TestClient(main.app) as client:
+        for doc in CORPORA[corpus]:
+            pdf = doc.build(seed)
+            for endpoint in endpoints or ENDPOINTS:
+                result = run_scenario(client, endpoint, doc, pdf, repeat)
+                log(
+                    f"{doc.name:<20} {endpoint:<20} {result['pages_per_sec']:>8.2f} p/s  "
+                    f"p50={result['p50_ms']:>8.1f}ms p95={result['p95_ms']:>8.1f}ms p99={result['p99_ms']:>8.1f}ms  "
+                    f"rss={result['peak_rss_mb']:>7.1f}MB out={result['bytes_out']}"
+                )
+                results.append(result)
+    return {
+        "corpus": corpus,
+        "params": {
+            "repeat": repeat,
+            "vision_latency_ms": vision_latency_ms,
+            "vision_jitter_ms": vision_jitter_ms,
+            "seed": seed,
+        },
+        "environment": {"python": platform.python_version(), "machine": platform.machine(), "cpus": os.cpu_count()},
+        "results": results,
+    }
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], tolerance: float = 0.15) -> List[str]:
+    """Return human-readable regressions of ``current`` against ``baseline``.
+
+    Throughput may drop and p95 latency / peak RSS may grow by at most
+    ``tolerance`` (fractional); response size must not grow at all.
+    """
+    base = {(r["doc"], r["endpoint"]): r for r in baseline.get("results", [])}
+    regressions = []
+    for r in current["results"]:
+        b = base.get((r["doc"], r["endpoint"]))
+        if b is None:
+            continue
+        label = f"{r['doc']} {r['endpoint']}"
+        if b["pages_per_sec"] and r["pages_per_sec"] < b["pages_per_sec"] * (1 - tolerance):
+            regressions.append(f"{label}: pages/sec {r['pages_per_sec']} < baseline {b['pages_per_sec']}")
+        if b["p95_ms"] and r["p95_ms"] > b["p95_ms"] * (1 + tolerance):
+            regressions.append(f"{label}: p95 {r['p95_ms']}ms > baseline {b['p95_ms']}ms")
+        if b["peak_rss_mb"] and r["peak_rss_mb"] > b["peak_rss_mb"] * (1 + tolerance):
+            regressions.append(f"{label}: peak RSS {r['peak_rss_mb']}MB > baseline {b['peak_rss_mb']}MB")
+        if r["bytes_out"] > b["bytes_out"]:
+            regressions.append(f"{label}: bytes out {r['bytes_out']} > baseline {b['bytes_out']}")
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--corpus", choices=sorted(CORPORA), default="quick")
+    parser.add_argument("--endpoint", action="append", choices=ENDPOINTS, help="repeatable; default all")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--vision-latency-ms", type=float, default=0.0)
+    parser.add_argument("--vision-jitter-ms", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", help="write results JSON here")
+    parser.add_argument("--baseline", help="compare against this baseline JSON")
+    parser.add_argument("--save-baseline", help="write results as a new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.15)
+    args = parser.parse_args(argv)
+
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    result = run(
+        corpus=args.corpus,
+        endpoints=args.endpoint,
+        repeat=args.repeat,
+        vision_latency_ms=args.vision_latency_ms,
+        vision_jitter_ms=args.vision_jitter_ms,
+        seed=args.seed,
+    )
+    for path in (args.out, args.save_baseline):
+        if path:
+            with open(path, "w") as f:
+                json.dump(result, f, indent=2)
+                f.write("\n")
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(result, json.load(f), args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,175 @@
+"""Admission control over a process-wide render budget.
+
+A request's cost is the pixel area it will render: the sum of its page areas
+at the render DPI, in megapixels, read from the page boxes without rendering.
+Requests whose cost fits under ``ADMISSION_BUDGET_MP`` run immediately; the
+rest wait in FIFO order for up to ``ADMISSION_QUEUE_SECONDS``. When the queue
+already holds ``ADMISSION_MAX_QUEUE`` requests, or the wait times out, the
+request is rejected with ``Overloaded`` (HTTP 429) and a ``retry_after``
+estimated from the recently observed megapixels-per-second throughput.
+
+A single request larger than the whole budget is admitted only when nothing
+else is running, so it cannot starve but also never shares the instance.
+
+Background work (``/jobs`` and ``/batches``) has no client waiting to retry,
+so it is admitted with ``background=True``: it queues without a timeout or a
+queue limit, behind every waiting request, and is never rejected.
+"""
+import asyncio
+import math
+import os
+import threading
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Deque, Iterable, Optional, Tuple
+
+import metrics
+
+BUDGET_MP = float(os.getenv("ADMISSION_BUDGET_MP", "2000"))
+QUEUE_SECONDS = float(os.getenv("ADMISSION_QUEUE_SECONDS", "10"))
+MAX_QUEUE = int(os.getenv("ADMISSION_MAX_QUEUE", "16"))
+
+class Overloaded(Exception):
+    """Not enough render budget; retry after ``retry_after`` seconds."""
+
+    def __init__(self, message: str, retry_after: int):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def render_cost(page_sizes: Iterable[Tuple[float, float]], dpi: int) -> float:
+    """Megapixels rendered for pages given as (width, height) in PDF points."""
+    scale = dpi / 72.0
+    return sum(round(w * scale) * round(h * scale) for w, h in page_sizes) / 1e6
+
+
+class AdmissionController:
+    def __init__(self, budget_mp: float = BUDGET_MP, queue_seconds: float = QUEUE_SECONDS, max_queue: int = MAX_QUEUE):
+        self.budget_mp = budget_mp
+        self.queue_seconds = queue_seconds
+        self.max_queue = max_queue
+        self.in_flight_mp = 0.0
+        self._running = 0
+        self._lock = threading.Lock()
+        self._waiters: Deque[_Waiter] = deque()
+        self._background: Deque[_Waiter] = deque()
+        # Exponentially weighted megapixels/second, for Retry-After
+        self._rate_mp_s: Optional[float] = None
+
+    def _fits(self, cost: float) -> bool:
+        return self._running == 0 or self.in_flight_mp + cost <= self.budget_mp
+
+    def _take(self, cost: float) -> None:
+        self.in_flight_mp += cost
+        self._running += 1
+        metrics.ADMISSION_MP.inc(cost)
+
+    def _retry_after(self, cost: float) -> int:
+        queued = sum(w.cost for w in self._waiters)
+        excess = self.in_flight_mp + queued + cost - self.budget_mp
+        rate = self._rate_mp_s or self.budget_mp / 30.0
+        return int(min(60, max(1, math.ceil(excess / rate))))
+
+    def _reject(self, reason: str, cost: float) -> Overloaded:
+        metrics.ADMISSION_REJECTED.inc(reason=reason)
+        return Overloaded(
+            f"render budget exhausted ({self.in_flight_mp:.0f}/{self.budget_mp:.0f} MP in flight, "
+            f"request needs {cost:.0f} MP)",
+            self._retry_after(cost),
+        )
+
+    def _wake(self) -> None:
+        # Admit waiters in order while the head fits, requests before background
+        # work; called with the lock held
+        while True:
+            queue = self._waiters or self._background
+            if not queue or not self._fits(queue[0].cost):
+                return
+            waiter = queue.popleft()
+            self._take(waiter.cost)
+            waiter.admitted = True
+            waiter.loop.call_soon_threadsafe(_resolve, waiter.future)
+
+    async def acquire(self, cost: float, background: bool = False) -> None:
+        with self._lock:
+            queue = self._background if background else self._waiters
+            if not self._waiters and not queue and self._fits(cost):
+                self._take(cost)
+                return
+            if not background and len(self._waiters) >= self.max_queue:
+                raise self._reject("queue_full", cost)
+            waiter = _Waiter(cost)
+            queue.append(waiter)
+        with metrics.ADMISSION_QUEUED.track(), metrics.stage("admission_wait", cost_mp=round(cost, 1)):
+            try:
+                await asyncio.wait_for(asyncio.shield(waiter.future), None if background else self.queue_seconds)
+            except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+                with self._lock:
+                    admitted = waiter.admitted
+                    if not admitted:
+                        queue.remove(waiter)
+                        if not background:
+                            rejection = self._reject("timeout", cost)
+                        # This waiter may have been blocking smaller ones behind it
+                        self._wake()
+                if isinstance(e, asyncio.CancelledError):
+                    if admitted:
+                        self.release(cost, 0.0)
+                    raise
+                if not admitted:
+                    raise rejection from None
+
+    def release(self, cost: float, held_s: float) -> None:
+        with self._lock:
+            self.in_flight_mp = max(0.0, self.in_flight_mp - cost)
+            self._running -= 1
+            metrics.ADMISSION_MP.dec(cost)
+            if held_s > 0 and cost > 0:
+                rate = cost / held_s
+                self._rate_mp_s = rate if self._rate_mp_s is None else 0.8 * self._rate_mp_s + 0.2 * rate
+            self._wake()
+
+    @asynccontextmanager
+    async def admit(self, cost: float, background: bool = False) -> AsyncIterator[None]:
+        await self.acquire(cost, background)
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.release(cost, time.perf_counter() - started)
+
+
+class _Waiter:
+    __slots__ = ("cost", "loop", "future", "admitted")
+
+    def __init__(self, cost: float):
+        self.cost = cost
+        self.loop = asyncio.get_running_loop()
+        self.future = self.loop.create_future()
+        self.admitted = False
+
+
+def _resolve(fut: asyncio.Future) -> None:
+    if not fut.done():
+        fut.set_result(None)
+
+
+_controller: Optional[AdmissionController] = None
+_controller_lock = threading.Lock()
+
+
+def get_controller() -> AdmissionController:
+    global _controller
+    if _controller is None:
+        with _controller_lock:
+            if _controller is None:
+                _controller = AdmissionController()
+    return _controller
+
+
+def set_controller(controller: Optional[AdmissionController]) -> None:
+    """Override the process-wide controller (tests, benchmarks); None resets to env."""
+    global _controller
+    with _controller_lock:
+        _controller = controller
@@ -1,4 +1,21 @@
+import asyncio
+
 from mangum import Mangum
 from main import app
 
-handler = Mangum(app)
+import triggers
+
+# API Gateway. Mangum would otherwise run the app's startup and shutdown around
+# every invocation, tearing down the executors each time; on Lambda they are
+# created on first use and live as long as the instance (see executors.py).
+handler = Mangum(app, lifespan="off")
+
+
+def s3_handler(event, context):
+    """S3 ObjectCreated notifications for uploads/."""
+    return asyncio.run(triggers.handle_s3_event(event, context))
+
+
+def sqs_handler(event, context):
+    """SQS batches; reports failed messages for partial-batch retry."""
+    return asyncio.run(triggers.handle_sqs_batch(event, context))
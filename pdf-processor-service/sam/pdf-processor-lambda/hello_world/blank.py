@@ -0,0 +1,37 @@
+"""Blank and near-blank page classifier.
+
+Works on the low-resolution grayscale preview from fingerprint.py. The
+background level is the page's 95th-percentile brightness, so off-white and
+dark covers are handled alike; "ink" is the share of pixels at least
+``INK_CONTRAST`` levels darker than that. A page is blank when it has almost
+no ink and little variance overall:
+
+- a page number or a scanner speck alone stays under ``BLANK_MAX_INK``
+  (0.03% of the page); a one-word heading does not;
+- faint content that never reaches the contrast threshold, such as a light
+  photo or a watermark-like gradient, still fails ``BLANK_MAX_STD``.
+
+At the 36 DPI preview, isolated scan noise is averaged away before it counts.
+"""
+import os
+from dataclasses import dataclass
+
+import numpy as np
+
+MAX_INK = float(os.getenv("BLANK_MAX_INK", "0.0003"))
+MAX_STD = float(os.getenv("BLANK_MAX_STD", "10"))
+INK_CONTRAST = 48
+
+
+@dataclass
+class BlankScore:
+    blank: bool
+    ink: float  # share of pixels, 0..1
+    std: float
+
+
+def classify(pixels: np.ndarray) -> BlankScore:
+    background = float(np.percentile(pixels, 95))
+    ink = float((pixels < background - INK_CONTRAST).mean())
+    std = float(pixels.std())
+    return BlankScore(ink <= MAX_INK and std <= MAX_STD, ink, std)
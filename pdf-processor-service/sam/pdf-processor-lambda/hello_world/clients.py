@@ -0,0 +1,70 @@
+"""Lazily created, process-wide SDK clients.
+
+boto3 and openai together cost a large share of the Lambda cold start, so
+neither is imported until a route actually needs a client. Each factory builds
+its client once and reuses it for the life of the process.
+"""
+import os
+import threading
+from typing import Any, Optional
+
+_lock = threading.Lock()
+_s3_client: Optional[Any] = None
+_sqs_client: Optional[Any] = None
+_openai_client: Optional[Any] = None
+
+
+def get_s3_client():
+    global _s3_client
+    if _s3_client is None:
+        with _lock:
+            if _s3_client is None:
+                import boto3
+                from botocore.config import Config
+
+                # SigV4 for presigned URLs too, which presign.UrlSigner reproduces
+                _s3_client = boto3.client("s3", config=Config(signature_version="s3v4"))
+    return _s3_client
+
+
+def get_sqs_client():
+    global _sqs_client
+    if _sqs_client is None:
+        with _lock:
+            if _sqs_client is None:
+                import boto3
+
+                _sqs_client = boto3.client("sqs")
+    return _sqs_client
+
+
+def get_openai_client():
+    global _openai_client
+    if _openai_client is None:
+        with _lock:
+            if _openai_client is None:
+                import openai
+
+                _openai_client = openai.OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+    return _openai_client
+
+
+def set_s3_client(client: Optional[Any]) -> None:
+    """Override the S3 client (tests, benchmarks); None rebuilds it on next use."""
+    global _s3_client
+    with _lock:
+        _s3_client = client
+
+
+def set_sqs_client(client: Optional[Any]) -> None:
+    """Override the SQS client (tests); None rebuilds it on next use."""
+    global _sqs_client
+    with _lock:
+        _sqs_client = client
+
+
+def set_openai_client(client: Optional[Any]) -> None:
+    """Override the OpenAI client (tests); None rebuilds it on next use."""
+    global _openai_client
+    with _lock:
+        _openai_client = client
@@ -0,0 +1,66 @@
+"""Request deadlines and continuation tokens.
+
+A request's deadline is the earlier of the Lambda invocation's remaining time
+(``aws.context`` in the ASGI scope, set by Mangum) and the client's
+``X-Deadline-Ms`` header, the milliseconds it is prepared to wait, less
+``DEADLINE_MARGIN_SECONDS`` to build and send the response. Long operations
+work in chunks and stop starting new ones when the remaining time is shorter
+than the slowest chunk so far; the response then carries a continuation
+token for the pages not done.
+
+Tokens are URL-safe base64 JSON. They are not signed: one only names the
+document by digest and the pages still to do, which the caller could ask for
+directly anyway.
+"""
+import base64
+import json
+import math
+import os
+import time
+from typing import Any, Dict, Mapping, Optional
+
+MARGIN_SECONDS = float(os.getenv("DEADLINE_MARGIN_SECONDS", "3"))
+HEADER = "x-deadline-ms"
+TOKEN_VERSION = 1
+
+
+class Deadline:
+    def __init__(self, at: Optional[float] = None):
+        self.at = at  # time.monotonic(), or None for no deadline
+
+    def remaining(self) -> float:
+        return math.inf if self.at is None else self.at - time.monotonic()
+
+    def allows(self, seconds: float) -> bool:
+        """Whether work expected to take ``seconds`` still fits."""
+        return self.remaining() >= seconds
+
+
+def from_request(scope: Mapping[str, Any], headers: Mapping[str, str]) -> Deadline:
+    limits = []
+    context = scope.get("aws.context")
+    if context is not None and hasattr(context, "get_remaining_time_in_millis"):
+        limits.append(context.get_remaining_time_in_millis() / 1000.0)
+    try:
+        limits.append(float(headers.get(HEADER, "")) / 1000.0)
+    except ValueError:
+        pass
+    if not limits:
+        return Deadline()
+    return Deadline(time.monotonic() + min(limits) - MARGIN_SECONDS)
+
+
+def encode_token(state: Dict[str, Any]) -> str:
+    raw = json.dumps({"v": TOKEN_VERSION, **state}, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_token(token: str) -> Dict[str, Any]:
+    """Raises ValueError for a malformed or foreign token."""
+    try:
+        state = json.loads(base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)))
+    except (ValueError, TypeError) as e:
+        raise ValueError("malformed continuation token") from e
+    if not isinstance(state, dict) or state.pop("v", None) != TOKEN_VERSION:
+        raise ValueError("unsupported continuation token")
+    return state
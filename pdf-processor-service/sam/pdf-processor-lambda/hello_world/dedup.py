@@ -0,0 +1,206 @@
+"""Duplicate and near-duplicate page detection before vision analysis.
+
+Training decks repeat title, section-divider and "Questions?" slides. Pages
+are grouped when their exact hashes match, or when their body text matches
+and both perceptual hashes (see fingerprint.py) are within
+``DEDUP_MAX_DISTANCE`` bits of each other. Scanned pages have no text to
+compare, and at 64 pixels "Section 1" and "Questions?" can hash alike, so two
+pages without a text layer are merged on an exact match only.
+Only the first page of each group is rendered and analyzed; the rest reuse
+its result.
+
+The default distance of 3 merges slides that differ only in a page number,
+footer or a small visual change, but keeps "Section 1" and "Section 2"
+dividers apart. Set it to -1 to
+merge exact duplicates only, or ``DEDUP_ENABLED=0`` to turn the stage off.
+
+Analyses are also kept in a process-wide ``AnalysisStore`` keyed by the
+exact page hash, model and prompt, so a slide seen in an earlier document
+is not analyzed again.
+"""
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+import metrics
+
+ENABLED = os.getenv("DEDUP_ENABLED", "1") != "0"
+MAX_DISTANCE = int(os.getenv("DEDUP_MAX_DISTANCE", "3"))
+STORE_SIZE = int(os.getenv("DEDUP_STORE_SIZE", "4096"))
+
+
+def _distance(a: int, b: int) -> int:
+    return (a ^ b).bit_count()
+
+
+def group(fingerprints: Sequence[Any], max_distance: Optional[int] = None) -> List[List[int]]:
+    """Group page fingerprints; returns lists of page numbers, each led by its representative."""
+    max_distance = MAX_DISTANCE if max_distance is None else max_distance
+    parent = list(range(len(fingerprints)))
+
+    def find(i: int) -> int:
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    def union(i: int, j: int) -> None:
+        ri, rj = find(i), find(j)
+        if ri != rj:
+            parent[max(ri, rj)] = min(ri, rj)
+
+    by_exact: Dict[str, int] = {}
+    for i, fp in enumerate(fingerprints):
+        if fp.exact in by_exact:
+            union(by_exact[fp.exact], i)
+        else:
+            by_exact[fp.exact] = i
+    if max_distance >= 0:
+        # Pairwise over distinct pages; 500 pages is ~125k XOR/popcounts
+        reps = list(by_exact.values())
+        for a, i in enumerate(reps):
+            for j in reps[a + 1:]:
+                fi, fj = fingerprints[i], fingerprints[j]
+                if (
+                    (fi.has_text or fj.has_text)
+                    and fi.text == fj.text
+                    and _distance(fi.dhash, fj.dhash) <= max_distance
+                    and _distance(fi.phash, fj.phash) <= max_distance
+                ):
+                    union(i, j)
+
+    groups: Dict[int, List[int]] = {}
+    for i, fp in enumerate(fingerprints):
+        groups.setdefault(find(i), []).append(fp.page)
+    return [groups[root] for root in sorted(groups)]
+
+
+def store_key(exact: str, model: str, prompt: str) -> str:
+    return hashlib.sha256(f"{exact}\0{model}\0{prompt}".encode()).hexdigest()
+
+
+class AnalysisStore:
+    """Bounded LRU of page analyses keyed by ``store_key``."""
+
+    def __init__(self, max_entries: int = STORE_SIZE):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            analysis = self._entries.get(key)
+            if analysis is not None:
+                self._entries.move_to_end(key)
+            return analysis
+
+    def put(self, key: str, analysis: Dict[str, Any]) -> None:
+        with self._lock:
+            self._entries[key] = analysis
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+_store: Optional[AnalysisStore] = None
+_store_lock = threading.Lock()
+
+
+def get_store() -> AnalysisStore:
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = AnalysisStore()
+    return _store
+
+
+def set_store(store: Optional[AnalysisStore]) -> None:
+    """Override the process-wide store (tests, benchmarks); None resets to env."""
+    global _store
+    with _store_lock:
+        _store = store
+
+
+class Plan:
+    """Which pages of one document to analyze, and how to fan the results out.
+
+    ``analyze_pages`` lists the group representatives with no stored
+    analysis; ``fan_out`` turns their results into one entry per page,
+    leaving out groups whose representative has no result yet. With
+    ``dedupe`` off every page is its own group and the store is not used;
+    with ``skip_blank`` on, blank pages (see blank.py) are left out of the
+    groups and get ``placeholder(page)`` instead of an analysis.
+    """
+
+    def __init__(
+        self,
+        fingerprints: Sequence[Any],
+        model: str,
+        prompt: str,
+        store: Optional[AnalysisStore] = None,
+        dedupe: bool = True,
+        skip_blank: bool = False,
+    ):
+        self.total = len(fingerprints)
+        self.dedupe = dedupe
+        self.blank_pages = [fp.page for fp in fingerprints if fp.blank] if skip_blank else []
+        content = [fp for fp in fingerprints if fp.page not in set(self.blank_pages)]
+        self.groups = group(content) if dedupe else [[fp.page] for fp in content]
+        self.store = (store or get_store()) if dedupe else None
+        by_page = {fp.page: fp for fp in content}
+        self.keys = {g[0]: store_key(by_page[g[0]].exact, model, prompt) for g in self.groups}
+        self.cached: Dict[int, Dict[str, Any]] = {}
+        if self.store is not None:
+            for page, key in self.keys.items():
+                hit = self.store.get(key)
+                if hit is not None:
+                    self.cached[page] = hit
+        self.analyze_pages = [g[0] for g in self.groups if g[0] not in self.cached]
+
+    def remember(self, page: int, analysis: Dict[str, Any]) -> None:
+        """Store a successful analysis of a representative page."""
+        if self.store is not None:
+            self.store.put(self.keys[page], analysis)
+
+    def fan_out(
+        self, results: List[Dict[str, Any]], placeholder: Optional[Callable[[int], Dict[str, Any]]] = None
+    ) -> List[Dict[str, Any]]:
+        analyses = dict(self.cached)
+        analyses.update((r["page"], r["analysis"]) for r in results)
+        out: List[Dict[str, Any]] = [
+            {"page": page, "analysis": placeholder(page) if placeholder else {}, "blank": True}
+            for page in self.blank_pages
+        ]
+        for g in self.groups:
+            rep = g[0]
+            if rep not in analyses:
+                continue  # not analyzed yet: the request ran out of time first
+            for page in g:
+                entry: Dict[str, Any] = {"page": page, "analysis": dict(analyses[rep])}
+                if page != rep:
+                    entry["duplicate_of"] = rep
+                elif rep in self.cached:
+                    entry["from_store"] = True
+                out.append(entry)
+        out.sort(key=lambda r: r["page"])
+        return out
+
+    def summary(self) -> Dict[str, Any]:
+        """Response ``dedupe`` block; ``ratio`` is the share of pages not analyzed."""
+        analyzed = len(self.analyze_pages)
+        content_pages = self.total - len(self.blank_pages)
+        metrics.DEDUP_PAGES.inc(analyzed, outcome="analyzed")
+        metrics.DEDUP_PAGES.inc(content_pages - len(self.groups), outcome="duplicate")
+        metrics.DEDUP_PAGES.inc(len(self.cached), outcome="store_hit")
+        metrics.DEDUP_PAGES.inc(len(self.blank_pages), outcome="blank")
+        return {
+            "pages": self.total,
+            "unique_pages": len(self.groups),
+            "store_hits": len(self.cached),
+            "analyzed": analyzed,
+            "ratio": round(1 - analyzed / self.total, 3) if self.total else 0.0,
+            "groups": [g for g in self.groups if len(g) > 1],
+        }
@@ -0,0 +1,220 @@
+"""Content-addressed store of source PDFs.
+
+Every document the service processes is kept under its SHA-256 so single
+pages can be fetched later from ``/documents/{digest}/pages/{n}`` without
+uploading the PDF again. Two tiers:
+
+- a local directory (``DOCUMENT_CACHE_DIR``), evicted least recently used
+  first once it holds more than ``DOCUMENT_CACHE_BYTES``. Unset, the cap is
+  ``DOCUMENT_CACHE_DISK_SHARE`` (half) of the space the cache could use, its
+  own files plus what is free on the disk, so it fits Lambda's ``/tmp``
+  whatever its size. Recency is the access time, set explicitly;
+  modification times never change, so workers keep their opened copies (see
+  render.DocumentCache). Documents in use are pinned (see ``pinned``) and
+  never evicted, so a request or job reading one cannot lose it mid-way;
+- ``s3://BUCKET_NAME/documents/{digest}.pdf`` when a bucket is configured,
+  so any instance can serve a page and the local tier is only a cache.
+
+Source objects are also remembered by S3 key and ETag, so processing the same
+upload again finds its stored copy without downloading it.
+
+Everything here blocks on disk or network; call it on the I/O pool.
+"""
+import hashlib
+import logging
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+from collections import Counter, OrderedDict
+from contextlib import contextmanager
+from typing import Any, Iterator, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+CACHE_DIR = os.getenv("DOCUMENT_CACHE_DIR") or os.path.join(tempfile.gettempdir(), "pdf-documents")
+CACHE_BYTES: Optional[int] = int(os.getenv("DOCUMENT_CACHE_BYTES", "0")) or None
+CACHE_DISK_SHARE = float(os.getenv("DOCUMENT_CACHE_DISK_SHARE", "0.5"))
+S3_PREFIX = "documents/"
+# (S3 key, ETag) pairs remembered per process
+SOURCES_SIZE = 4096
+
+_DIGEST = re.compile(r"^[0-9a-f]{64}$")
+_evict_lock = threading.Lock()
+_sources: "OrderedDict[Tuple[str, str], str]" = OrderedDict()
+_sources_lock = threading.Lock()
+_pins: "Counter[str]" = Counter()
+_pins_lock = threading.Lock()
+
+
+def is_digest(value: str) -> bool:
+    return bool(_DIGEST.match(value))
+
+
+def s3_key(digest: str) -> str:
+    return f"{S3_PREFIX}{digest}.pdf"
+
+
+def local_path(digest: str) -> str:
+    return os.path.join(CACHE_DIR, f"{digest}.pdf")
+
+
+def sha256_file(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def pin(digest: str) -> None:
+    """Keep the document in the local tier until a matching ``unpin``."""
+    with _pins_lock:
+        _pins[digest] += 1
+
+
+def unpin(digest: str) -> None:
+    with _pins_lock:
+        _pins[digest] -= 1
+        if _pins[digest] <= 0:
+            del _pins[digest]
+
+
+@contextmanager
+def pinned(digest: str) -> Iterator[None]:
+    pin(digest)
+    try:
+        yield
+    finally:
+        unpin(digest)
+
+
+def is_pinned(digest: str) -> bool:
+    with _pins_lock:
+        return digest in _pins
+
+
+def _touch(path: str) -> None:
+    os.utime(path, (time.time(), os.stat(path).st_mtime))
+
+
+def cache_limit(cached: int) -> int:
+    """The local tier's cap in bytes, given the ``cached`` bytes it holds now."""
+    if CACHE_BYTES:
+        return CACHE_BYTES
+    return int((shutil.disk_usage(CACHE_DIR).free + cached) * CACHE_DISK_SHARE)
+
+
+def _evict() -> None:
+    with _evict_lock:
+        entries = []
+        for name in os.listdir(CACHE_DIR):
+            if not name.endswith(".pdf"):
+                continue  # in-flight downloads
+            if is_pinned(name[:-len(".pdf")]):
+                continue
+            try:
+                st = os.stat(os.path.join(CACHE_DIR, name))
+            except FileNotFoundError:
+                continue
+            entries.append((st.st_atime, st.st_size, name))
+        total = sum(size for _, size, _ in entries)
+        limit = cache_limit(total)
+        for _, size, name in sorted(entries):
+            if total <= limit:
+                break
+            try:
+                os.unlink(os.path.join(CACHE_DIR, name))
+            except FileNotFoundError:
+                pass
+            total -= size
+
+
+def put(path: str, digest: str) -> str:
+    """Keep the file at ``path`` in the local tier; returns the stored path.
+
+    The stored copy is a hard link to ``path`` when both are on one file
+    system, so an upload is not held on disk twice while it is processed.
+    """
+    dst = local_path(digest)
+    if os.path.exists(dst):
+        _touch(dst)
+        return dst
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    try:
+        os.link(path, dst)
+    except FileExistsError:
+        pass  # stored concurrently
+    except OSError:
+        fd, tmp = tempfile.mkstemp(dir=CACHE_DIR, suffix=".part")
+        os.close(fd)
+        try:
+            shutil.copyfile(path, tmp)
+            os.replace(tmp, dst)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+    _touch(dst)
+    _evict()
+    return dst
+
+
+def persist(s3: Any, bucket: str, digest: str, path: Optional[str] = None, source_key: Optional[str] = None) -> None:
+    """Write the document to the S3 tier if it is not there yet, copying
+    server-side from ``source_key`` when the PDF already lives in the bucket."""
+    from botocore.exceptions import ClientError
+
+    key = s3_key(digest)
+    try:
+        s3.head_object(Bucket=bucket, Key=key)
+        return
+    except ClientError:
+        pass
+    if source_key:
+        s3.copy_object(Bucket=bucket, Key=key, CopySource={"Bucket": bucket, "Key": source_key},
+                       ContentType="application/pdf", MetadataDirective="REPLACE")
+    else:
+        s3.upload_file(path, bucket, key, ExtraArgs={"ContentType": "application/pdf"})
+
+
+def get(digest: str, s3: Any = None, bucket: Optional[str] = None) -> Optional[str]:
+    """Local path of the document, fetching it from S3 on a local miss."""
+    path = local_path(digest)
+    if os.path.exists(path):
+        _touch(path)
+        return path
+    if s3 is None or not bucket:
+        return None
+    from botocore.exceptions import ClientError
+
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=CACHE_DIR, suffix=".part")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            s3.download_fileobj(bucket, s3_key(digest), f)
+    except ClientError:
+        os.unlink(tmp)
+        return None
+    if sha256_file(tmp) != digest:
+        logger.warning(f"Stored document {digest} failed its digest check")
+        os.unlink(tmp)
+        return None
+    os.replace(tmp, path)
+    _evict()
+    return path
+
+
+def remember_source(key: str, etag: str, digest: str) -> None:
+    """Record that S3 object ``key`` at ``etag`` holds the document ``digest``."""
+    with _sources_lock:
+        _sources[(key, etag)] = digest
+        _sources.move_to_end((key, etag))
+        while len(_sources) > SOURCES_SIZE:
+            _sources.popitem(last=False)
+
+
+def source_digest(key: str, etag: str) -> Optional[str]:
+    with _sources_lock:
+        return _sources.get((key, etag))
@@ -0,0 +1,90 @@
+"""Bounded executors that keep blocking work off the event loop.
+
+- CPU pool: PyMuPDF rendering and PNG encoding. PyMuPDF holds the GIL while it
+  renders, so outside Lambda this is a pool of long-lived worker processes
+  (workers.py), recycled and watched per task; on Lambda, where each instance
+  serves one request and POSIX semaphores are unavailable, it falls back to
+  threads. Override with ``CPU_POOL_KIND=thread|process``.
+- I/O pool: boto3 and vision-backend calls, which release the GIL while they
+  wait on the network.
+
+Both pools are created on first use, or at startup (``start``, from the
+FastAPI lifespan under uvicorn), and sized by ``CPU_WORKERS`` /
+``IO_WORKERS``. Lambda never runs the lifespan (app.py), so there the pools
+are created lazily and kept for the life of the instance. Work submitted to
+the thread pools runs in a copy of the caller's context, so metrics labels
+and trace spans follow it.
+"""
+import asyncio
+import contextvars
+import functools
+import os
+import threading
+from concurrent.futures import Executor, ThreadPoolExecutor
+from typing import Any, Callable, Optional, TypeVar
+
+T = TypeVar("T")
+
+CPU_WORKERS = int(os.getenv("CPU_WORKERS") or os.cpu_count() or 1)
+IO_WORKERS = int(os.getenv("IO_WORKERS", "32"))
+CPU_POOL_KIND = os.getenv("CPU_POOL_KIND") or ("thread" if os.getenv("AWS_LAMBDA_FUNCTION_NAME") else "process")
+
+_lock = threading.Lock()
+_cpu_pool: Optional[Executor] = None
+_io_pool: Optional[ThreadPoolExecutor] = None
+
+
+def cpu_pool() -> Executor:
+    global _cpu_pool
+    if _cpu_pool is None:
+        with _lock:
+            if _cpu_pool is None:
+                if CPU_POOL_KIND == "process":
+                    import workers
+
+                    _cpu_pool = workers.WorkerPool(CPU_WORKERS)
+                else:
+                    _cpu_pool = ThreadPoolExecutor(CPU_WORKERS, thread_name_prefix="cpu")
+    return _cpu_pool
+
+
+def io_pool() -> ThreadPoolExecutor:
+    global _io_pool
+    if _io_pool is None:
+        with _lock:
+            if _io_pool is None:
+                _io_pool = ThreadPoolExecutor(IO_WORKERS, thread_name_prefix="io")
+    return _io_pool
+
+
+def _in_context(fn: Callable[..., T], *args: Any, **kwargs: Any) -> Callable[[], T]:
+    return functools.partial(contextvars.copy_context().run, fn, *args, **kwargs)
+
+
+async def run_cpu(fn: Callable[..., T], *args: Any) -> T:
+    """Run ``fn(*args)`` on the CPU pool. ``fn`` must be a picklable top-level function."""
+    pool = cpu_pool()
+    loop = asyncio.get_running_loop()
+    if isinstance(pool, ThreadPoolExecutor):
+        return await loop.run_in_executor(pool, _in_context(fn, *args))
+    return await loop.run_in_executor(pool, fn, *args)
+
+
+async def run_io(fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """Run a blocking network call on the I/O pool."""
+    return await asyncio.get_running_loop().run_in_executor(io_pool(), _in_context(fn, *args, **kwargs))
+
+
+def start() -> None:
+    """Create both pools now, so worker processes import PyMuPDF before the first request."""
+    cpu_pool()
+    io_pool()
+
+
+def shutdown(wait: bool = True) -> None:
+    global _cpu_pool, _io_pool
+    with _lock:
+        for pool in (_cpu_pool, _io_pool):
+            if pool is not None:
+                pool.shutdown(wait=wait, cancel_futures=True)
+        _cpu_pool = _io_pool = None
@@ -0,0 +1,148 @@
+"""Per-page fingerprints computed from a low-resolution grayscale preview.
+
+Runs on the CPU pool like render.py. Each page is rasterized once in
+grayscale at ``PREVIEW_DPI`` (a few milliseconds even for scans, versus
+seconds for a 300 DPI render and PNG encode) and reduced with NumPy to:
+
+- ``exact``: SHA-256 of the page's content streams and size, and of the raw
+  streams of every form XObject, image and font it draws, nested ones
+  included. Equal only for pages built from identical content.
+- ``dhash``: 64-bit difference hash of a 9x8 downsample (gradient layout).
+- ``phash``: 64-bit DCT hash of a 32x32 downsample (overall structure).
+- ``text``: SHA-256 of the normalized body text, leaving out the top and
+  bottom margins where headers, footers and page numbers sit. At 64 pixels
+  two title slides with different short titles hash alike, so near-duplicate
+  matching also requires equal body text.
+- ``has_text``: whether the page has a text layer at all. Scans have none, so
+  their text hashes are all equal and prove nothing.
+- ``blank``/``ink``: the blank-page classification from blank.py.
+"""
+import hashlib
+import re
+from dataclasses import dataclass
+from typing import Dict, List
+
+import numpy as np
+
+import blank
+import render
+
+PREVIEW_DPI = 36
+# Smallest preview side; tiny pages are rendered above PREVIEW_DPI to reach it
+MIN_PREVIEW_PX = 64
+# Share of the page height at top and bottom ignored by the text hash
+MARGIN = 0.08
+_DCT_SIZE = 32
+# Orthogonal DCT-II basis; phash is the sign pattern of the low frequencies
+_DCT = np.cos(np.pi * np.outer(np.arange(_DCT_SIZE), 2 * np.arange(_DCT_SIZE) + 1) / (2 * _DCT_SIZE))
+
+
+@dataclass
+class PageFingerprint:
+    page: int  # 1-based
+    exact: str
+    dhash: int
+    phash: int
+    text: str
+    blank: bool = False
+    ink: float = 0.0
+    has_text: bool = True
+
+
+def preview(page) -> np.ndarray:
+    """Grayscale rendering of the page at ``PREVIEW_DPI`` as float32 levels 0-255."""
+    import fitz  # PyMuPDF
+
+    rect = page.rect
+    dpi = max(PREVIEW_DPI, 72.0 * MIN_PREVIEW_PX / max(1.0, min(rect.width, rect.height)))
+    pix = page.get_pixmap(matrix=fitz.Matrix(dpi / 72.0, dpi / 72.0), colorspace=fitz.csGRAY, alpha=False)
+    pixels = np.frombuffer(pix.samples, dtype=np.uint8).reshape(pix.height, pix.stride)[:, : pix.width]
+    return pixels.astype(np.float32)
+
+
+def downsample(pixels: np.ndarray, height: int, width: int) -> np.ndarray:
+    """Area-average ``pixels`` down to ``height`` x ``width``."""
+    rows = np.linspace(0, pixels.shape[0], height + 1).astype(int)
+    cols = np.linspace(0, pixels.shape[1], width + 1).astype(int)
+    summed = np.add.reduceat(np.add.reduceat(pixels, rows[:-1], axis=0), cols[:-1], axis=1)
+    return summed / np.outer(np.diff(rows), np.diff(cols))
+
+
+def _pack(bits: np.ndarray) -> int:
+    return int.from_bytes(np.packbits(bits.astype(np.uint8).ravel()).tobytes(), "big")
+
+
+def dhash(pixels: np.ndarray) -> int:
+    small = downsample(pixels, 8, 9)
+    return _pack(small[:, 1:] > small[:, :-1])
+
+
+def phash(pixels: np.ndarray) -> int:
+    small = downsample(pixels, _DCT_SIZE, _DCT_SIZE)
+    low = (_DCT @ small @ _DCT.T)[:8, :8]
+    return _pack(low > np.median(low.ravel()[1:]))
+
+
+def _stream_digest(doc, kind: str, xref: int, cache: Dict[int, bytes]) -> bytes:
+    """Digest of one resource the page draws, cached per document by xref."""
+    if xref not in cache:
+        digest = hashlib.sha256(kind.encode())
+        if kind == "font":
+            # The embedded font program (empty for the base 14) plus how it is named and encoded
+            for key in ("Subtype", "BaseFont", "Encoding"):
+                digest.update(doc.xref_get_key(xref, key)[1].encode())
+            digest.update(doc.extract_font(xref)[3] or b"")
+        else:
+            if kind == "form":
+                for key in ("Matrix", "BBox"):
+                    digest.update(doc.xref_get_key(xref, key)[1].encode())
+            digest.update(doc.xref_stream_raw(xref) or b"")
+        cache[xref] = digest.digest()
+    return cache[xref]
+
+
+def _exact_hash(doc, page, resource_digests: Dict[int, bytes]) -> str:
+    digest = hashlib.sha256()
+    digest.update(f"{page.rect.width:.2f}x{page.rect.height:.2f}r{page.rotation}".encode())
+    digest.update(page.read_contents())
+    # Everything the content streams draw by name, including what nested form XObjects
+    # draw: pages placed with show_pdf_page all read "/fzFrm0 Do" and differ only here.
+    # Sorted by name and digest, so equal pages in different documents hash alike.
+    drawn = [(f"form:{x[1]}", _stream_digest(doc, "form", x[0], resource_digests)) for x in page.get_xobjects()]
+    drawn += [(f"image:{img[7]}", _stream_digest(doc, "image", img[0], resource_digests))
+              for img in page.get_images(full=True)]
+    drawn += [(f"font:{f[4]}", _stream_digest(doc, "font", f[0], resource_digests))
+              for f in page.get_fonts(full=True)]
+    for name, resource in sorted(drawn):
+        digest.update(name.encode())
+        digest.update(resource)
+    return digest.hexdigest()
+
+
+def _text_hash(blocks, rect) -> str:
+    lo, hi = rect.y0 + rect.height * MARGIN, rect.y1 - rect.height * MARGIN
+    body = [b[4] for b in blocks if b[1] >= lo and b[3] <= hi]
+    return hashlib.sha256(re.sub(r"\s+", " ", " ".join(body)).strip().lower().encode()).hexdigest()
+
+
+def fingerprint_pages(path: str, indices: List[int]) -> List[PageFingerprint]:
+    """Fingerprint pages (0-based indices) of the PDF at ``path``."""
+    resource_digests: Dict[int, bytes] = {}
+    out = []
+    with render.open_document(path) as doc:
+        for index in indices:
+            page = doc[index]
+            pixels = preview(page)
+            score = blank.classify(pixels)
+            blocks = [b for b in page.get_text("blocks") if b[6] == 0 and b[4].strip()]
+            out.append(PageFingerprint(
+                index + 1,
+                _exact_hash(doc, page, resource_digests),
+                dhash(pixels),
+                phash(pixels),
+                _text_hash(blocks, page.rect),
+                score.blank,
+                round(score.ink, 5),
+                bool(blocks),
+            ))
+    return out
@@ -0,0 +1,219 @@
+"""In-process processing jobs with partial results.
+
+``POST /jobs`` returns as soon as the document is stored; the pages are
+rendered and analyzed in the background and ``GET /jobs/{id}`` returns the
+ones finished so far. The first ``preview_pages`` pages (``JOB_PREVIEW_PAGES``,
+default 3) are processed ahead of the rest, so an editor sees the start of a
+long deck within seconds whatever its length.
+
+Progress is also kept as an event log per job, streamed as Server-Sent
+Events from ``GET /jobs/{id}/events``:
+
+- ``rendered``: page image ready (``ms`` render and encode time, ``format``);
+- ``analyzed``: page result published, including duplicates and blank pages;
+- ``failed``: the vision call for a page raised (``error``); a fallback
+  result follows as ``analyzed``;
+- ``done`` or ``error``: the job finished.
+
+Every event has a sequence number ``seq`` and ``t``, seconds since the job
+was created. Pages are served from the document endpoint rather than
+uploaded, so there is no per-page upload event.
+
+A batch (``POST /batches``) is a set of jobs started together, one per
+document; see scheduler.py for how their pages share the instance.
+
+Jobs live in this process only: at most ``JOB_MAX`` are kept, and finished
+jobs are dropped after ``JOB_TTL_SECONDS``. Background work needs a
+long-running server (container, uvicorn); a Lambda instance is frozen as soon
+as its response is returned.
+"""
+import asyncio
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+PREVIEW_PAGES = int(os.getenv("JOB_PREVIEW_PAGES", "3"))
+TTL_SECONDS = float(os.getenv("JOB_TTL_SECONDS", "3600"))
+MAX_JOBS = int(os.getenv("JOB_MAX", "256"))
+MAX_BATCH = int(os.getenv("BATCH_MAX_DOCUMENTS", "64"))
+# Comment lines sent on idle event streams so proxies keep them open
+SSE_HEARTBEAT_SECONDS = 15.0
+
+
+class Job:
+    """One document's processing state; results are published page by page.
+
+    Updated from the event loop only, so ``follow`` needs no locking.
+    """
+
+    def __init__(self, source: str, digest: str, pages: List[int], preview_pages: int = PREVIEW_PAGES):
+        self.id = uuid.uuid4().hex
+        self.source = source
+        self.digest = digest
+        self.pages = pages  # 1-based, in processing order
+        self.preview_pages = pages[:preview_pages]
+        self.state = "running"
+        self.error: Optional[str] = None
+        self.created = time.time()
+        self.finished: Optional[float] = None
+        self.results: Dict[int, Dict[str, Any]] = {}
+        self.extra: Dict[str, Any] = {}  # dedupe and blank_pages blocks
+        self.task: Optional["asyncio.Task[None]"] = None
+        self.events: List[Dict[str, Any]] = []
+        self._changed = asyncio.Event()
+
+    @property
+    def done(self) -> bool:
+        return self.state != "running"
+
+    def emit(self, type: str, **data: Any) -> None:
+        self.events.append({"seq": len(self.events) + 1, "type": type,
+                            "t": round(time.time() - self.created, 3), **data})
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    def rendered(self, page: Any) -> None:
+        """``on_rendered`` callback for a ``render.RenderedPage``."""
+        self.emit("rendered", page=page.page, ms=round((page.render_s + page.encode_s) * 1000, 1),
+                  format=page.format)
+
+    def failed(self, page: int, error: str) -> None:
+        self.emit("failed", page=page, error=error)
+
+    def publish(self, result: Dict[str, Any]) -> None:
+        page = result["page"]
+        first = page not in self.results
+        self.results[page] = {**result, "image_url": f"/documents/{self.digest}/pages/{page}"}
+        if first:
+            self.emit("analyzed", page=page, completed=len(self.results), total=len(self.pages),
+                      **{k: result[k] for k in ("duplicate_of", "blank") if k in result})
+
+    def finish(self, error: Optional[str] = None) -> None:
+        self.state = "failed" if error else "done"
+        self.error = error
+        self.finished = time.time()
+        if error:
+            self.emit("error", error=error)
+        else:
+            self.emit("done", completed=len(self.results))
+
+    async def follow(self, after: int = 0, heartbeat: float = SSE_HEARTBEAT_SECONDS) -> AsyncIterator[Optional[Dict[str, Any]]]:
+        """Events with ``seq > after`` as they happen, until the job is done;
+        None every ``heartbeat`` seconds without one."""
+        seen = after
+        while True:
+            changed = self._changed
+            while seen < len(self.events):
+                seen += 1
+                yield self.events[seen - 1]
+            if self.done:
+                return
+            try:
+                await asyncio.wait_for(changed.wait(), heartbeat)
+            except asyncio.TimeoutError:
+                yield None
+
+    def snapshot(self) -> Dict[str, Any]:
+        snap: Dict[str, Any] = {
+            "job_id": self.id,
+            "state": self.state,
+            "source": self.source,
+            "digest": self.digest,
+            "page_count": len(self.pages),
+            "completed": len(self.results),
+            "preview_ready": all(p in self.results for p in self.preview_pages),
+            "results": [self.results[p] for p in sorted(self.results)],
+            **self.extra,
+        }
+        if self.error:
+            snap["error"] = self.error
+        return snap
+
+
+class Batch:
+    def __init__(self):
+        self.id = uuid.uuid4().hex
+        self.created = time.time()
+        self.job_ids: Dict[str, str] = {}  # source key -> job id
+        self.errors: Dict[str, str] = {}  # source key -> why its job did not start
+
+    def snapshot(self, registry: "JobRegistry") -> Dict[str, Any]:
+        members = []
+        for key, job_id in self.job_ids.items():
+            job = registry.get(job_id)
+            if job is None:
+                members.append({"key": key, "job_id": job_id, "state": "expired"})
+                continue
+            members.append({"key": key, "job_id": job_id, "state": job.state,
+                            "page_count": len(job.pages), "completed": len(job.results)})
+        states = [m["state"] for m in members]
+        return {
+            "batch_id": self.id,
+            "state": "running" if "running" in states else "done",
+            "documents": len(self.job_ids) + len(self.errors),
+            "page_count": sum(m.get("page_count", 0) for m in members),
+            "completed": sum(m.get("completed", 0) for m in members),
+            "jobs": members,
+            "errors": self.errors,
+        }
+
+
+class JobRegistry:
+    def __init__(self, max_jobs: int = MAX_JOBS, ttl_seconds: float = TTL_SECONDS):
+        self.max_jobs = max_jobs
+        self.ttl_seconds = ttl_seconds
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._batches: "OrderedDict[str, Batch]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def add(self, job: Job) -> Job:
+        with self._lock:
+            self._prune()
+            self._jobs[job.id] = job
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            self._prune()
+            return self._jobs.get(job_id)
+
+    def add_batch(self, batch: Batch) -> Batch:
+        with self._lock:
+            self._batches[batch.id] = batch
+            while len(self._batches) > self.max_jobs:
+                self._batches.popitem(last=False)
+        return batch
+
+    def get_batch(self, batch_id: str) -> Optional[Batch]:
+        with self._lock:
+            return self._batches.get(batch_id)
+
+    def _prune(self) -> None:
+        # Called with the lock held; running jobs are never dropped
+        now = time.time()
+        for job_id, job in list(self._jobs.items()):
+            if job.done and (now - job.finished > self.ttl_seconds or len(self._jobs) >= self.max_jobs):
+                del self._jobs[job_id]
+
+
+_registry: Optional[JobRegistry] = None
+_registry_lock = threading.Lock()
+
+
+def get_registry() -> JobRegistry:
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                _registry = JobRegistry()
+    return _registry
+
+
+def set_registry(registry: Optional[JobRegistry]) -> None:
+    """Override the process-wide registry (tests, benchmarks); None resets to env."""
+    global _registry
+    with _registry_lock:
+        _registry = registry
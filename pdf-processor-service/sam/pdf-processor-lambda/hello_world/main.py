@@ -1,27 +1,58 @@
-from fastapi import FastAPI, File, UploadFile, HTTPException, Body
+from fastapi import FastAPI, File, Form, UploadFile, HTTPException, Body, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
-import fitz  # PyMuPDF
+from fastapi.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
+from starlette.routing import Match
+import asyncio
 import base64
-import io
+import contextvars
+import hashlib
 import os
-from typing import List, Dict, Any
-import openai
-from PIL import Image
+import tempfile
+from contextlib import asynccontextmanager, contextmanager
+from typing import AsyncIterator, Callable, Iterator, List, Dict, Any, Optional, Set, Tuple
 import json
 import logging
+import time
 import uuid
-import boto3
-from botocore.exceptions import ClientError
+
+from schemas import ANALYSIS_RESPONSE_FORMAT, SlideAnalysis, parse_model, reask_message
+from vision import get_vision_backend
+from clients import get_openai_client, get_s3_client
+import admission
+import deadline
+import dedup
+import documents
+import executors
+import jobs
+import metrics
+import offload
+import outputs
+import preflight
+import presign
+import render
+import s3_multipart
+import scheduler
+import tracing
+import uploads
+from metrics import stage
 
 # Configure logging
 LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
 logging.basicConfig(
     level=getattr(logging, LOG_LEVEL, logging.INFO),
-    format="%(asctime)s %(levelname)s %(name)s - %(message)s",
+    format="%(asctime)s %(levelname)s %(name)s [%(trace_id)s] - %(message)s",
 )
+tracing.install_log_filter()
 logger = logging.getLogger(__name__)
 
-app = FastAPI(title="PDF Processor Service", version="1.0.0")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    executors.start()
+    yield
+    executors.shutdown(wait=False)
+
+
+app = FastAPI(title="PDF Processor Service", version="1.0.0", lifespan=lifespan)
 
 # Configure CORS
 app.add_middleware(
@@ -32,66 +63,475 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Initialize OpenAI client
-openai_client = openai.OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-s3_client = boto3.client("s3")
+# SDK clients, PyMuPDF and NumPy are loaded on first use (see clients.py) so
+# /health and /presign-upload do not pay for them on a cold start.
 BUCKET_NAME = os.getenv("BUCKET_NAME")
 
+ANALYSIS_PROMPT = """Analyze this slide/page and extract:
+1. Main title or heading
+2. Key points or bullet points
+3. Any important data, numbers, or statistics
+4. Overall topic or theme
+5. Any action items or conclusions
+
+Respond with JSON: title, key_points, data_points, topic, action_items, summary (brief summary of the slide)."""
+S3_ANALYSIS_PROMPT = "Analyze this slide/page and extract main points and summary strictly as JSON with keys: title, key_points[], data_points[], topic, action_items[], summary."
+
+RENDER_DPI = 300
+# "default" serves qualifying embedded scans as stored; "png" always renders
+RENDER_PROFILE = render.PROFILES[os.getenv("RENDER_PROFILE", "default")]
+# Blank pages get a placeholder instead of a render and a vision call
+SKIP_BLANK_PAGES = os.getenv("SKIP_BLANK_PAGES", "1") != "0"
+# Bytes per read when streaming an S3 object to disk
+S3_READ_CHUNK = 1024 * 1024
+# Pages per fingerprinting task on the CPU pool
+FINGERPRINT_BATCH = 32
+# Vision calls in flight per request; the I/O pool caps the process-wide total
+VISION_CONCURRENCY = int(os.getenv("VISION_CONCURRENCY", "8"))
+# Pages per chunk when a request has a deadline (see deadline.py)
+DEADLINE_CHUNK_PAGES = int(os.getenv("DEADLINE_CHUNK_PAGES") or VISION_CONCURRENCY)
+
+
+def _route_label(request: Request) -> str:
+    """Route template for metric labels; unmatched paths collapse to 'other'."""
+    for route in app.routes:
+        match, _ = route.matches(request.scope)
+        if match == Match.FULL:
+            return getattr(route, "path", "other")
+    return "other"
+
+
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    if not metrics.ENABLED:
+        return await call_next(request)
+    endpoint = _route_label(request)
+    token = metrics.current_endpoint.set(endpoint)
+    started = time.perf_counter()
+    status = 500
+    try:
+        with metrics.IN_FLIGHT.track(endpoint=endpoint):
+            response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        metrics.REQUEST_SECONDS.observe(time.perf_counter() - started, endpoint=endpoint, status=str(status))
+        metrics.current_endpoint.reset(token)
+
+
+app.add_middleware(uploads.BodyLimit)
+
+
+@app.middleware("http")
+async def trace_requests(request: Request, call_next):
+    trace = tracing.trace_from_headers(request.headers)
+    token = tracing.current_trace.set(trace)
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        response.headers["X-Trace-Id"] = trace.trace_id
+        return response
+    finally:
+        trace.finish({"http.method": request.method, "http.route": _route_label(request), "http.status_code": status})
+        tracing.export(trace)
+        tracing.current_trace.reset(token)
+
+
+@contextmanager
+def _temp_pdf() -> Iterator[str]:
+    """A temp file path for a PDF fetched from S3, removed afterwards."""
+    fd, path = tempfile.mkstemp(suffix=".pdf")
+    os.close(fd)
+    try:
+        yield path
+    finally:
+        os.unlink(path)
+
+
+def _parse_pages(spec: Optional[str], page_count: int) -> List[int]:
+    """0-based page indices from a 1-based range list such as "1-3,7,10-"."""
+    if not spec:
+        return list(range(page_count))
+    selected = set()
+    for part in str(spec).replace(" ", "").split(","):
+        try:
+            if "-" in part:
+                lo, hi = part.split("-", 1)
+                first, last = int(lo or 1), int(hi or page_count)
+            else:
+                first = last = int(part)
+        except ValueError:
+            raise HTTPException(status_code=400, detail=f"Invalid page range: {part!r}")
+        if first < 1 or last < first or first > page_count:
+            raise HTTPException(status_code=400, detail=f"Page range {part!r} is outside 1-{page_count}")
+        selected.update(range(first - 1, min(last, page_count)))
+    return sorted(selected)
+
+
+@asynccontextmanager
+async def _admitted(path: str, pages: Optional[str] = None, max_pages: int = 0) -> AsyncIterator[List[int]]:
+    """Hold render budget for the pages about to be rendered; yields their
+    0-based indices, selected by the ``pages`` range list and ``max_pages``.
+
+    Raises admission.Overloaded (429) when the instance is out of budget.
+    """
+    sizes = await _page_sizes(path)
+    indices = _parse_pages(pages, len(sizes))
+    if max_pages > 0:
+        indices = indices[:max_pages]
+    async with _render_budget(sizes, indices):
+        yield indices
+
+
+async def _page_sizes(path: str) -> List[Tuple[float, float]]:
+    with stage("fitz_open"):
+        return await executors.run_cpu(render.page_sizes, path)
+
+
+def _render_budget(sizes: List[Tuple[float, float]], indices: List[int], background: bool = False):
+    """Admission for rendering pages ``indices`` (0-based) of a document with page ``sizes``.
+    Background work waits for budget instead of raising admission.Overloaded."""
+    cost = admission.render_cost([sizes[i] for i in indices], RENDER_DPI)
+    return admission.get_controller().admit(cost, background=background)
+
+
+# Background writes to the S3 tier, referenced until done so they are not collected
+_persisting: Set["asyncio.Task[None]"] = set()
+
+
+async def _persist_document(path: str, digest: str, source_key: Optional[str]) -> None:
+    try:
+        await executors.run_io(documents.persist, get_s3_client(), BUCKET_NAME, digest, path, source_key)
+    except Exception as e:
+        logger.warning(f"Could not persist document {digest}: {e}")
+
+
+@asynccontextmanager
+async def _stored_document(path: str, digest: str, source_key: Optional[str] = None) -> AsyncIterator[str]:
+    """Add the PDF to the document store so its pages can be fetched later.
+
+    Yields the stored copy, which is what gets processed: its path is stable
+    per content, so the render workers' open documents are reused across
+    requests. It is pinned in the local tier for the block. Falls back to
+    ``path`` if the local store cannot take it.
+
+    The copy to the S3 tier runs in the background, off the request path; on
+    Lambda it carries on during the instance's next invocations. Until it
+    lands only this instance can serve the document's pages.
+    """
+    with documents.pinned(digest):
+        try:
+            stored = await executors.run_io(documents.put, path, digest)
+        except Exception as e:
+            logger.warning(f"Could not store document {digest}: {e}")
+            yield path
+            return
+        if BUCKET_NAME:
+            documents.pin(digest)
+            task = asyncio.create_task(_persist_document(stored, digest, source_key), context=contextvars.Context())
+            _persisting.add(task)
+            task.add_done_callback(_persisting.discard)
+            task.add_done_callback(lambda _: documents.unpin(digest))
+        yield stored
+
+
+@asynccontextmanager
+async def _s3_document(key: str) -> AsyncIterator[Tuple[str, int, str]]:
+    """Stored path, size and digest of the PDF at S3 ``key``, pinned in the
+    document store for the block.
+
+    A source whose key and ETag were seen before is served from the document
+    store without downloading it again.
+    """
+    with stage("s3_head"):
+        etag = (await executors.run_io(get_s3_client().head_object, Bucket=BUCKET_NAME, Key=key)).get("ETag")
+    digest = documents.source_digest(key, etag) if etag else None
+    if digest:
+        with documents.pinned(digest):
+            path = await executors.run_io(documents.get, digest)
+            if path is not None:
+                yield path, os.path.getsize(path), digest
+                return
+    with _temp_pdf() as tmp:
+        size, digest = await executors.run_io(_s3_download, key, tmp, etag)
+        if etag:
+            documents.remember_source(key, etag, digest)
+        async with _stored_document(tmp, digest, key) as path:
+            yield path, size, digest
+
+
+async def _render_pages(
+    path: str,
+    indices: List[int],
+    profile: Optional["render.Profile"] = None,
+    on_rendered: Optional[Callable[["render.RenderedPage"], None]] = None,
+) -> List["render.RenderedPage"]:
+    """Page images (0-based indices) per the render profile, on the CPU pool, in order.
+    ``on_rendered`` is called with each page as soon as it is done."""
+    profile = profile or RENDER_PROFILE
+
+    async def render_one(index: int) -> "render.RenderedPage":
+        async with scheduler.get_scheduler("render").slot():
+            r = await executors.run_cpu(render.render_page, path, index, profile)
+        if on_rendered is not None:
+            on_rendered(r)
+        return r
+
+    rendered = await asyncio.gather(*(render_one(i) for i in indices))
+    for r in rendered:
+        if r.embedded:
+            metrics.observe_stage("embedded_image", r.render_s, r.started, page=r.page)
+            continue
+        metrics.observe_stage("render", r.render_s, r.started, page=r.page)
+        metrics.observe_stage("png_encode", r.encode_s, r.started + r.render_s, page=r.page)
+    metrics.count_pages(len(rendered))
+    return rendered
+
+
+async def _page_plan(path: str, indices: List[int], model: str, prompt: str, use_dedup: bool, skip_blank: bool) -> "dedup.Plan":
+    import fingerprint  # NumPy; kept off the cold-start path
+
+    batches = [indices[i:i + FINGERPRINT_BATCH] for i in range(0, len(indices), FINGERPRINT_BATCH)]
+    with stage("fingerprint"):
+        parts = await asyncio.gather(*(executors.run_cpu(fingerprint.fingerprint_pages, path, b) for b in batches))
+    return dedup.Plan([fp for part in parts for fp in part], model, prompt, dedupe=use_dedup, skip_blank=skip_blank)
+
+
+async def _pages_for_analysis(
+    path: str,
+    indices: List[int],
+    model: str,
+    prompt: str,
+    use_dedup: bool,
+    skip_blank: bool,
+    on_rendered: Optional[Callable[["render.RenderedPage"], None]] = None,
+) -> Tuple[List[Dict[str, Any]], Optional["dedup.Plan"]]:
+    """Render and base64 the pages that need a vision call.
+
+    With dedup on, only one page per duplicate group is rendered, and none
+    whose analysis is already stored; with skip_blank on, blank pages are
+    not rendered at all. The returned plan fans results out.
+    """
+    plan = await _page_plan(path, indices, model, prompt, use_dedup, skip_blank) if use_dedup or skip_blank else None
+    pages = plan.analyze_pages if plan else [i + 1 for i in indices]
+    return await _analysis_images(path, pages, on_rendered), plan
+
+
+async def _analysis_images(
+    path: str, pages: List[int], on_rendered: Optional[Callable[["render.RenderedPage"], None]] = None
+) -> List[Dict[str, Any]]:
+    """Render and base64 ``pages`` (1-based) for vision calls."""
+    return [
+        {"page": r.page, "image": _b64(r.data), "format": r.format}
+        for r in await _render_pages(path, [p - 1 for p in pages], on_rendered=on_rendered)
+    ]
+
+
+def _b64(data: bytes) -> str:
+    with stage("base64"):
+        return base64.b64encode(data).decode()
+
+
+def _s3_download(key: str, path: str, etag: Optional[str] = None) -> Tuple[int, str]:
+    """Stream an S3 object to ``path`` without holding it in memory; returns its size and SHA-256.
+    With ``etag`` the download fails rather than return a newer version."""
+    if etag is None:
+        with stage("s3_get"):
+            with open(path, "wb") as f:
+                get_s3_client().download_fileobj(BUCKET_NAME, key, f)
+        size = os.path.getsize(path)
+        metrics.count_bytes(size, "in")
+        return size, documents.sha256_file(path)
+    # download_fileobj does not take IfMatch (s3transfer's ALLOWED_DOWNLOAD_ARGS), so one
+    # conditional GET is streamed to disk instead, hashed on the way
+    digest = hashlib.sha256()
+    size = 0
+    with stage("s3_get"):
+        body = get_s3_client().get_object(Bucket=BUCKET_NAME, Key=key, IfMatch=etag)["Body"]
+        with open(path, "wb") as f:
+            for chunk in iter(lambda: body.read(S3_READ_CHUNK), b""):
+                f.write(chunk)
+                digest.update(chunk)
+                size += len(chunk)
+    metrics.count_bytes(size, "in")
+    return size, digest.hexdigest()
+
+
+def _put_page(digest: str, rendered: "render.RenderedPage") -> Dict[str, Any]:
+    """Store a page image under the document's content address unless it is
+    already there; returns the page's manifest entry."""
+    key = outputs.page_key(digest, RENDER_PROFILE.name, render.renderer_version(), rendered.page, rendered.format)
+    with stage("s3_put", page=rendered.page):
+        uploaded = outputs.put_page(get_s3_client(), BUCKET_NAME, key, rendered.data, rendered.format,
+                                    render.renderer_version())
+    if uploaded:
+        metrics.count_bytes(len(rendered.data), "out")
+    return {"page": rendered.page, "key": key, "format": rendered.format,
+            "width": rendered.width, "height": rendered.height, "bytes": len(rendered.data)}
+
+
+def _presign_keys(keys: List[str], expires: int = presign.EXPIRES_SECONDS) -> List[str]:
+    with stage("presign"):
+        return presign.get_signer(get_s3_client()).sign(BUCKET_NAME, keys, expires)
+
+
+async def _stored_pages(digest: str) -> Dict[int, Dict[str, Any]]:
+    """Page images already in S3 for the document and ``RENDER_PROFILE``, by page number."""
+    return await executors.run_io(outputs.load_manifest, get_s3_client(), BUCKET_NAME, digest,
+                                  RENDER_PROFILE.name, render.renderer_version())
+
+
+async def _store_pages(digest: str, rendered_pages: List["render.RenderedPage"],
+                       stored: Dict[int, Dict[str, Any]]) -> None:
+    """Upload page images in parallel and add them to ``stored`` and the manifest."""
+    entries = await asyncio.gather(*(executors.run_io(_put_page, digest, r) for r in rendered_pages))
+    stored.update((entry["page"], entry) for entry in entries)
+    await executors.run_io(outputs.save_manifest, get_s3_client(), BUCKET_NAME, digest,
+                           RENDER_PROFILE.name, render.renderer_version(), stored)
+
+
+async def _presign_pages(entries: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    urls = await executors.run_io(_presign_keys, [entry["key"] for entry in entries])
+    return [
+        {"page": entry["page"], "key": entry["key"], "url": url, "format": entry["format"]}
+        for entry, url in zip(entries, urls)
+    ]
+
+
+async def _upload_pages(digest: str, rendered_pages: List["render.RenderedPage"]) -> Tuple[str, List[Dict[str, Any]]]:
+    """Store page images under the document's content address; returns the
+    output prefix and per-page presigned GET URLs."""
+    stored = await _stored_pages(digest)
+    await _store_pages(digest, rendered_pages, stored)
+    images = await _presign_pages([stored[r.page] for r in rendered_pages])
+    return outputs.prefix(digest, RENDER_PROFILE.name, render.renderer_version()), images
+
+
+@app.exception_handler(admission.Overloaded)
+async def overloaded_handler(request: Request, exc: admission.Overloaded):
+    return JSONResponse(
+        status_code=429,
+        content={"detail": str(exc), "retry_after": exc.retry_after},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
+
+@app.exception_handler(uploads.UploadTooLarge)
+async def upload_too_large_handler(request: Request, exc: uploads.UploadTooLarge):
+    return JSONResponse(status_code=413, content={"detail": str(exc)})
+
+
 @app.get("/health")
 async def health_check():
     """Health check endpoint for Cloud Run"""
     return {"status": "healthy", "service": "pdf-processor"}
 
+@app.get("/metrics")
+async def metrics_endpoint():
+    """Prometheus scrape endpoint"""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
 @app.post("/convert-pdf")
-async def convert_pdf_to_images(file: UploadFile = File(...)):
-    """Convert PDF to images and return as base64 encoded strings"""
+async def convert_pdf_to_images(
+    file: UploadFile = File(...), pages: Optional[str] = Query(None), offload_mode: str = Query("auto", alias="offload")
+):
+    """Convert PDF to images and return as base64 encoded strings.
+    ``pages`` limits the work to a 1-based range list such as ``1-3,7``.
+    When the images would make the response too large for API Gateway they
+    are uploaded to S3 instead and returned as presigned URLs
+    (``offload=auto``; ``always`` or ``never`` to force either way).
+    """
     try:
         if not file.filename.lower().endswith('.pdf'):
             raise HTTPException(status_code=400, detail="File must be a PDF")
+        if offload_mode not in offload.MODES:
+            raise HTTPException(status_code=400, detail=f"offload must be one of {', '.join(offload.MODES)}")
         
-        # Read PDF content
-        pdf_content = await file.read()
-        logger.info(f"Processing PDF: {file.filename}, size: {len(pdf_content)} bytes")
-        
-        # Convert PDF to images using PyMuPDF
+        # Stream the upload to disk; PyMuPDF opens it by path
+        async with uploads.spool(file) as upload:
+            logger.info(f"Processing PDF: {file.filename}, size: {upload.size} bytes, sha256: {upload.sha256}")
+
+            # Convert PDF to images using PyMuPDF (300 DPI for good quality)
+            async with _stored_document(upload.path, upload.sha256) as path, _admitted(path, pages) as indices:
+                rendered_pages = await _render_pages(path, indices)
+
+        if offload.should_offload((len(r.data) for r in rendered_pages), offload_mode):
+            if BUCKET_NAME:
+                output_prefix, image_urls = await _upload_pages(upload.sha256, rendered_pages)
+                logger.info(f"Offloaded {len(image_urls)} pages to s3://{BUCKET_NAME}/{output_prefix}")
+                return {"success": True, "page_count": len(image_urls), "digest": upload.sha256, "offloaded": True,
+                        "output_prefix": output_prefix, "images": image_urls}
+            if offload_mode == "always":
+                raise HTTPException(status_code=500, detail="BUCKET_NAME not configured")
+            logger.warning("Response exceeds the offload threshold but BUCKET_NAME is not configured")
+
         images = []
-        pdf_document = fitz.open(stream=pdf_content, filetype="pdf")
-        
-        for page_num in range(pdf_document.page_count):
-            page = pdf_document[page_num]
-            
-            # Render page as image (300 DPI for good quality)
-            mat = fitz.Matrix(300/72, 300/72)  # 300 DPI scaling
-            pix = page.get_pixmap(matrix=mat)
-            
-            # Convert to PIL Image
-            img_data = pix.tobytes("png")
-            img = Image.open(io.BytesIO(img_data))
-            
-            # Convert to base64
-            buffer = io.BytesIO()
-            img.save(buffer, format='PNG')
-            img_base64 = base64.b64encode(buffer.getvalue()).decode()
-            
+        for rendered in rendered_pages:
+            img_base64 = _b64(rendered.data)
+            metrics.count_bytes(len(img_base64), "out")
             images.append({
-                "page": page_num + 1,
+                "page": rendered.page,
                 "image": img_base64,
-                "format": "png"
+                "format": rendered.format
             })
         
-        pdf_document.close()
         logger.info(f"Successfully converted {len(images)} pages")
         
         return {
             "success": True,
             "page_count": len(images),
+            "digest": upload.sha256,
+            "offloaded": False,
             "images": images
         }
         
+    except (HTTPException, admission.Overloaded, uploads.UploadTooLarge):
+        raise
     except Exception as e:
         logger.error(f"PDF conversion error: {str(e)}")
         raise HTTPException(status_code=500, detail=f"PDF conversion failed: {str(e)}")
 
+@app.post("/preflight")
+async def preflight_pdf(file: Optional[UploadFile] = File(None), key: Optional[str] = Form(None)):
+    """Inspect a PDF without rendering it: page count and sizes, text layer,
+    images, encryption and an estimated render time per page.
+    Send either a multipart ``file`` or a form field ``key`` naming an S3 object.
+    """
+    if file is None and not key:
+        raise HTTPException(status_code=400, detail="file or key is required")
+    if file is not None and not file.filename.lower().endswith(".pdf"):
+        raise HTTPException(status_code=400, detail="File must be a PDF")
+    if file is None and not BUCKET_NAME:
+        raise HTTPException(status_code=500, detail="BUCKET_NAME not configured")
+    try:
+        if file is not None:
+            source = file.filename
+            async with uploads.spool(file) as upload:
+                size, digest = upload.size, upload.sha256
+                with stage("preflight"):
+                    info = await executors.run_cpu(preflight.inspect, upload.path, RENDER_DPI)
+        else:
+            source = key
+            with _temp_pdf() as path:
+                size, digest = await executors.run_io(_s3_download, key, path)
+                with stage("preflight"):
+                    info = await executors.run_cpu(preflight.inspect, path, RENDER_DPI)
+        sizes = [(p["width"], p["height"]) for p in info["pages"]]
+        return {
+            "success": True,
+            "filename": source,
+            "size_bytes": size,
+            "digest": digest,
+            **info,
+            "render_cost_mp": round(admission.render_cost(sizes, RENDER_DPI), 1),
+        }
+    except uploads.UploadTooLarge:
+        raise
+    except Exception as e:
+        logger.error(f"Preflight error: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Preflight failed: {str(e)}")
+
 @app.post("/presign-upload")
 async def presign_upload(
     payload: Dict[str, Any] = Body(..., embed=True)
@@ -107,22 +547,196 @@ async def presign_upload(
     if not filename or not filename.lower().endswith(".pdf"):
         raise HTTPException(status_code=400, detail="filename must end with .pdf")
 
-    key = f"uploads/{uuid.uuid4().hex}-{os.path.basename(filename)}"
+    from botocore.exceptions import ClientError
+
+    key = _upload_key(filename)
     try:
-        url = s3_client.generate_presigned_url(
-            "put_object",
-            Params={"Bucket": BUCKET_NAME, "Key": key, "ContentType": content_type},
-            ExpiresIn=3600,
-        )
+        with stage("presign"):
+            url = await executors.run_io(
+                get_s3_client().generate_presigned_url,
+                "put_object",
+                Params={"Bucket": BUCKET_NAME, "Key": key, "ContentType": content_type},
+                ExpiresIn=3600,
+            )
         return {"success": True, "upload_url": url, "key": key, "bucket": BUCKET_NAME}
     except ClientError as e:
         logger.error(f"Presign error: {e}")
         raise HTTPException(status_code=500, detail="Failed to generate presigned URL")
 
+@app.post("/presign-batch")
+async def presign_batch(payload: Dict[str, Any] = Body(..., embed=True)):
+    """Fresh presigned GET URLs for many page images in one call, e.g. to
+    rebuild a slide viewer after the URLs from ``/convert-from-s3`` expired.
+    Request body: { keys: string[], expires?: number }
+    Only keys under ``outputs/`` are signed; the others are listed in ``errors``.
+    """
+    if not BUCKET_NAME:
+        raise HTTPException(status_code=500, detail="BUCKET_NAME not configured")
+    keys = payload.get("keys") or []
+    if not isinstance(keys, list) or not keys or not all(isinstance(k, str) and k for k in keys):
+        raise HTTPException(status_code=400, detail="keys must be a non-empty list of S3 keys")
+    if len(keys) > presign.MAX_KEYS:
+        raise HTTPException(status_code=400, detail=f"At most {presign.MAX_KEYS} keys per call")
+    expires = payload.get("expires", presign.EXPIRES_SECONDS)
+    if not isinstance(expires, int) or not 1 <= expires <= presign.MAX_EXPIRES_SECONDS:
+        raise HTTPException(status_code=400, detail=f"expires must be 1 to {presign.MAX_EXPIRES_SECONDS} seconds")
+
+    from botocore.exceptions import BotoCoreError, ClientError
+
+    signable = list(dict.fromkeys(k for k in keys if k.startswith(outputs.PREFIX)))
+    try:
+        urls = await executors.run_io(_presign_keys, signable, expires) if signable else []
+    except (BotoCoreError, ClientError) as e:
+        logger.error(f"Presign error: {e}")
+        raise HTTPException(status_code=500, detail="Failed to generate presigned URLs")
+    return {"success": True, "expires_in": expires, "urls": dict(zip(signable, urls)),
+            "errors": {k: f"not under {outputs.PREFIX}" for k in keys if not k.startswith(outputs.PREFIX)}}
+
+
+def _upload_key(filename: str) -> str:
+    return f"uploads/{uuid.uuid4().hex}-{os.path.basename(filename)}"
+
+
+def _multipart_ids(payload: Dict[str, Any]) -> Tuple[str, str]:
+    if not BUCKET_NAME:
+        raise HTTPException(status_code=500, detail="BUCKET_NAME not configured")
+    key, upload_id = payload.get("key"), payload.get("upload_id")
+    if not key or not upload_id:
+        raise HTTPException(status_code=400, detail="key and upload_id are required")
+    return key, upload_id
+
+
+def _multipart_error(e: Exception) -> HTTPException:
+    code = getattr(e, "response", {}).get("Error", {}).get("Code")
+    if code == "NoSuchUpload":
+        return HTTPException(status_code=404, detail="Upload not found")
+    if code in ("InvalidPart", "InvalidPartOrder", "EntityTooSmall"):
+        return HTTPException(status_code=400, detail=f"Invalid parts: {code}")
+    logger.error(f"Multipart upload error: {e}")
+    return HTTPException(status_code=500, detail="Multipart upload failed")
+
+
+@app.post("/multipart-uploads")
+async def create_multipart_upload(payload: Dict[str, Any] = Body(..., embed=True)):
+    """Start a multipart upload of a large PDF directly to S3.
+    Request body: { filename: string, size: number, contentType?: string }
+    Returns the recommended ``part_size`` and presigned URLs for the first
+    parts (all of them unless there are more than 1000). PUT bytes
+    ``[(n - 1) * part_size, n * part_size)`` of the file to part ``n``'s URL,
+    keep each response's ``ETag`` header and finish with
+    ``/multipart-uploads/complete``.
+    """
+    if not BUCKET_NAME:
+        raise HTTPException(status_code=500, detail="BUCKET_NAME not configured")
+    filename = payload.get("filename")
+    if not filename or not filename.lower().endswith(".pdf"):
+        raise HTTPException(status_code=400, detail="filename must end with .pdf")
+    try:
+        size = int(payload.get("size") or 0)
+        if size <= 0:
+            raise ValueError("size must be a positive byte count")
+        part_size = s3_multipart.part_size(size)
+    except (TypeError, ValueError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    part_count = s3_multipart.part_count(size, part_size)
+
+    from botocore.exceptions import ClientError
+
+    key = _upload_key(filename)
+    s3 = get_s3_client()
+    try:
+        upload_id = await executors.run_io(s3_multipart.create, s3, BUCKET_NAME, key,
+                                           payload.get("contentType", "application/pdf"))
+        with stage("presign"):
+            parts = await executors.run_io(s3_multipart.presign_parts, s3, BUCKET_NAME, key, upload_id,
+                                           range(1, min(part_count, s3_multipart.MAX_PRESIGN_PARTS) + 1))
+    except ClientError as e:
+        raise _multipart_error(e)
+    return {"success": True, "bucket": BUCKET_NAME, "key": key, "upload_id": upload_id,
+            "part_size": part_size, "part_count": part_count, "parts": parts}
+
+
+@app.post("/multipart-uploads/parts")
+async def presign_multipart_parts(payload: Dict[str, Any] = Body(..., embed=True)):
+    """Presign URLs for more parts, or fresh ones after expiry, and list the
+    parts S3 already has so that a resumed upload can skip them.
+    Request body: { key: string, upload_id: string, part_numbers?: number[] }
+    """
+    key, upload_id = _multipart_ids(payload)
+    numbers = payload.get("part_numbers") or []
+    if not isinstance(numbers, list) or not all(isinstance(n, int) and 1 <= n <= s3_multipart.MAX_PARTS for n in numbers):
+        raise HTTPException(status_code=400, detail=f"part_numbers must be integers from 1 to {s3_multipart.MAX_PARTS}")
+    if len(numbers) > s3_multipart.MAX_PRESIGN_PARTS:
+        raise HTTPException(status_code=400, detail=f"At most {s3_multipart.MAX_PRESIGN_PARTS} parts per call")
+
+    from botocore.exceptions import ClientError
+
+    s3 = get_s3_client()
+    try:
+        # Also checks that the upload exists before signing for it
+        uploaded = await executors.run_io(s3_multipart.uploaded_parts, s3, BUCKET_NAME, key, upload_id)
+        with stage("presign"):
+            parts = await executors.run_io(s3_multipart.presign_parts, s3, BUCKET_NAME, key, upload_id, numbers)
+    except ClientError as e:
+        raise _multipart_error(e)
+    return {"success": True, "key": key, "upload_id": upload_id, "parts": parts, "uploaded": uploaded}
+
+
+@app.post("/multipart-uploads/complete")
+async def complete_multipart_upload(payload: Dict[str, Any] = Body(..., embed=True)):
+    """Assemble the uploaded parts into the PDF, which can be processed as soon as this returns.
+    Request body: { key: string, upload_id: string, parts?: [{part_number, etag}], start_job?: boolean }
+    Without ``parts`` every part S3 has received is used. ``start_job``
+    also starts a ``/jobs`` job for the new document.
+    """
+    key, upload_id = _multipart_ids(payload)
+    parts = payload.get("parts")
+    if parts is not None and not (
+        isinstance(parts, list) and all(isinstance(p, dict) and "part_number" in p and "etag" in p for p in parts)
+    ):
+        raise HTTPException(status_code=400, detail="parts must be a list of {part_number, etag}")
+    if payload.get("start_job") and get_vision_backend().requires_api_key and not os.getenv("OPENAI_API_KEY"):
+        raise HTTPException(status_code=500, detail="OpenAI API key not configured")
+
+    from botocore.exceptions import ClientError
+
+    try:
+        etag = await executors.run_io(s3_multipart.complete, get_s3_client(), BUCKET_NAME, key, upload_id, parts)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except ClientError as e:
+        raise _multipart_error(e)
+    result: Dict[str, Any] = {"success": True, "bucket": BUCKET_NAME, "key": key, "etag": etag}
+    if payload.get("start_job"):
+        async with _s3_document(key) as (path, _, digest):
+            job = await _start_job(key, path, digest, payload.get("pages"), jobs.PREVIEW_PAGES,
+                                   dedup.ENABLED, SKIP_BLANK_PAGES)
+        result.update(job_id=job.id, status_url=f"/jobs/{job.id}", digest=digest)
+    return result
+
+
+@app.post("/multipart-uploads/abort")
+async def abort_multipart_upload(payload: Dict[str, Any] = Body(..., embed=True)):
+    """Discard an unfinished multipart upload and the parts stored for it.
+    Request body: { key: string, upload_id: string }
+    """
+    key, upload_id = _multipart_ids(payload)
+
+    from botocore.exceptions import ClientError
+
+    try:
+        await executors.run_io(s3_multipart.abort, get_s3_client(), BUCKET_NAME, key, upload_id)
+    except ClientError as e:
+        raise _multipart_error(e)
+    return {"success": True, "key": key, "upload_id": upload_id}
+
+
 @app.post("/convert-from-s3")
 async def convert_from_s3(payload: Dict[str, Any] = Body(..., embed=True)):
     """Convert a PDF stored in S3 to images, upload images back to S3, and return presigned URLs.
-    Request body: { key: string }
+    Request body: { key: string, pages?: string }
+    Images are stored by document digest (see outputs.py): pages already
+    stored for the same content are reused, counted in ``reused``.
     """
     if not BUCKET_NAME:
         raise HTTPException(status_code=500, detail="BUCKET_NAME not configured")
@@ -130,313 +744,493 @@ async def convert_from_s3(payload: Dict[str, Any] = Body(..., embed=True)):
     if not key:
         raise HTTPException(status_code=400, detail="key is required")
     try:
-        obj = s3_client.get_object(Bucket=BUCKET_NAME, Key=key)
-        pdf_content = obj["Body"].read()
-        logger.info(f"Processing S3 PDF: s3://{BUCKET_NAME}/{key}, size: {len(pdf_content)} bytes")
-
-        # Prepare an output prefix to group images by job
-        job_id = uuid.uuid4().hex
-        output_prefix = f"outputs/{job_id}"
-
-        image_urls: List[Dict[str, Any]] = []
-        pdf_document = fitz.open(stream=pdf_content, filetype="pdf")
-        for page_num in range(pdf_document.page_count):
-            page = pdf_document[page_num]
-            mat = fitz.Matrix(300/72, 300/72)
-            pix = page.get_pixmap(matrix=mat)
-            img_bytes = pix.tobytes("png")
-
-            # Upload to S3
-            out_key = f"{output_prefix}/page-{page_num+1}.png"
-            s3_client.put_object(
-                Bucket=BUCKET_NAME,
-                Key=out_key,
-                Body=img_bytes,
-                ContentType="image/png",
-            )
-            # Generate presigned GET URL
-            url = s3_client.generate_presigned_url(
-                "get_object",
-                Params={"Bucket": BUCKET_NAME, "Key": out_key},
-                ExpiresIn=3600,
-            )
-            image_urls.append({"page": page_num + 1, "key": out_key, "url": url})
-        pdf_document.close()
-        return {"success": True, "page_count": len(image_urls), "output_prefix": output_prefix, "images": image_urls}
+        async with _s3_document(key) as (path, size, digest):
+            logger.info(f"Processing S3 PDF: s3://{BUCKET_NAME}/{key}, size: {size} bytes")
+            sizes = await _page_sizes(path)
+            indices = _parse_pages(payload.get("pages"), len(sizes))
+            # Pages an earlier request already stored are not rendered again
+            stored = await _stored_pages(digest)
+            missing = [i for i in indices if i + 1 not in stored]
+            rendered_pages = []
+            if missing:
+                async with _render_budget(sizes, missing):
+                    rendered_pages = await _render_pages(path, missing)
+
+        if rendered_pages:
+            await _store_pages(digest, rendered_pages, stored)
+        image_urls = await _presign_pages([stored[i + 1] for i in indices])
+        return {"success": True, "page_count": len(image_urls), "digest": digest,
+                "output_prefix": outputs.prefix(digest, RENDER_PROFILE.name, render.renderer_version()),
+                "reused": len(indices) - len(missing), "images": image_urls}
+    except (HTTPException, admission.Overloaded):
+        raise
     except Exception as e:
         logger.error(f"S3 convert error: {str(e)}")
         raise HTTPException(status_code=500, detail=f"S3 convert failed: {str(e)}")
 
 @app.post("/process-pdf-with-ai")
-async def process_pdf_with_ai(file: UploadFile = File(...)):
-    """Convert PDF to images and process with OpenAI Vision API"""
+async def process_pdf_with_ai(file: UploadFile = File(...), pages: Optional[str] = Query(None)):
+    """Convert PDF to images and process with OpenAI Vision API.
+    ``pages`` limits the work to a 1-based range list such as ``1-3,7``.
+    """
     try:
         if not file.filename.lower().endswith('.pdf'):
             raise HTTPException(status_code=400, detail="File must be a PDF")
         
-        if not os.getenv("OPENAI_API_KEY"):
+        if get_vision_backend().requires_api_key and not os.getenv("OPENAI_API_KEY"):
             raise HTTPException(status_code=500, detail="OpenAI API key not configured")
         
-        # Read PDF content
-        pdf_content = await file.read()
-        logger.info(f"Processing PDF with AI: {file.filename}, size: {len(pdf_content)} bytes")
-        
-        # Convert PDF to images
-        images = []
-        pdf_document = fitz.open(stream=pdf_content, filetype="pdf")
-        
-        for page_num in range(pdf_document.page_count):
-            page = pdf_document[page_num]
-            
-            # Render page as image (300 DPI)
-            mat = fitz.Matrix(300/72, 300/72)
-            pix = page.get_pixmap(matrix=mat)
-            
-            # Convert to base64 for OpenAI
-            img_data = pix.tobytes("png")
-            img_base64 = base64.b64encode(img_data).decode()
-            
-            images.append({
-                "page": page_num + 1,
-                "image": img_base64
-            })
-        
-        pdf_document.close()
+        # Stream the upload to disk; PyMuPDF opens it by path
+        async with uploads.spool(file) as upload:
+            logger.info(f"Processing PDF with AI: {file.filename}, size: {upload.size} bytes, sha256: {upload.sha256}")
+
+            # Convert PDF to images (300 DPI), base64 for OpenAI
+            async with _stored_document(upload.path, upload.sha256) as path, _admitted(path, pages) as indices:
+                images, plan = await _pages_for_analysis(
+                    path, indices, "gpt-4o", ANALYSIS_PROMPT, dedup.ENABLED, SKIP_BLANK_PAGES)
         
         # Process with OpenAI Vision API
-        ai_results = []
-        
-        for img_data in images:
-            try:
-                response = openai_client.chat.completions.create(
-                    model="gpt-4o",
-                    messages=[
-                        {
-                            "role": "user",
-                            "content": [
-                                {
-                                    "type": "text",
-                                    "text": """Analyze this slide/page and extract:
-1. Main title or heading
-2. Key points or bullet points
-3. Any important data, numbers, or statistics
-4. Overall topic or theme
-5. Any action items or conclusions
-
-Format your response as JSON with these fields:
-- title: string
-- key_points: array of strings
-- data_points: array of strings
-- topic: string
-- action_items: array of strings
-- summary: string (brief summary of the slide)"""
-                                },
-                                {
-                                    "type": "image_url",
-                                    "image_url": {
-                                        "url": f"data:image/png;base64,{img_data['image']}"
-                                    }
-                                }
-                            ]
-                        }
-                    ],
-                    max_tokens=1000
-                )
-                
-                # Parse AI response with robust JSON extraction
-                ai_content = response.choices[0].message.content
-                def try_extract_json(text: str):
-                    try:
-                        return json.loads(text)
-                    except Exception:
-                        first = text.find('{')
-                        last = text.rfind('}')
-                        if first != -1 and last != -1 and last > first:
-                            slice_txt = text[first:last+1]
-                            try:
-                                return json.loads(slice_txt)
-                            except Exception:
-                                return None
-                        return None
-                parsed = try_extract_json(ai_content)
-                if parsed is None:
-                    ai_json = {
-                        "title": "",
-                        "key_points": [],
-                        "data_points": [],
-                        "topic": "",
-                        "action_items": [],
-                        "summary": ai_content
-                    }
-                else:
-                    ai_json = parsed
-                
-                ai_results.append({
-                    "page": img_data["page"],
-                    "analysis": ai_json
-                })
-                
-            except Exception as ai_error:
-                logger.error(f"AI processing error for page {img_data['page']}: {str(ai_error)}")
-                ai_results.append({
-                    "page": img_data["page"],
-                    "analysis": {
-                        "title": f"Page {img_data['page']}",
-                        "key_points": [],
-                        "data_points": [],
-                        "topic": "Analysis Failed",
-                        "action_items": [],
-                        "summary": f"AI analysis failed: {str(ai_error)}"
-                    }
-                })
+        ai_results = await _analyze_pages(images, ANALYSIS_PROMPT, model="gpt-4o", empty_topic="",
+                                          on_success=plan.remember if plan else None)
+        if plan:
+            ai_results = plan.fan_out(ai_results, _blank_analysis)
         
         logger.info(f"Successfully processed {len(ai_results)} pages with AI")
         
-        return {
+        resp: Dict[str, Any] = {
             "success": True,
-            "page_count": len(images),
+            "page_count": len(indices),
             "filename": file.filename,
+            "digest": upload.sha256,
             "results": ai_results
         }
+        if plan and plan.dedupe:
+            resp["dedupe"] = plan.summary()
+        if plan and SKIP_BLANK_PAGES:
+            resp["blank_pages"] = plan.blank_pages
+        return resp
         
+    except (HTTPException, admission.Overloaded, uploads.UploadTooLarge):
+        raise
     except Exception as e:
         logger.error(f"PDF AI processing error: {str(e)}")
         raise HTTPException(status_code=500, detail=f"PDF AI processing failed: {str(e)}")
 
-def _extract_json_with_diagnostics(text: str) -> Dict[str, Any]:
-    """Try hard to extract a JSON object from model text; return diagnostics."""
-    diags = {
-        "had_fence": False,
-        "direct_parse_ok": False,
-        "fenced_parse_ok": False,
-        "brace_slice_parse_ok": False,
-        "error": None,
+def _analyze_page(
+    img_base64: str, prompt: str, model: str, debug: bool = False, page: int = 0, image_format: str = "png"
+) -> Optional[Dict[str, Any]]:
+    """Run one vision call with a strict JSON-schema response format.
+
+    The reply is validated into SlideAnalysis; a reply that still fails
+    validation is re-asked once with the validation error before giving up.
+    """
+    messages: List[Dict[str, Any]] = [
+        {
+            "role": "user",
+            "content": [
+                {"type": "text", "text": prompt},
+                {"type": "image_url", "image_url": {"url": f"data:{render.MIME_TYPES[image_format]};base64,{img_base64}"}},
+            ],
+        }
+    ]
+    for attempt in range(2):
+        with stage("vision", page=page, attempt=attempt):
+            reply = get_vision_backend().complete(
+                model=model,
+                messages=messages,
+                response_format=ANALYSIS_RESPONSE_FORMAT,
+                max_tokens=1000,
+            )
+        metrics.count_tokens(reply.prompt_tokens, reply.completion_tokens)
+        ai_content = reply.content
+        if debug:
+            preview = ai_content[:240].replace("\n", " ")
+            logger.info(f"AI raw page {page} attempt={attempt} content len={len(ai_content)} preview={preview}")
+        parsed, diags = parse_model(SlideAnalysis, ai_content)
+        if debug:
+            logger.info(f"AI parse page {page} attempt={attempt} diags={diags}")
+        if parsed is not None:
+            return parsed.model_dump()
+        messages.append({"role": "assistant", "content": ai_content})
+        messages.append(reask_message(diags["error"]))
+    return None
+
+
+def _blank_analysis(page: int) -> Dict[str, Any]:
+    return _fallback_analysis(page, "Blank Page", "Blank page; not analyzed.")
+
+
+def _fallback_analysis(page: int, topic: str, summary: str = "") -> Dict[str, Any]:
+    return {
+        "title": f"Page {page}",
+        "key_points": [],
+        "data_points": [],
+        "topic": topic,
+        "action_items": [],
+        "summary": summary,
     }
-    try:
-        obj = json.loads(text)
-        diags["direct_parse_ok"] = True
-        return obj, diags
-    except Exception as e:
-        diags["error"] = str(e)
-    # fenced block
-    import re
-    fence = re.search(r"```json[\s\S]*?```", text, flags=re.IGNORECASE) or re.search(r"```[\s\S]*?```", text)
-    candidate = None
-    if fence:
-        diags["had_fence"] = True
-        candidate = fence.group(0)
-        candidate = re.sub(r"```json|```", "", candidate, flags=re.IGNORECASE).strip()
-        try:
-            obj = json.loads(candidate)
-            diags["fenced_parse_ok"] = True
-            return obj, diags
-        except Exception as e:
-            diags["error"] = str(e)
-    # brace slice
-    t = candidate if candidate is not None else text
-    first = t.find("{")
-    last = t.rfind("}")
-    if first != -1 and last != -1 and last > first:
-        slice_txt = t[first:last+1]
-        # clean: trailing commas, smart quotes
-        slice_txt = re.sub(r",\s*([}\]])", r"\1", slice_txt)
-        slice_txt = slice_txt.replace("“", '"').replace("”", '"').replace("‘", "'").replace("’", "'")
-        try:
-            obj = json.loads(slice_txt)
-            diags["brace_slice_parse_ok"] = True
-            return obj, diags
-        except Exception as e:
-            diags["error"] = str(e)
-    return None, diags
+
+
+async def _analyze_pages(
+    images: List[Dict[str, Any]],
+    prompt: str,
+    model: str,
+    empty_topic: str,
+    debug: bool = False,
+    on_success: Optional[Callable[[int, Dict[str, Any]], None]] = None,
+    on_result: Optional[Callable[[Dict[str, Any]], None]] = None,
+    on_error: Optional[Callable[[int, str], None]] = None,
+) -> List[Dict[str, Any]]:
+    """Analyze rendered pages concurrently on the I/O pool; results keep page order.
+
+    ``on_success(page, analysis)`` is called for every page the model
+    answered, as opposed to the fallbacks used when it fails, and
+    ``on_error(page, message)`` for every page whose call raised;
+    ``on_result(result)`` for every page as soon as it is done.
+    """
+    limit = asyncio.Semaphore(VISION_CONCURRENCY)
+
+    async def analyze(img_data: Dict[str, Any]) -> Dict[str, Any]:
+        async with limit, scheduler.get_scheduler("vision").slot():
+            try:
+                ai_json = await executors.run_io(
+                    _analyze_page, img_data["image"], prompt, model, debug, img_data["page"], img_data.get("format", "png"))
+                if ai_json is None:
+                    ai_json = _fallback_analysis(img_data["page"], empty_topic)
+                elif on_success is not None:
+                    on_success(img_data["page"], ai_json)
+            except Exception as ai_error:
+                logger.error(f"AI processing error for page {img_data['page']}: {str(ai_error)}")
+                ai_json = _fallback_analysis(img_data["page"], "Analysis Failed", f"AI analysis failed: {str(ai_error)}")
+                if on_error is not None:
+                    on_error(img_data["page"], str(ai_error))
+        result = {"page": img_data["page"], "analysis": ai_json}
+        if on_result is not None:
+            on_result(result)
+        return result
+
+    return list(await asyncio.gather(*(analyze(img_data) for img_data in images)))
 
 
 @app.post("/process-from-s3")
-async def process_from_s3(payload: Dict[str, Any] = Body(..., embed=True)):
+async def process_from_s3(request: Request, payload: Dict[str, Any] = Body(..., embed=True)):
     """Process a PDF stored in S3 with OpenAI Vision.
-    Request body: { key: string }
+    Request body: { key: string, pages?: string, max_pages?: number, debug?: boolean, dedupe?: boolean, skip_blank?: boolean }
+    or { continuation: string } to resume a response that ran out of time.
+
+    With a deadline (Lambda remaining time, ``X-Deadline-Ms``) the whole
+    range is fingerprinted and deduplicated once, then the pages that need a
+    vision call are analyzed in chunks; when another chunk would not fit, the
+    response has ``complete: false``, the pages finished so far and a
+    ``continuation`` token for the rest.
     """
     if not BUCKET_NAME:
         raise HTTPException(status_code=500, detail="BUCKET_NAME not configured")
-    if not os.getenv("OPENAI_API_KEY"):
+    if get_vision_backend().requires_api_key and not os.getenv("OPENAI_API_KEY"):
         raise HTTPException(status_code=500, detail="OpenAI API key not configured")
-    key = payload.get("key")
-    max_pages = int(payload.get("max_pages") or 0)  # 0 = all
+    limit = deadline.from_request(request.scope, request.headers)
+    token = None
+    if payload.get("continuation"):
+        try:
+            token = deadline.decode_token(str(payload["continuation"]))
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    options = token or payload
+    key = options.get("key")
+    pages = options.get("pages")
+    max_pages = int(payload.get("max_pages") or 0) if token is None else 0  # 0 = all
+    use_dedup = dedup.ENABLED and options.get("dedupe", True) is not False
+    skip_blank = bool(options.get("skip_blank", SKIP_BLANK_PAGES))
     debug_flag = bool(payload.get("debug") or os.getenv("DEBUG_LOGS") == "1")
     if not key:
         raise HTTPException(status_code=400, detail="key is required")
     try:
-        obj = s3_client.get_object(Bucket=BUCKET_NAME, Key=key)
-        pdf_content = obj["Body"].read()
-        logger.info(f"Processing S3 PDF with AI: s3://{BUCKET_NAME}/{key}, size: {len(pdf_content)} bytes, max_pages={max_pages or 'all'}, debug={debug_flag}")
-
-        images = []
-        pdf_document = fitz.open(stream=pdf_content, filetype="pdf")
-        total = pdf_document.page_count
-        pages_to_process = total if max_pages <= 0 else min(max_pages, total)
-        for page_num in range(pages_to_process):
-            page = pdf_document[page_num]
-            mat = fitz.Matrix(300/72, 300/72)
-            pix = page.get_pixmap(matrix=mat)
-            img_data = pix.tobytes("png")
-            img_base64 = base64.b64encode(img_data).decode()
-            images.append({"page": page_num + 1, "image": img_base64})
-            if debug_flag:
-                logger.info(f"Prepared page {page_num+1}: raw_png_bytes={len(img_data)}, b64_len={len(img_base64)}")
-        pdf_document.close()
-
-        ai_results = []
-        for img_data in images:
-            try:
-                response = openai_client.chat.completions.create(
-                    model="gpt-4o-mini",
-                    messages=[
-                        {
-                            "role": "user",
-                            "content": [
-                                {"type": "text", "text": "Analyze this slide/page and extract main points and summary strictly as JSON with keys: title, key_points[], data_points[], topic, action_items[], summary."},
-                                {"type": "image_url", "image_url": {"url": f"data:image/png;base64,{img_data['image']}"}},
-                            ],
-                        }
-                    ],
-                    max_tokens=1000,
-                )
-                ai_content = response.choices[0].message.content
-                if debug_flag:
-                    preview = ai_content[:240].replace("\n", " ")
-                    logger.info(f"AI raw page {img_data['page']} content len={len(ai_content)} preview={preview}")
-                parsed, diags = _extract_json_with_diagnostics(ai_content)
+        async with _s3_document(key) as (path, size, digest):
+            if token is not None and token.get("digest") != digest:
+                raise HTTPException(status_code=409, detail="Document changed since the continuation token was issued")
+            logger.info(f"Processing S3 PDF with AI: s3://{BUCKET_NAME}/{key}, size: {size} bytes, max_pages={max_pages or 'all'}, debug={debug_flag}")
+            sizes = await _page_sizes(path)
+            indices = _parse_pages(pages, len(sizes))
+            if max_pages > 0:
+                indices = indices[:max_pages]
+            # Plan the whole range up front, so duplicates in different chunks are still merged
+            plan = (await _page_plan(path, indices, "gpt-4o-mini", S3_ANALYSIS_PROMPT, use_dedup, skip_blank)
+                    if use_dedup or skip_blank else None)
+            to_analyze = plan.analyze_pages if plan else [i + 1 for i in indices]
+            chunk = DEADLINE_CHUNK_PAGES if limit.at is not None else max(1, len(to_analyze))
+            analyzed: List[Dict[str, Any]] = []
+            done = 0
+            slowest = 0.0
+            while done < len(to_analyze):
+                if done and not limit.allows(slowest):
+                    break
+                started = time.perf_counter()
+                part = to_analyze[done:done + chunk]
+                try:
+                    async with _render_budget(sizes, [p - 1 for p in part]):
+                        images = await _analysis_images(path, part)
+                except admission.Overloaded:
+                    if not done:
+                        raise
+                    break  # return what is done; the token resumes the rest
                 if debug_flag:
-                    logger.info(f"AI parse page {img_data['page']} diags={diags}")
-                if parsed is None:
-                    ai_json = {
-                        "title": f"Page {img_data['page']}",
-                        "key_points": [],
-                        "data_points": [],
-                        "topic": "Content Analysis",
-                        "action_items": [],
-                        "summary": ai_content[:200] + ("..." if len(ai_content) > 200 else ""),
-                    }
-                else:
-                    ai_json = parsed
-                ai_results.append({"page": img_data["page"], "analysis": ai_json})
-            except Exception as ai_error:
-                logger.error(f"AI processing error for page {img_data['page']}: {str(ai_error)}")
-                ai_results.append({"page": img_data["page"], "analysis": {"title": f"Page {img_data['page']}", "key_points": [], "data_points": [], "topic": "Analysis Failed", "action_items": [], "summary": f"AI analysis failed: {str(ai_error)}"}})
+                    for img_data in images:
+                        logger.info(f"Prepared page {img_data['page']}: b64_len={len(img_data['image'])}")
+                analyzed.extend(await _analyze_pages(
+                    images, S3_ANALYSIS_PROMPT, model="gpt-4o-mini", empty_topic="Content Analysis",
+                    debug=debug_flag, on_success=plan.remember if plan else None))
+                done += len(part)
+                slowest = max(slowest, time.perf_counter() - started)
+            # Pages whose group was not reached are left out, and resumed by the token
+            ai_results = plan.fan_out(analyzed, _blank_analysis) if plan else sorted(analyzed, key=lambda r: r["page"])
+            remaining = sorted(set(indices) - {r["page"] - 1 for r in ai_results})
 
-        resp: Dict[str, Any] = {"success": True, "page_count": len(images), "filename": key, "results": ai_results}
+        resp: Dict[str, Any] = {"success": True, "page_count": len(ai_results), "filename": key, "digest": digest,
+                                "complete": not remaining, "results": ai_results}
+        if remaining:
+            resp["remaining_pages"] = len(remaining)
+            resp["continuation"] = deadline.encode_token({
+                "key": key, "digest": digest, "pages": _format_pages(remaining),
+                "dedupe": use_dedup, "skip_blank": skip_blank,
+            })
+        if plan and plan.dedupe:
+            resp["dedupe"] = plan.summary()
+        if skip_blank:
+            resp["blank_pages"] = plan.blank_pages
         if debug_flag:
             # include lightweight diagnostics only
-            resp["debug"] = {"pages": len(images)}
+            trace = tracing.current_trace.get()
+            resp["debug"] = {"pages": len(ai_results), "rendered": done}
+            if trace is not None:
+                resp["debug"]["trace_id"] = trace.trace_id
+                resp["debug"]["slowest_spans"] = trace.slowest(10)
         return resp
+    except (HTTPException, admission.Overloaded):
+        raise
     except Exception as e:
         logger.error(f"S3 AI processing error: {str(e)}")
         raise HTTPException(status_code=500, detail=f"S3 AI processing failed: {str(e)}")
 
+
+def _format_pages(indices: List[int]) -> str:
+    """1-based range list, as ``_parse_pages`` reads it, for 0-based ``indices``."""
+    parts: List[List[int]] = []
+    for i in sorted(indices):
+        if parts and parts[-1][1] == i:
+            parts[-1][1] = i + 1
+        else:
+            parts.append([i + 1, i + 1])
+    return ",".join(f"{a}" if a == b else f"{a}-{b}" for a, b in parts)
+
+
+@app.post("/jobs", status_code=202)
+async def create_job(
+    file: Optional[UploadFile] = File(None),
+    key: Optional[str] = Form(None),
+    pages: Optional[str] = Form(None),
+    preview_pages: int = Form(jobs.PREVIEW_PAGES),
+    dedupe: bool = Form(True),
+    skip_blank: bool = Form(SKIP_BLANK_PAGES),
+):
+    """Start analyzing a PDF in the background and return its job id at once.
+    Send either a multipart ``file`` or a form field ``key`` naming an S3
+    object. The first ``preview_pages`` pages are finished first; poll
+    ``GET /jobs/{job_id}`` for results as they arrive.
+    """
+    if file is None and not key:
+        raise HTTPException(status_code=400, detail="file or key is required")
+    if file is not None and not file.filename.lower().endswith(".pdf"):
+        raise HTTPException(status_code=400, detail="File must be a PDF")
+    if file is None and not BUCKET_NAME:
+        raise HTTPException(status_code=500, detail="BUCKET_NAME not configured")
+    if get_vision_backend().requires_api_key and not os.getenv("OPENAI_API_KEY"):
+        raise HTTPException(status_code=500, detail="OpenAI API key not configured")
+    try:
+        if file is not None:
+            source = file.filename
+            async with uploads.spool(file) as upload:
+                digest = upload.sha256
+                async with _stored_document(upload.path, digest) as path:
+                    job = await _start_job(source, path, digest, pages, preview_pages, dedup.ENABLED and dedupe, skip_blank)
+        else:
+            async with _s3_document(key) as (path, _, digest):
+                job = await _start_job(key, path, digest, pages, preview_pages, dedup.ENABLED and dedupe, skip_blank)
+    except (HTTPException, uploads.UploadTooLarge):
+        raise
+    except Exception as e:
+        logger.error(f"Job creation error: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Job creation failed: {str(e)}")
+    return {"success": True, "job_id": job.id, "status_url": f"/jobs/{job.id}", "digest": digest,
+            "page_count": len(job.pages)}
+
+
+@app.post("/batches", status_code=202)
+async def create_batch(payload: Dict[str, Any] = Body(..., embed=True)):
+    """Start one job per S3 key; all of them share the render pool and the
+    vision scheduler, which interleave their pages fairly.
+    Request body: { keys: string[], pages?: string, preview_pages?: number, dedupe?: boolean, skip_blank?: boolean }
+    """
+    if not BUCKET_NAME:
+        raise HTTPException(status_code=500, detail="BUCKET_NAME not configured")
+    if get_vision_backend().requires_api_key and not os.getenv("OPENAI_API_KEY"):
+        raise HTTPException(status_code=500, detail="OpenAI API key not configured")
+    keys = payload.get("keys") or []
+    if not isinstance(keys, list) or not keys or not all(isinstance(k, str) and k for k in keys):
+        raise HTTPException(status_code=400, detail="keys must be a non-empty list of S3 keys")
+    if len(keys) > jobs.MAX_BATCH:
+        raise HTTPException(status_code=400, detail=f"At most {jobs.MAX_BATCH} keys per batch")
+    preview_pages = int(payload.get("preview_pages", jobs.PREVIEW_PAGES))
+    use_dedup = dedup.ENABLED and payload.get("dedupe", True) is not False
+    skip_blank = bool(payload.get("skip_blank", SKIP_BLANK_PAGES))
+
+    async def start(key: str) -> "jobs.Job":
+        async with _s3_document(key) as (path, _, digest):
+            return await _start_job(key, path, digest, payload.get("pages"), preview_pages, use_dedup, skip_blank)
+
+    started = await asyncio.gather(*(start(k) for k in keys), return_exceptions=True)
+    batch = jobs.Batch()
+    for key, outcome in zip(keys, started):
+        if isinstance(outcome, BaseException):
+            detail = outcome.detail if isinstance(outcome, HTTPException) else str(outcome)
+            logger.error(f"Batch {batch.id}: could not start {key}: {detail}")
+            batch.errors[key] = detail
+        else:
+            batch.job_ids[key] = outcome.id
+    jobs.get_registry().add_batch(batch)
+    return {"success": True, "batch_id": batch.id, "status_url": f"/batches/{batch.id}",
+            "jobs": batch.job_ids, "errors": batch.errors}
+
+
+@app.get("/batches/{batch_id}")
+async def get_batch(batch_id: str):
+    """State of every job in a batch; results are on each job."""
+    registry = jobs.get_registry()
+    batch = registry.get_batch(batch_id)
+    if batch is None:
+        raise HTTPException(status_code=404, detail="Batch not found")
+    return batch.snapshot(registry)
+
+
+async def _start_job(
+    source: str, path: str, digest: str, pages: Optional[str], preview_pages: int, use_dedup: bool, skip_blank: bool
+) -> "jobs.Job":
+    # The job runs after the request's temp files are gone, reading the stored
+    # copy; call this while the caller still has it pinned
+    if path != documents.local_path(digest):
+        raise HTTPException(status_code=503, detail="Document store unavailable")
+    sizes = await _page_sizes(path)
+    indices = _parse_pages(pages, len(sizes))
+    job = jobs.get_registry().add(jobs.Job(source, digest, [i + 1 for i in indices], max(0, preview_pages)))
+    documents.pin(digest)
+    # A fresh context: the job outlives this request's trace and metric labels
+    job.task = asyncio.create_task(_run_job(job, path, sizes, use_dedup, skip_blank), context=contextvars.Context())
+    job.task.add_done_callback(lambda _: documents.unpin(digest))
+    return job
+
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    """Job state and the results finished so far, in page order."""
+    job = jobs.get_registry().get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job.snapshot()
+
+
+async def _run_job(job: "jobs.Job", path: str, sizes: List[Tuple[float, float]], use_dedup: bool, skip_blank: bool) -> None:
+    """Render and analyze a job's pages, preview pages first, publishing each result when ready."""
+    metrics.current_endpoint.set("/jobs")
+    trace = tracing.Trace(uuid.uuid4().hex, name="job")
+    tracing.current_trace.set(trace)
+    indices = [p - 1 for p in job.pages]
+    cut = len(job.preview_pages)
+    error = None
+    try:
+        for phase in (indices[:cut], indices[cut:]):
+            if not phase:
+                continue
+            async with _render_budget(sizes, phase, background=True):
+                images, plan = await _pages_for_analysis(
+                    path, phase, "gpt-4o-mini", S3_ANALYSIS_PROMPT, use_dedup, skip_blank, on_rendered=job.rendered)
+            results = await _analyze_pages(images, S3_ANALYSIS_PROMPT, model="gpt-4o-mini", empty_topic="Content Analysis",
+                                           on_success=plan.remember if plan else None, on_result=job.publish,
+                                           on_error=job.failed)
+            if plan:
+                for result in plan.fan_out(results, _blank_analysis):
+                    job.publish(result)
+                if plan.dedupe:
+                    job.extra.setdefault("dedupe", []).append(plan.summary())
+                if skip_blank:
+                    job.extra.setdefault("blank_pages", []).extend(plan.blank_pages)
+    except Exception as e:
+        logger.error(f"Job {job.id} failed: {str(e)}")
+        error = str(e)
+    finally:
+        job.finish(error)
+        trace.finish({"job.id": job.id, "job.state": job.state})
+        tracing.export(trace)
+
+
+@app.get("/jobs/{job_id}/events")
+async def job_events(request: Request, job_id: str):
+    """Server-Sent Events for a job: ``rendered``, ``analyzed`` and ``failed``
+    per page, then ``done`` or ``error``. Each event's ``id`` is its sequence
+    number, so a reconnecting client resumes after ``Last-Event-ID``.
+    """
+    job = jobs.get_registry().get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    try:
+        after = int(request.headers.get("last-event-id") or 0)
+    except ValueError:
+        after = 0
+
+    async def stream() -> AsyncIterator[str]:
+        async for event in job.follow(after, heartbeat=jobs.SSE_HEARTBEAT_SECONDS):
+            if event is None:
+                yield ": keepalive\n\n"
+            else:
+                yield f"id: {event['seq']}\nevent: {event['type']}\ndata: {json.dumps(event)}\n\n"
+
+    return StreamingResponse(stream(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+@app.get("/documents/{digest}/pages/{n}")
+async def document_page(request: Request, digest: str, n: int, profile: str = Query("default")):
+    """One page (1-based) of a previously processed document as an image.
+    ``digest`` is the document's SHA-256 from a processing response. The
+    response never changes for a given URL, so it is cached for a year and
+    revalidated with its ETag.
+    """
+    if not documents.is_digest(digest) or n < 1:
+        raise HTTPException(status_code=404, detail="Page not found")
+    if profile not in render.PROFILES:
+        raise HTTPException(status_code=400, detail=f"Unknown profile: {profile}")
+    etag = f'"{digest}-{n}-{profile}-{render.renderer_version()}"'
+    cache_headers = {"ETag": etag, "Cache-Control": "public, max-age=31536000, immutable"}
+    if etag in [t.strip() for t in request.headers.get("if-none-match", "").split(",")]:
+        return Response(status_code=304, headers=cache_headers)
+    s3 = get_s3_client() if BUCKET_NAME else None
+    with documents.pinned(digest):
+        path = await executors.run_io(documents.get, digest, s3, BUCKET_NAME)
+        if path is None:
+            raise HTTPException(status_code=404, detail="Document not found")
+        sizes = await _page_sizes(path)
+        if n > len(sizes):
+            raise HTTPException(status_code=404, detail="Page not found")
+        async with _render_budget(sizes, [n - 1]):
+            rendered = (await _render_pages(path, [n - 1], render.PROFILES[profile]))[0]
+    metrics.count_bytes(len(rendered.data), "out")
+    return Response(rendered.data, media_type=render.MIME_TYPES[rendered.format], headers=cache_headers)
+
+
 @app.get("/diagnostics/openai")
 async def diagnostics_openai():
     try:
         # Simple, fast text-only check
-        resp = openai_client.chat.completions.create(
+        resp = await executors.run_io(
+            get_openai_client().chat.completions.create,
             model="gpt-4o-mini",
             messages=[{"role": "user", "content": "Say OK"}],
             max_tokens=5,
@@ -454,7 +1248,14 @@ async def root():
         "version": "1.0.0",
         "endpoints": {
             "health": "/health",
+            "metrics": "/metrics",
+            "preflight": "/preflight",
+            "multipart_uploads": "/multipart-uploads",
+            "presign_batch": "/presign-batch",
             "convert_pdf": "/convert-pdf",
+            "document_page": "/documents/{digest}/pages/{n}",
+            "jobs": "/jobs",
+            "batches": "/batches",
             "process_pdf_with_ai": "/process-pdf-with-ai"
         }
     }
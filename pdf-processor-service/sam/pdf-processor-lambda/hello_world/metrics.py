@@ -0,0 +1,228 @@
+"""In-process metrics exposed on /metrics in Prometheus text format.
+
+Kept dependency-free so the Lambda bundle does not grow. Recording is a
+couple of ``perf_counter`` calls and a locked dict update; set
+``METRICS_ENABLED=0`` to turn every timer and counter into a no-op.
+
+    with stage("render"):
+        pix = page.get_pixmap(matrix=mat)
+
+Stage timings are labeled with the endpoint of the request being served,
+which the HTTP middleware publishes through ``current_endpoint``. Each timed
+stage is also recorded as a span on the request's trace (see tracing.py),
+with any keyword arguments to ``stage`` as span attributes.
+"""
+import bisect
+import contextvars
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import tracing
+
+ENABLED = os.getenv("METRICS_ENABLED", "1") != "0"
+
+current_endpoint: contextvars.ContextVar[str] = contextvars.ContextVar("current_endpoint", default="none")
+
+LabelKey = Tuple[str, ...]
+
+# Seconds; spans sub-millisecond base64 up to multi-minute whole requests
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: LabelKey, extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> LabelKey:
+        return tuple(str(labels.get(n, "")) for n in self.labelnames)
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[LabelKey, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        if not ENABLED:
+            return
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels: str) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return self.header() + [f"{self.name}{_labels(self.labelnames, k)} {v:g}" for k, v in items]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, amount: float = 1.0, **labels: str) -> None:
+        self.inc(-amount, **labels)
+
+    @contextmanager
+    def track(self, **labels: str) -> Iterator[None]:
+        self.inc(**labels)
+        try:
+            yield
+        finally:
+            self.dec(**labels)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # per label set: [bucket counts..., +Inf count], sum
+        self._values: Dict[LabelKey, Tuple[List[int], float]] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        if not ENABLED:
+            return
+        key = self._key(labels)
+        idx = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts, total = self._values.get(key) or ([0] * (len(self.buckets) + 1), 0.0)
+            counts[idx] += 1
+            self._values[key] = (counts, total + value)
+
+    def count(self, **labels: str) -> int:
+        entry = self._values.get(self._key(labels))
+        return sum(entry[0]) if entry else 0
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = sorted((k, (list(c), s)) for k, (c, s) in self._values.items())
+        lines = self.header()
+        for key, (counts, total) in items:
+            cumulative = 0
+            for bound, n in zip(self.buckets + (float("inf"),), counts):
+                cumulative += n
+                le = "+Inf" if bound == float("inf") else f"{bound:g}"
+                bucket_labels = _labels(self.labelnames, key, 'le="' + le + '"')
+                lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, key)} {total:g}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, key)} {cumulative}")
+        return lines
+
+
+REGISTRY: List[_Metric] = []
+
+
+def _register(metric):
+    REGISTRY.append(metric)
+    return metric
+
+
+STAGE_SECONDS = _register(Histogram(
+    "pdf_stage_duration_seconds", "Time spent in one processing stage.", ("endpoint", "stage")))
+REQUEST_SECONDS = _register(Histogram(
+    "pdf_request_duration_seconds", "End-to-end request latency.", ("endpoint", "status")))
+PAGES = _register(Counter("pdf_pages_total", "Pages processed.", ("endpoint",)))
+BYTES = _register(Counter("pdf_bytes_total", "Bytes read or produced.", ("endpoint", "direction")))
+TOKENS = _register(Counter("pdf_vision_tokens_total", "Vision model tokens.", ("endpoint", "kind")))
+IN_FLIGHT = _register(Gauge("pdf_requests_in_flight", "Requests currently being served.", ("endpoint",)))
+ADMISSION_MP = _register(Gauge(
+    "pdf_admission_in_flight_megapixels", "Render cost of admitted requests."))
+ADMISSION_QUEUED = _register(Gauge("pdf_admission_queued_requests", "Requests waiting for render budget."))
+ADMISSION_REJECTED = _register(Counter("pdf_admission_rejected_total", "Requests rejected with 429.", ("reason",)))
+DEDUP_PAGES = _register(Counter(
+    "pdf_dedup_pages_total", "Pages by dedup outcome (analyzed, duplicate, store_hit, blank).", ("outcome",)))
+
+
+class _NullTimer:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class _StageTimer:
+    __slots__ = ("stage", "endpoint", "attrs", "started", "elapsed")
+
+    def __init__(self, stage: str, endpoint: Optional[str], attrs: Dict[str, Any]):
+        self.stage = stage
+        self.endpoint = endpoint
+        self.attrs = attrs
+        self.elapsed = 0.0
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.elapsed = time.perf_counter() - self.started
+        if ENABLED:
+            STAGE_SECONDS.observe(self.elapsed, endpoint=self.endpoint or current_endpoint.get(), stage=self.stage)
+        tracing.record(self.stage, self.started, self.elapsed, self.attrs)
+        return False
+
+
+def stage(name: str, endpoint: Optional[str] = None, **attrs: Any):
+    """Context manager timing one stage into ``pdf_stage_duration_seconds``
+    and the active trace."""
+    if not ENABLED and tracing.current_trace.get() is None:
+        return _NULL_TIMER
+    return _StageTimer(name, endpoint, attrs)
+
+
+def observe_stage(name: str, elapsed: float, started: float, endpoint: Optional[str] = None, **attrs: Any) -> None:
+    """Record a stage timed elsewhere (e.g. in a pool process); ``started`` is epoch seconds."""
+    if ENABLED:
+        STAGE_SECONDS.observe(elapsed, endpoint=endpoint or current_endpoint.get(), stage=name)
+    tracing.record_at(name, started, elapsed, attrs)
+
+
+def count_pages(n: int = 1) -> None:
+    PAGES.inc(n, endpoint=current_endpoint.get())
+
+
+def count_bytes(n: int, direction: str) -> None:
+    BYTES.inc(n, endpoint=current_endpoint.get(), direction=direction)
+
+
+def count_tokens(prompt: int, completion: int) -> None:
+    endpoint = current_endpoint.get()
+    TOKENS.inc(prompt, endpoint=endpoint, kind="prompt")
+    TOKENS.inc(completion, endpoint=endpoint, kind="completion")
+
+
+def render() -> str:
+    lines: List[str] = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
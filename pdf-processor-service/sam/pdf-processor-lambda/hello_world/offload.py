@@ -0,0 +1,31 @@
+"""Moving large responses out of the HTTP payload.
+
+API Gateway and Lambda reject response bodies over 6 MB, which a real deck
+at 300 DPI exceeds when its pages are returned inline as base64. The
+response size is estimated before it is built: base64 grows each image by
+4/3, plus a little JSON per page. Past ``OFFLOAD_THRESHOLD_BYTES`` (default
+5 MiB, leaving headroom for headers and the rest of the body) the pages are
+uploaded to S3 and the response lists presigned URLs instead.
+"""
+import os
+from typing import Iterable
+
+THRESHOLD_BYTES = int(os.getenv("OFFLOAD_THRESHOLD_BYTES", str(5 * 1024 * 1024)))
+# JSON keys, page number and format per inline image
+_PER_PAGE_BYTES = 64
+_ENVELOPE_BYTES = 256
+
+MODES = ("auto", "always", "never")
+
+
+def inline_bytes(image_sizes: Iterable[int]) -> int:
+    """Estimated JSON size of a response carrying these images inline."""
+    return _ENVELOPE_BYTES + sum(4 * ((n + 2) // 3) + _PER_PAGE_BYTES for n in image_sizes)
+
+
+def should_offload(image_sizes: Iterable[int], mode: str = "auto") -> bool:
+    if mode == "always":
+        return True
+    if mode == "never":
+        return False
+    return inline_bytes(image_sizes) > THRESHOLD_BYTES
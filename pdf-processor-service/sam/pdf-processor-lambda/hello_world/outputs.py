@@ -0,0 +1,79 @@
+"""Content-addressed layout of rendered page images in S3.
+
+    outputs/{digest}/{profile}/{renderer}/page-{n}.{ext}
+    outputs/{digest}/{profile}/{renderer}/manifest.json
+
+A page image depends only on the document, the render profile and the
+renderer (PyMuPDF's version), all of which are in its key, so reprocessing a
+PDF reuses what an earlier run stored. The manifest lists the stored pages: a
+repeat request finds prior output with one GET and renders only the pages it
+does not list. A page missing from the manifest is still checked with a HEAD
+before it is uploaded, which also covers manifest updates lost to a
+concurrent writer (last writer wins).
+
+Page images are never overwritten, since a new renderer writes under new
+keys, so they carry a year-long immutable ``Cache-Control``. Everything here
+blocks on the network; call it on the I/O pool.
+"""
+import json
+from typing import Any, Dict
+
+import render
+
+PREFIX = "outputs/"
+CACHE_CONTROL = "public, max-age=31536000, immutable"
+# File extensions for page image keys
+EXTENSIONS = {"png": "png", "jpeg": "jpg"}
+
+
+def prefix(digest: str, profile: str, renderer: str) -> str:
+    return f"{PREFIX}{digest}/{profile}/{renderer}"
+
+
+def page_key(digest: str, profile: str, renderer: str, page: int, image_format: str) -> str:
+    return f"{prefix(digest, profile, renderer)}/page-{page}.{EXTENSIONS[image_format]}"
+
+
+def manifest_key(digest: str, profile: str, renderer: str) -> str:
+    return f"{prefix(digest, profile, renderer)}/manifest.json"
+
+
+def load_manifest(s3: Any, bucket: str, digest: str, profile: str, renderer: str) -> Dict[int, Dict[str, Any]]:
+    """Stored pages by page number; empty when there is no manifest or it
+    was written by another renderer version."""
+    from botocore.exceptions import ClientError
+
+    try:
+        body = s3.get_object(Bucket=bucket, Key=manifest_key(digest, profile, renderer))["Body"].read()
+    except ClientError:
+        return {}
+    manifest = json.loads(body)
+    if manifest.get("renderer") != renderer:
+        return {}
+    return {entry["page"]: entry for entry in manifest.get("pages", [])}
+
+
+def save_manifest(s3: Any, bucket: str, digest: str, profile: str, renderer: str,
+                  pages: Dict[int, Dict[str, Any]]) -> None:
+    manifest = {
+        "digest": digest,
+        "profile": profile,
+        "renderer": renderer,
+        "pages": [pages[p] for p in sorted(pages)],
+    }
+    s3.put_object(Bucket=bucket, Key=manifest_key(digest, profile, renderer), Body=json.dumps(manifest).encode(),
+                  ContentType="application/json", CacheControl="no-cache")
+
+
+def put_page(s3: Any, bucket: str, key: str, data: bytes, image_format: str, renderer: str) -> bool:
+    """Upload a page image unless its key is already taken; returns whether it uploaded."""
+    from botocore.exceptions import ClientError
+
+    try:
+        s3.head_object(Bucket=bucket, Key=key)
+        return False
+    except ClientError:
+        pass
+    s3.put_object(Bucket=bucket, Key=key, Body=data, ContentType=render.MIME_TYPES[image_format],
+                  CacheControl=CACHE_CONTROL, Metadata={"renderer": renderer})
+    return True
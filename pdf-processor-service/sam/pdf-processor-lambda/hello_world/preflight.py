@@ -0,0 +1,70 @@
+"""Cheap document inspection for planning and routing.
+
+``inspect`` reads only the document structure: page boxes, font and image
+resources, and the encryption dictionary. It never rasterizes, so a 500-page
+PDF is inspected in tens of milliseconds. It runs on the CPU pool like
+render.py and returns a plain dict.
+
+The render estimate is a linear model of what ``render.render_page`` costs at
+the given DPI: a per-page overhead, PNG encoding proportional to output
+megapixels, and extra time for embedded raster images, which encode poorly.
+The defaults were fitted on the benchmark corpus; set ``PREFLIGHT_MS_PER_MP``
+and ``PREFLIGHT_MS_PER_IMAGE_MP`` to recalibrate for other hardware.
+"""
+import os
+from typing import Any, Dict, List
+
+PAGE_OVERHEAD_MS = 10.0
+MS_PER_MP = float(os.getenv("PREFLIGHT_MS_PER_MP", "38"))
+MS_PER_IMAGE_MP = float(os.getenv("PREFLIGHT_MS_PER_IMAGE_MP", "350"))
+
+
+def estimate_render_ms(width: float, height: float, image_pixels: int, dpi: int) -> float:
+    scale = dpi / 72.0
+    page_mp = round(width * scale) * round(height * scale) / 1e6
+    image_mp = min(image_pixels / 1e6, page_mp)
+    return PAGE_OVERHEAD_MS + page_mp * MS_PER_MP + image_mp * MS_PER_IMAGE_MP
+
+
+def inspect(path: str, dpi: int) -> Dict[str, Any]:
+    import fitz  # PyMuPDF
+
+    doc = fitz.open(path)
+    try:
+        encryption = (doc.metadata or {}).get("encryption")
+        result: Dict[str, Any] = {
+            "page_count": doc.page_count,
+            "encrypted": bool(encryption) or doc.needs_pass,
+            "needs_password": doc.needs_pass,
+            "dpi": dpi,
+        }
+        if doc.needs_pass:
+            # Page objects are unreadable without the password
+            result.update({"has_text_layer": None, "image_count": None, "est_render_ms": None, "pages": []})
+            return result
+
+        pages: List[Dict[str, Any]] = []
+        image_xrefs = set()
+        for page in doc:
+            images = page.get_images()
+            image_xrefs.update(img[0] for img in images)
+            width, height = page.rect.width, page.rect.height
+            pages.append({
+                "page": page.number + 1,
+                "width": round(width, 2),
+                "height": round(height, 2),
+                "rotation": page.rotation,
+                # Fonts in the page resources mean a text layer (including OCR'd scans)
+                "has_text": bool(page.get_fonts()),
+                "images": len(images),
+                "est_render_ms": round(estimate_render_ms(width, height, sum(img[2] * img[3] for img in images), dpi)),
+            })
+        result.update({
+            "has_text_layer": any(p["has_text"] for p in pages),
+            "image_count": len(image_xrefs),
+            "est_render_ms": sum(p["est_render_ms"] for p in pages),
+            "pages": pages,
+        })
+        return result
+    finally:
+        doc.close()
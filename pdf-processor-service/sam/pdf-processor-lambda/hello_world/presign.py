@@ -0,0 +1,135 @@
+"""Presigned GET URLs in bulk.
+
+``client.generate_presigned_url`` costs about 0.4 ms per URL, mostly
+resolving the endpoint through botocore's rule set, then fetching
+credentials and deriving the SigV4 signing key. None of that changes between
+the URLs of one bucket. ``UrlSigner`` resolves each bucket's URL prefix once
+with botocore, keeps frozen credentials for ``CREDENTIALS_TTL`` seconds and
+the derived key for the UTC day, and signs each URL with a single
+HMAC-SHA256 over a query-string SigV4 request. The URLs are the same as
+botocore's with ``signature_version="s3v4"``.
+
+Clients that cannot be signed for locally (no credentials, or the in-memory
+fakes) fall back to ``generate_presigned_url`` per key.
+"""
+import datetime
+import hashlib
+import hmac
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import quote
+
+EXPIRES_SECONDS = 3600
+# Keys per /presign-batch call
+MAX_KEYS = 1000
+# SigV4 presigned URLs are valid for at most seven days
+MAX_EXPIRES_SECONDS = 7 * 24 * 3600
+# Frozen credentials are reused this long
+CREDENTIALS_TTL = 300.0
+_ALGORITHM = "AWS4-HMAC-SHA256"
+
+
+def _hmac(key: bytes, msg: str) -> bytes:
+    return hmac.new(key, msg.encode(), hashlib.sha256).digest()
+
+
+class UrlSigner:
+    def __init__(self, client: Any):
+        self.client = client
+        meta = getattr(client, "meta", None)
+        self.region = getattr(meta, "region_name", None) or "us-east-1"
+        self._local = meta is not None
+        self._bases: Dict[str, str] = {}
+        self._frozen: Optional[Any] = None
+        self._frozen_until = 0.0
+        self._key: Tuple[str, bytes] = ("", b"")
+        self._lock = threading.Lock()
+
+    def sign(self, bucket: str, keys: List[str], expires: int = EXPIRES_SECONDS,
+             now: Optional[datetime.datetime] = None) -> List[str]:
+        """GET URLs for ``keys``, all signed at ``now`` (default: the current UTC time)."""
+        frozen = self._frozen_credentials() if self._local else None
+        if frozen is None:
+            return [
+                self.client.generate_presigned_url("get_object", Params={"Bucket": bucket, "Key": key}, ExpiresIn=expires)
+                for key in keys
+            ]
+        now = now or datetime.datetime.now(datetime.timezone.utc)
+        day, stamp = now.strftime("%Y%m%d"), now.strftime("%Y%m%dT%H%M%SZ")
+        scope = f"{day}/{self.region}/s3/aws4_request"
+        params = {
+            "X-Amz-Algorithm": _ALGORITHM,
+            "X-Amz-Credential": f"{frozen.access_key}/{scope}",
+            "X-Amz-Date": stamp,
+            "X-Amz-Expires": str(expires),
+            "X-Amz-SignedHeaders": "host",
+        }
+        if frozen.token:
+            params["X-Amz-Security-Token"] = frozen.token
+        query = "&".join(f"{quote(k, safe='-_.~')}={quote(v, safe='-_.~')}" for k, v in sorted(params.items()))
+        signing_key = self._signing_key(day, frozen.secret_key)
+        base = self._base(bucket)
+        host, _, base_path = base.partition("://")[2].partition("/")
+        headers = f"host:{host}\n\nhost\nUNSIGNED-PAYLOAD"
+        urls = []
+        for key in keys:
+            path = "/" + base_path + quote(key, safe="/~")
+            canonical = f"GET\n{path}\n{query}\n{headers}"
+            to_sign = f"{_ALGORITHM}\n{stamp}\n{scope}\n{hashlib.sha256(canonical.encode()).hexdigest()}"
+            signature = hmac.new(signing_key, to_sign.encode(), hashlib.sha256).hexdigest()
+            urls.append(f"{base}{quote(key, safe='/~')}?{query}&X-Amz-Signature={signature}")
+        return urls
+
+    def _base(self, bucket: str) -> str:
+        """The URL up to the key, as botocore resolves it (addressing style, endpoint)."""
+        base = self._bases.get(bucket)
+        if base is None:
+            probe = self.client.generate_presigned_url("get_object", Params={"Bucket": bucket, "Key": "_"})
+            base = self._bases[bucket] = probe.split("?", 1)[0][:-1]
+        return base
+
+    def _frozen_credentials(self) -> Optional[Any]:
+        if self._frozen is not None and time.monotonic() < self._frozen_until:
+            return self._frozen
+        with self._lock:
+            if self._frozen is None or time.monotonic() >= self._frozen_until:
+                # The client's own credentials, so URLs are signed by the same identity. Refreshable
+                # ones renew themselves at least 10 minutes before expiry, longer than we keep them.
+                credentials = getattr(getattr(self.client, "_request_signer", None), "_credentials", None)
+                if credentials is None:
+                    self._local = False
+                    return None
+                self._frozen = credentials.get_frozen_credentials()
+                self._frozen_until = time.monotonic() + CREDENTIALS_TTL
+        return self._frozen
+
+    def _signing_key(self, day: str, secret: str) -> bytes:
+        cached_for, key = self._key
+        if cached_for != f"{day}/{secret}":
+            key = _hmac(_hmac(_hmac(_hmac(f"AWS4{secret}".encode(), day), self.region), "s3"), "aws4_request")
+            self._key = (f"{day}/{secret}", key)
+        return key
+
+
+_signer: Optional[UrlSigner] = None
+_signer_lock = threading.Lock()
+
+
+def get_signer(client: Any) -> UrlSigner:
+    """The process-wide signer for ``client``, rebuilt when the client changes."""
+    global _signer
+    signer = _signer
+    if signer is None or signer.client is not client:
+        with _signer_lock:
+            if _signer is None or _signer.client is not client:
+                _signer = UrlSigner(client)
+            signer = _signer
+    return signer
+
+
+def set_signer(signer: Optional[UrlSigner]) -> None:
+    """Override the process-wide signer (tests, benchmarks); None rebuilds it on next use."""
+    global _signer
+    with _signer_lock:
+        _signer = signer
@@ -0,0 +1,262 @@
+"""Page rendering executed on the CPU pool.
+
+These functions run inside pool workers (threads on Lambda, spawned processes
+elsewhere), so they take a file path rather than an open document and return
+plain picklable results. Each worker process keeps recently opened documents
+in a ``DocumentCache`` shared by its threads, so rendering page after page of
+one PDF, or fetching single pages of it request after request, opens and
+parses it (xref, page tree, fonts) once. Documents are processed from the
+content-addressed store (documents.py), whose files never change, so a cache
+entry is the document's content.
+
+Scanned pages are usually one embedded JPEG covering the page. When the
+``Profile`` allows it, such an image is served as stored instead of being
+rasterized and re-encoded as PNG, provided it is not larger than the
+profile's DPI would render and needs no compositing (no mask, rotation,
+text layer or annotations).
+"""
+import functools
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+# Opened documents kept per worker process, by count and by estimated memory
+DOC_CACHE_SIZE = int(os.getenv("RENDER_DOC_CACHE_SIZE", "8"))
+DOC_CACHE_BYTES = int(os.getenv("RENDER_DOC_CACHE_MB", "256")) * 1024 * 1024
+# Cap on MuPDF's resource store (decoded fonts, images, display lists); 0 keeps MuPDF's own 256 MB
+STORE_BYTES = int(os.getenv("MUPDF_STORE_MB", "128")) * 1024 * 1024
+# Share of the page an embedded image must cover to be served as the page
+FULL_PAGE_COVERAGE = 0.98
+# Embedded images up to this much larger than the profile's render still pass
+_SIZE_SLACK = 1.05
+
+
+@dataclass
+class RenderedPage:
+    page: int  # 1-based
+    data: bytes
+    width: int
+    height: int
+    started: float  # epoch seconds, for tracing
+    render_s: float
+    encode_s: float
+    format: str = "png"
+    embedded: bool = False  # served from the PDF's own image stream
+
+
+@dataclass(frozen=True)
+class Profile:
+    """Output settings for page images."""
+
+    name: str
+    dpi: int
+    # Embedded image formats that may be served as stored
+    passthrough: Tuple[str, ...] = ()
+
+
+PROFILES: Dict[str, Profile] = {
+    "default": Profile("default", 300, ("jpeg", "png")),
+    "png": Profile("png", 300),
+}
+
+MIME_TYPES = {"png": "image/png", "jpeg": "image/jpeg"}
+
+
+@dataclass
+class _Entry:
+    doc: Any
+    nbytes: int
+    lock: threading.Lock = field(default_factory=threading.Lock)
+    users: int = 0  # checked out or waiting; never evicted while > 0
+
+
+class DocumentCache:
+    """LRU of opened ``fitz.Document`` objects keyed by file identity.
+
+    A document's own memory grows with its size, so the file size stands in
+    for it: entries are evicted least recently used first beyond
+    ``max_entries`` or ``max_bytes``, skipping documents in use. A
+    ``fitz.Document`` is not safe to share between threads, so ``open``
+    holds a per-document lock while the caller uses it; PyMuPDF keeps the GIL
+    while it works, so this costs the thread pool no parallelism.
+    """
+
+    def __init__(self, max_entries: int = DOC_CACHE_SIZE, max_bytes: int = DOC_CACHE_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[Tuple[Any, ...], _Entry]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def open(self, path: str) -> Iterator[Any]:
+        # Temp-file names get reused, so the key includes the file identity
+        st = os.stat(path)
+        key = (path, st.st_ino, st.st_size, st.st_mtime_ns)
+        entry = self._checkout(key)
+        if entry is None:
+            entry = self._add(key, path, st.st_size)
+        try:
+            with entry.lock:
+                yield entry.doc
+        finally:
+            with self._lock:
+                entry.users -= 1
+            self._evict()
+
+    def _checkout(self, key: Tuple[Any, ...]) -> Optional[_Entry]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            entry.users += 1
+            self._entries.move_to_end(key)
+            return entry
+
+    def _add(self, key: Tuple[Any, ...], path: str, nbytes: int) -> _Entry:
+        import fitz  # PyMuPDF
+
+        doc = fitz.open(path)  # outside the lock; parsing the xref can take a while
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                entry = self._entries[key] = _Entry(doc, nbytes)
+                doc = None
+            else:  # another thread opened it meanwhile
+                self._entries.move_to_end(key)
+            entry.users += 1
+        if doc is not None:
+            doc.close()
+        return entry
+
+    def _evict(self) -> None:
+        closing = []
+        with self._lock:
+            total = sum(e.nbytes for e in self._entries.values())
+            for key, entry in list(self._entries.items()):
+                if len(self._entries) <= self.max_entries and total <= self.max_bytes:
+                    break
+                if entry.users:
+                    continue
+                del self._entries[key]
+                total -= entry.nbytes
+                closing.append(entry.doc)
+        for doc in closing:
+            doc.close()
+        if closing:
+            trim_store()
+
+    def clear(self) -> None:
+        with self._lock:
+            idle = [k for k, e in self._entries.items() if not e.users]
+            closing = [self._entries.pop(k).doc for k in idle]
+        for doc in closing:
+            doc.close()
+
+
+_cache: Optional[DocumentCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_cache() -> DocumentCache:
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = DocumentCache()
+    return _cache
+
+
+def set_cache(cache: Optional[DocumentCache]) -> None:
+    """Override this worker's cache (tests, benchmarks); None resets to env."""
+    global _cache
+    with _cache_lock:
+        if _cache is not None and _cache is not cache:
+            _cache.clear()
+        _cache = cache
+
+
+def open_document(path: str):
+    """Context manager giving the opened PDF at ``path`` from this worker's cache."""
+    return get_cache().open(path)
+
+
+@functools.lru_cache(maxsize=1)
+def renderer_version() -> str:
+    """PyMuPDF's version; a new renderer may produce different bytes for a page."""
+    from importlib.metadata import PackageNotFoundError, version
+
+    try:
+        return version("PyMuPDF")
+    except PackageNotFoundError:
+        return "0"
+
+
+def trim_store() -> None:
+    """Shrink MuPDF's resource store back under ``STORE_BYTES``."""
+    if not STORE_BYTES:
+        return
+    import fitz  # PyMuPDF
+
+    size = fitz.TOOLS.store_size
+    if size > STORE_BYTES:
+        fitz.TOOLS.store_shrink(min(100, int(100 * (size - STORE_BYTES) / size) + 1))
+
+
+def page_sizes(path: str) -> List[Tuple[float, float]]:
+    """(width, height) of each page in points, from the page boxes only."""
+    with open_document(path) as doc:
+        return [(p.rect.width, p.rect.height) for p in doc]
+
+
+def embedded_page_image(doc, page, profile: Profile) -> Optional[Dict[str, Any]]:
+    """The page's single full-page image as ``doc.extract_image`` returns it,
+    if it can stand in for a render under ``profile``; otherwise None."""
+    if not profile.passthrough or page.rotation or page.first_annot is not None:
+        return None
+    images = page.get_images(full=True)
+    if len(images) != 1 or images[0][1] or page.get_fonts():
+        return None
+    xref = images[0][0]
+    placements = page.get_image_rects(xref, transform=True)
+    if len(placements) != 1:
+        return None
+    bbox, matrix = placements[0]
+    # Upright and unflipped; anything else would need resampling
+    if matrix.b or matrix.c or matrix.a <= 0 or matrix.d <= 0:
+        return None
+    if (bbox & page.rect).get_area() < FULL_PAGE_COVERAGE * page.rect.get_area():
+        return None
+    info = doc.extract_image(xref)
+    if not info or info["ext"] not in profile.passthrough or info["colorspace"] not in (1, 3) or info.get("smask"):
+        return None
+    scale = profile.dpi / 72.0 * _SIZE_SLACK
+    if info["width"] > page.rect.width * scale or info["height"] > page.rect.height * scale:
+        return None
+    return info
+
+
+def render_page(path: str, index: int, profile: Profile) -> RenderedPage:
+    """Page ``index`` (0-based) of the PDF at ``path`` as an image per ``profile``:
+    the embedded scan when it qualifies, else a render encoded as PNG."""
+    started = time.time()
+    t0 = time.perf_counter()
+    with open_document(path) as doc:
+        page = doc[index]
+        embedded = embedded_page_image(doc, page, profile)
+        if embedded is not None:
+            return RenderedPage(index + 1, embedded["image"], embedded["width"], embedded["height"], started,
+                                time.perf_counter() - t0, 0.0, embedded["ext"], embedded=True)
+        pix = page.get_pixmap(dpi=profile.dpi)
+    trim_store()
+    t1 = time.perf_counter()
+    data = pix.tobytes("png")
+    t2 = time.perf_counter()
+    return RenderedPage(index + 1, data, pix.width, pix.height, started, t1 - t0, t2 - t1)
@@ -0,0 +1,98 @@
+"""Presigned S3 multipart uploads for large source PDFs.
+
+A single presigned PUT streams the whole file in one request and starts over
+from zero when the connection drops. A multipart upload instead sends parts
+of ``part_size`` bytes, each to its own presigned URL, so the client can
+upload several in parallel and retry or resume one part at a time:
+
+1. ``create`` starts the upload and recommends a part size for the file.
+2. ``presign_parts`` signs URLs for many part numbers at once; signing is
+   local, so a few hundred cost no S3 round trip. ``uploaded_parts`` tells a
+   resuming client which parts S3 already has.
+3. ``complete`` assembles the object, which is readable as soon as it
+   returns; ``abort`` discards the parts.
+
+S3 limits: parts of 5 MiB to 5 GiB (the last may be smaller), at most 10,000
+parts. Abandoned uploads keep their parts until aborted, so the bucket should
+have an ``AbortIncompleteMultipartUpload`` lifecycle rule. Everything here
+blocks on the network; call it on the I/O pool.
+"""
+import os
+from typing import Any, Dict, Iterable, List, Optional
+
+MiB = 1024 * 1024
+MIN_PART_BYTES = 5 * MiB
+MAX_PART_BYTES = 5 * 1024 * MiB
+MAX_PARTS = 10000
+# Preferred part size: large enough to keep per-request overhead low, small enough to retry cheaply
+PART_BYTES = max(MIN_PART_BYTES, int(os.getenv("MULTIPART_PART_MB", "16")) * MiB)
+# Part URLs signed per call
+MAX_PRESIGN_PARTS = 1000
+URL_EXPIRES_SECONDS = int(os.getenv("MULTIPART_URL_EXPIRES_SECONDS", "3600"))
+
+
+def part_size(total_bytes: int) -> int:
+    """Recommended part size for a file of ``total_bytes``: ``PART_BYTES``,
+    grown in whole MiB when the file would need more than ``MAX_PARTS``."""
+    needed = -(-total_bytes // MAX_PARTS)
+    size = max(PART_BYTES, -(-needed // MiB) * MiB)
+    if size > MAX_PART_BYTES:
+        raise ValueError(f"{total_bytes} bytes exceeds the S3 multipart limit")
+    return size
+
+
+def part_count(total_bytes: int, size: int) -> int:
+    return max(1, -(-total_bytes // size))
+
+
+def create(s3: Any, bucket: str, key: str, content_type: str = "application/pdf") -> str:
+    """Start a multipart upload; returns its upload id."""
+    return s3.create_multipart_upload(Bucket=bucket, Key=key, ContentType=content_type)["UploadId"]
+
+
+def presign_parts(s3: Any, bucket: str, key: str, upload_id: str, part_numbers: Iterable[int],
+                  expires: int = URL_EXPIRES_SECONDS) -> List[Dict[str, Any]]:
+    return [
+        {
+            "part_number": n,
+            "url": s3.generate_presigned_url(
+                "upload_part",
+                Params={"Bucket": bucket, "Key": key, "UploadId": upload_id, "PartNumber": n},
+                ExpiresIn=expires,
+            ),
+        }
+        for n in part_numbers
+    ]
+
+
+def uploaded_parts(s3: Any, bucket: str, key: str, upload_id: str) -> List[Dict[str, Any]]:
+    """Parts S3 has received so far, in part number order."""
+    parts: List[Dict[str, Any]] = []
+    marker = 0
+    while True:
+        resp = s3.list_parts(Bucket=bucket, Key=key, UploadId=upload_id, PartNumberMarker=marker)
+        parts.extend({"part_number": p["PartNumber"], "etag": p["ETag"], "size": p["Size"]}
+                     for p in resp.get("Parts", []))
+        if not resp.get("IsTruncated"):
+            return parts
+        marker = resp["NextPartNumberMarker"]
+
+
+def complete(s3: Any, bucket: str, key: str, upload_id: str,
+             parts: Optional[List[Dict[str, Any]]] = None) -> str:
+    """Assemble the object from ``parts`` (``part_number`` and ``etag`` each),
+    or from every part S3 has when None; returns the object's ETag."""
+    if parts is None:
+        parts = uploaded_parts(s3, bucket, key, upload_id)
+    if not parts:
+        raise ValueError("no parts uploaded")
+    ordered = sorted(parts, key=lambda p: int(p["part_number"]))
+    resp = s3.complete_multipart_upload(
+        Bucket=bucket, Key=key, UploadId=upload_id,
+        MultipartUpload={"Parts": [{"PartNumber": int(p["part_number"]), "ETag": p["etag"]} for p in ordered]},
+    )
+    return resp["ETag"]
+
+
+def abort(s3: Any, bucket: str, key: str, upload_id: str) -> None:
+    s3.abort_multipart_upload(Bucket=bucket, Key=key, UploadId=upload_id)
@@ -0,0 +1,139 @@
+"""Fair sharing of the render pool and the vision API between documents.
+
+Each request, job or batch member submits its work under an owner (its trace
+id, see ``current_owner``). A ``FairScheduler`` lets at most ``max_in_flight``
+calls run and hands free slots to waiting owners in round-robin order, so a
+40-document batch interleaves its documents instead of finishing one before
+starting the next, and a single-page request is not stuck behind a long deck.
+The vision scheduler can also cap the call rate to stay inside the API quota.
+
+- ``render``: ``SCHEDULER_RENDER_SLOTS`` (default ``CPU_WORKERS``) pages
+  rendering at once; more would only queue inside the pool.
+- ``vision``: ``SCHEDULER_VISION_SLOTS`` calls in flight (default
+  ``IO_WORKERS``) and ``VISION_RATE_PER_SECOND`` (0 = unlimited).
+
+Schedulers run on the event loop and are not thread-safe.
+"""
+import asyncio
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Deque, Dict, Optional
+
+import executors
+import tracing
+
+RENDER_SLOTS = int(os.getenv("SCHEDULER_RENDER_SLOTS") or executors.CPU_WORKERS)
+VISION_SLOTS = int(os.getenv("SCHEDULER_VISION_SLOTS") or executors.IO_WORKERS)
+VISION_RATE = float(os.getenv("VISION_RATE_PER_SECOND", "0"))
+
+
+def current_owner() -> str:
+    trace = tracing.current_trace.get()
+    return trace.trace_id if trace is not None else "default"
+
+
+class FairScheduler:
+    def __init__(self, max_in_flight: int, rate_per_second: float = 0.0):
+        self.max_in_flight = max(1, max_in_flight)
+        self.rate_per_second = rate_per_second
+        self.in_flight = 0
+        self._queues: "OrderedDict[str, Deque[asyncio.Future]]" = OrderedDict()
+        self._tokens = 1.0
+        self._refilled = time.monotonic()
+        self._timer: Optional[asyncio.TimerHandle] = None
+
+    @property
+    def waiting(self) -> int:
+        return sum(len(q) for q in self._queues.values())
+
+    @asynccontextmanager
+    async def slot(self, owner: Optional[str] = None) -> AsyncIterator[None]:
+        owner = owner or current_owner()
+        waiter = asyncio.get_running_loop().create_future()
+        self._queues.setdefault(owner, deque()).append(waiter)
+        self._dispatch()
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                self._release()  # granted just as it was cancelled
+            raise
+        try:
+            yield
+        finally:
+            self._release()
+
+    def _release(self) -> None:
+        self.in_flight -= 1
+        self._dispatch()
+
+    def _take_token(self) -> bool:
+        if not self.rate_per_second:
+            return True
+        now = time.monotonic()
+        self._tokens = min(1.0, self._tokens + (now - self._refilled) * self.rate_per_second)
+        self._refilled = now
+        if self._tokens < 1.0:
+            if self._timer is None:
+                delay = (1.0 - self._tokens) / self.rate_per_second
+                self._timer = asyncio.get_running_loop().call_later(delay, self._on_timer)
+            return False
+        self._tokens -= 1.0
+        return True
+
+    def _on_timer(self) -> None:
+        self._timer = None
+        self._dispatch()
+
+    def _dispatch(self) -> None:
+        while self.in_flight < self.max_in_flight and self._queues:
+            owner, queue = next(iter(self._queues.items()))
+            while queue and queue[0].cancelled():
+                queue.popleft()
+            if not queue:
+                del self._queues[owner]
+                continue
+            if not self._take_token():
+                return
+            waiter = queue.popleft()
+            # Round robin: the owner just served goes to the back of the line
+            if queue:
+                self._queues.move_to_end(owner)
+            else:
+                del self._queues[owner]
+            self.in_flight += 1
+            waiter.set_result(None)
+
+
+_schedulers: Dict[str, FairScheduler] = {}
+_schedulers_lock = threading.Lock()
+
+
+def _from_env(name: str) -> FairScheduler:
+    if name == "render":
+        return FairScheduler(RENDER_SLOTS)
+    if name == "vision":
+        return FairScheduler(VISION_SLOTS, VISION_RATE)
+    raise KeyError(name)
+
+
+def get_scheduler(name: str) -> FairScheduler:
+    scheduler = _schedulers.get(name)
+    if scheduler is None:
+        with _schedulers_lock:
+            scheduler = _schedulers.get(name)
+            if scheduler is None:
+                scheduler = _schedulers[name] = _from_env(name)
+    return scheduler
+
+
+def set_scheduler(name: str, scheduler: Optional[FairScheduler]) -> None:
+    """Override a process-wide scheduler (tests, benchmarks); None resets to env."""
+    with _schedulers_lock:
+        if scheduler is None:
+            _schedulers.pop(name, None)
+        else:
+            _schedulers[name] = scheduler
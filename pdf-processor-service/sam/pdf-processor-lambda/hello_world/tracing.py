@@ -0,0 +1,217 @@
+"""Request-scoped tracing spans.
+
+Each HTTP request gets a trace whose id comes from the caller when present
+(``traceparent``, ``X-Amzn-Trace-Id`` or ``X-Cloud-Trace-Context``) and is
+otherwise generated. Stage timers from ``metrics.stage`` add a span to the
+active trace, and log records carry the trace id through ``TraceIdFilter``.
+
+Finished traces go to the exporter chosen by ``TRACE_EXPORTER``:
+
+- ``none`` (default): spans are only kept for the request's debug summary.
+- ``console``: one JSON line per span on the ``tracing`` logger.
+- ``file``: JSON lines appended to ``TRACE_FILE`` (default ``traces.jsonl``).
+- ``otlp``: OTLP/HTTP JSON POSTed to ``OTEL_EXPORTER_OTLP_ENDPOINT``.
+"""
+import contextvars
+import json
+import logging
+import os
+import re
+import secrets
+import threading
+import time
+import urllib.request
+from dataclasses import asdict, dataclass, field
+from typing import Any, Dict, List, Mapping, Optional
+
+logger = logging.getLogger("tracing")
+
+SERVICE_NAME = os.getenv("OTEL_SERVICE_NAME", "pdf-processor")
+
+
+@dataclass
+class Span:
+    trace_id: str
+    span_id: str
+    parent_id: Optional[str]
+    name: str
+    start: float  # epoch seconds
+    duration_ms: float
+    attrs: Dict[str, Any] = field(default_factory=dict)
+
+
+class Trace:
+    def __init__(self, trace_id: str, parent_id: Optional[str] = None, name: str = "request"):
+        self.trace_id = trace_id
+        self.root_id = secrets.token_hex(8)
+        self.parent_id = parent_id
+        self.name = name
+        self.start = time.time()
+        self._perf_start = time.perf_counter()
+        self.spans: List[Span] = []
+        self._lock = threading.Lock()
+
+    def add(self, name: str, start: float, duration_ms: float, attrs: Optional[Dict[str, Any]] = None) -> Span:
+        span = Span(self.trace_id, secrets.token_hex(8), self.root_id, name, start, duration_ms, attrs or {})
+        with self._lock:
+            self.spans.append(span)
+        return span
+
+    def finish(self, attrs: Optional[Dict[str, Any]] = None) -> Span:
+        duration_ms = (time.perf_counter() - self._perf_start) * 1000.0
+        root = Span(self.trace_id, self.root_id, self.parent_id, self.name, self.start, duration_ms, attrs or {})
+        with self._lock:
+            self.spans.insert(0, root)
+        return root
+
+    def slowest(self, n: int = 10) -> List[Dict[str, Any]]:
+        """Child spans ordered by duration, for the ``debug`` response field."""
+        with self._lock:
+            children = [s for s in self.spans if s.span_id != self.root_id]
+        children.sort(key=lambda s: s.duration_ms, reverse=True)
+        return [{"name": s.name, "duration_ms": round(s.duration_ms, 1), **s.attrs} for s in children[:n]]
+
+
+current_trace: contextvars.ContextVar[Optional[Trace]] = contextvars.ContextVar("current_trace", default=None)
+
+_TRACEPARENT = re.compile(r"^[0-9a-f]{2}-([0-9a-f]{32})-([0-9a-f]{16})-[0-9a-f]{2}$")
+_AMZN_ROOT = re.compile(r"Root=1-([0-9a-f]{8})-([0-9a-f]{24})")
+_CLOUD_TRACE = re.compile(r"^([0-9a-f]{32})(?:/(\d+))?")
+
+
+def trace_from_headers(headers: Mapping[str, str]) -> Trace:
+    """Continue the caller's trace if it sent one, else start a new trace."""
+    m = _TRACEPARENT.match(headers.get("traceparent", "").strip().lower())
+    if m and m.group(1) != "0" * 32:
+        return Trace(m.group(1), parent_id=m.group(2))
+    m = _AMZN_ROOT.search(headers.get("x-amzn-trace-id", ""))
+    if m:
+        return Trace(m.group(1) + m.group(2))
+    m = _CLOUD_TRACE.match(headers.get("x-cloud-trace-context", "").strip().lower())
+    if m:
+        parent = format(int(m.group(2)), "016x")[-16:] if m.group(2) else None
+        return Trace(m.group(1), parent_id=parent)
+    return Trace(secrets.token_hex(16))
+
+
+def record(name: str, start_perf: float, duration_s: float, attrs: Optional[Dict[str, Any]] = None) -> None:
+    """Add a finished span to the active trace, if any; ``start_perf`` is a perf_counter value."""
+    trace = current_trace.get()
+    if trace is None:
+        return
+    start = trace.start + (start_perf - trace._perf_start)
+    trace.add(name, start, duration_s * 1000.0, attrs)
+
+
+def record_at(name: str, start: float, duration_s: float, attrs: Optional[Dict[str, Any]] = None) -> None:
+    """Like ``record`` but with an epoch start time, for work timed in another process."""
+    trace = current_trace.get()
+    if trace is not None:
+        trace.add(name, start, duration_s * 1000.0, attrs)
+
+
+class TraceIdFilter(logging.Filter):
+    """Adds ``trace_id`` to every record so formats can include it."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        trace = current_trace.get()
+        record.trace_id = trace.trace_id if trace is not None else "-"
+        return True
+
+
+def install_log_filter() -> None:
+    for handler in logging.getLogger().handlers:
+        if not any(isinstance(f, TraceIdFilter) for f in handler.filters):
+            handler.addFilter(TraceIdFilter())
+
+
+class Exporter:
+    def export(self, trace: Trace) -> None:
+        pass
+
+
+class ConsoleExporter(Exporter):
+    def export(self, trace: Trace) -> None:
+        for span in trace.spans:
+            logger.info(json.dumps(asdict(span), default=str))
+
+
+class FileExporter(Exporter):
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def export(self, trace: Trace) -> None:
+        lines = "".join(json.dumps(asdict(span), default=str) + "\n" for span in trace.spans)
+        with self._lock, open(self.path, "a", encoding="utf-8") as f:
+            f.write(lines)
+
+
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+class OtlpHttpExporter(Exporter):
+    """Minimal OTLP/HTTP JSON exporter; posts from a daemon thread so requests never wait on it."""
+
+    def __init__(self, endpoint: str):
+        self.url = endpoint.rstrip("/") + "/v1/traces"
+
+    def _payload(self, trace: Trace) -> Dict[str, Any]:
+        spans = []
+        for s in trace.spans:
+            start_ns = int(s.start * 1e9)
+            spans.append({
+                "traceId": s.trace_id,
+                "spanId": s.span_id,
+                **({"parentSpanId": s.parent_id} if s.parent_id else {}),
+                "name": s.name,
+                "kind": 2 if s.span_id == trace.root_id else 1,
+                "startTimeUnixNano": str(start_ns),
+                "endTimeUnixNano": str(start_ns + int(s.duration_ms * 1e6)),
+                "attributes": [{"key": k, "value": _otlp_value(v)} for k, v in s.attrs.items()],
+            })
+        return {
+            "resourceSpans": [{
+                "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": SERVICE_NAME}}]},
+                "scopeSpans": [{"scope": {"name": "pdf-processor"}, "spans": spans}],
+            }]
+        }
+
+    def _post(self, body: bytes) -> None:
+        req = urllib.request.Request(self.url, data=body, headers={"Content-Type": "application/json"})
+        try:
+            urllib.request.urlopen(req, timeout=5).close()
+        except Exception as e:
+            logger.warning(f"OTLP export failed: {e}")
+
+    def export(self, trace: Trace) -> None:
+        body = json.dumps(self._payload(trace)).encode()
+        threading.Thread(target=self._post, args=(body,), daemon=True).start()
+
+
+def _exporter_from_env() -> Exporter:
+    kind = os.getenv("TRACE_EXPORTER", "none").lower()
+    if kind == "console":
+        return ConsoleExporter()
+    if kind == "file":
+        return FileExporter(os.getenv("TRACE_FILE", "traces.jsonl"))
+    if kind == "otlp":
+        return OtlpHttpExporter(os.getenv("OTEL_EXPORTER_OTLP_ENDPOINT", "http://localhost:4318"))
+    return Exporter()
+
+
+exporter: Exporter = _exporter_from_env()
+
+
+def export(trace: Trace) -> None:
+    try:
+        exporter.export(trace)
+    except Exception as e:
+        logger.warning(f"Trace export failed: {e}")
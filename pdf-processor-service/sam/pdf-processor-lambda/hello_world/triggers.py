@@ -0,0 +1,202 @@
+"""Event-driven entry points: S3 ``ObjectCreated`` notifications and SQS batches.
+
+Both run the same code as the HTTP routes, in-process, so admission,
+scheduling, the document store and metrics behave the same; app.py wraps them
+as Lambda handlers.
+
+- An upload under ``UPLOAD_PREFIX`` (default ``uploads/``) is preflighted and
+  rendered straight away. The preflight report and the page URLs are written
+  to ``results/{key without the prefix}.json``, where the uploader can poll.
+- An SQS message is either such an S3 notification (S3 -> SQS) or a work
+  order ``{"key": ..., "action": "convert" | "analyze", ...}``, where the
+  other fields are the ``/process-from-s3`` payload. Failed messages are
+  reported per item so that only they are retried; requests that can never
+  succeed (4xx) are logged and dropped instead.
+
+An analysis that runs out of invocation time stores the pages it finished and
+sends itself a follow-up message with the continuation token to
+``WORK_QUEUE_URL``. The follow-up merges its pages into the same result
+document, which reads ``complete: true`` once every page is in.
+"""
+import json
+import logging
+import os
+import uuid
+from typing import Any, Dict, Iterator, List, Optional
+from urllib.parse import unquote_plus
+
+from fastapi import HTTPException
+from starlette.requests import Request
+
+import admission
+import clients
+import executors
+import main
+import metrics
+import preflight
+import tracing
+
+logger = logging.getLogger(__name__)
+
+UPLOAD_PREFIX = os.getenv("UPLOAD_PREFIX", "uploads/")
+WORK_QUEUE_URL = os.getenv("WORK_QUEUE_URL")
+RESULTS_PREFIX = "results/"
+ACTIONS = ("convert", "analyze")
+
+
+class Retryable(Exception):
+    """Processing failed in a way that may succeed on another attempt."""
+
+
+def result_key(key: str) -> str:
+    name = key[len(UPLOAD_PREFIX):] if key.startswith(UPLOAD_PREFIX) else key
+    return f"{RESULTS_PREFIX}{name.rsplit('.', 1)[0]}.json"
+
+
+def s3_keys(event: Dict[str, Any]) -> Iterator[str]:
+    """PDF keys created under ``UPLOAD_PREFIX`` in an S3 notification."""
+    for record in event.get("Records") or []:
+        if not str(record.get("eventName", "")).startswith("ObjectCreated"):
+            continue
+        key = unquote_plus(record["s3"]["object"]["key"])  # keys arrive URL-encoded
+        if key.startswith(UPLOAD_PREFIX) and key.lower().endswith(".pdf"):
+            yield key
+
+
+def _request(context: Any) -> Request:
+    # Stand-in for the HTTP request the routes read their deadline from
+    return Request({"type": "http", "method": "POST", "path": "/", "headers": [], "aws.context": context})
+
+
+async def _run(endpoint: str, key: str, work) -> Dict[str, Any]:
+    """Run ``work()`` under its own trace and metric label, mapping errors to
+    ``Retryable`` or ``ValueError`` (permanent)."""
+    metrics.current_endpoint.set(endpoint)
+    trace = tracing.Trace(uuid.uuid4().hex, name=endpoint)
+    tracing.current_trace.set(trace)
+    status = 500
+    try:
+        result = await work()
+        status = 200
+        return result
+    except admission.Overloaded as e:
+        status = 429
+        raise Retryable(str(e)) from e
+    except HTTPException as e:
+        status = e.status_code
+        if e.status_code >= 500 or e.status_code in (404, 409):
+            # 404: the notification can outrun S3's read-after-write on overwrites
+            raise Retryable(f"{key}: {e.detail}") from e
+        raise ValueError(f"{key}: {e.detail}") from e
+    finally:
+        trace.finish({"s3.key": key, "http.status_code": status})
+        tracing.export(trace)
+
+
+async def handle_upload(key: str, context: Any = None) -> Dict[str, Any]:
+    """Preflight and render an uploaded PDF; returns and stores the result document."""
+
+    async def work() -> Dict[str, Any]:
+        async with main._s3_document(key) as (path, size, digest):
+            info = await executors.run_cpu(preflight.inspect, path, main.RENDER_DPI)
+        result: Dict[str, Any] = {"key": key, "digest": digest, "size_bytes": size, "preflight": info}
+        if info["needs_password"]:
+            result["error"] = "Document is password-protected"
+        else:
+            result["convert"] = await main.convert_from_s3({"key": key})
+        await executors.run_io(_put_result, result_key(key), result)
+        return result
+
+    return await _run("s3-event", key, work)
+
+
+async def handle_message(body: Dict[str, Any], context: Any = None) -> List[Dict[str, Any]]:
+    """One SQS message body: an S3 notification or a work order."""
+    if "Records" in body:
+        return [await handle_upload(key, context) for key in s3_keys(body)]
+    if body.get("Event") == "s3:TestEvent":
+        return []
+    key = body.get("key")
+    action = body.get("action", "convert")
+    if not key or action not in ACTIONS:
+        raise ValueError(f"Unrecognized message: {json.dumps(body)[:200]}")
+    if action == "convert":
+        work = lambda: main.convert_from_s3(body)  # noqa: E731
+        result = await _run("sqs", key, work)
+        await executors.run_io(_put_result, result_key(key), result)
+        return [result]
+    work = lambda: main.process_from_s3(_request(context), body)  # noqa: E731
+    result = await _run("sqs", key, work)
+    if body.get("continuation"):
+        result = await executors.run_io(_merge_result, result_key(key), result)
+    await executors.run_io(_put_result, result_key(key), result)
+    if result.get("continuation"):
+        await executors.run_io(_send_continuation, key, result["continuation"])
+    return [result]
+
+
+async def handle_sqs_batch(event: Dict[str, Any], context: Any = None) -> Dict[str, Any]:
+    """Process an SQS batch; returns the partial batch response Lambda expects."""
+    failures: List[Dict[str, str]] = []
+    for record in event.get("Records") or []:
+        message_id = record.get("messageId", "")
+        try:
+            await handle_message(json.loads(record.get("body") or "{}"), context)
+        except (ValueError, KeyError) as e:
+            logger.error(f"Dropping SQS message {message_id}: {e}")
+        except Exception as e:
+            logger.error(f"SQS message {message_id} failed, will retry: {e}")
+            failures.append({"itemIdentifier": message_id})
+    return {"batchItemFailures": failures}
+
+
+async def handle_s3_event(event: Dict[str, Any], context: Any = None) -> Dict[str, Any]:
+    """Process every upload in an S3 notification; raises if any may succeed on retry."""
+    processed: List[str] = []
+    retry: Optional[Exception] = None
+    for key in s3_keys(event):
+        try:
+            await handle_upload(key, context)
+            processed.append(key)
+        except ValueError as e:
+            logger.error(f"Skipping upload {key}: {e}")
+        except Exception as e:
+            logger.error(f"Upload {key} failed: {e}")
+            retry = e
+    if retry is not None:
+        # Lambda retries asynchronous invocations; keys already done are processed again
+        raise retry
+    return {"processed": processed}
+
+
+def _merge_result(key: str, part: Dict[str, Any]) -> Dict[str, Any]:
+    """``part`` of an analysis added to the pages already stored under ``key``."""
+    from botocore.exceptions import ClientError
+
+    try:
+        stored = json.loads(main.get_s3_client().get_object(Bucket=main.BUCKET_NAME, Key=key)["Body"].read())
+    except (ClientError, ValueError):
+        return part
+    if stored.get("digest") != part.get("digest"):
+        return part
+    pages = {r["page"]: r for r in stored.get("results", [])}
+    pages.update((r["page"], r) for r in part["results"])
+    merged = {**part, "results": [pages[p] for p in sorted(pages)], "page_count": len(pages)}
+    if "blank_pages" in stored or "blank_pages" in part:
+        merged["blank_pages"] = sorted(set(stored.get("blank_pages", [])) | set(part.get("blank_pages", [])))
+    if "dedupe" in stored:
+        merged["dedupe"] = stored["dedupe"]  # planned over the whole range by the first part
+    return merged
+
+
+def _send_continuation(key: str, token: str) -> None:
+    if not WORK_QUEUE_URL:
+        logger.warning(f"{key}: analysis incomplete and WORK_QUEUE_URL is not set; the result holds the continuation token")
+        return
+    body = json.dumps({"key": key, "action": "analyze", "continuation": token})
+    clients.get_sqs_client().send_message(QueueUrl=WORK_QUEUE_URL, MessageBody=body)
+
+
+def _put_result(key: str, result: Dict[str, Any]) -> None:
+    main.get_s3_client().put_object(
+        Bucket=main.BUCKET_NAME, Key=key, Body=json.dumps(result).encode(), ContentType="application/json")
@@ -0,0 +1,134 @@
+"""Size-limited spooling of uploaded PDFs to disk.
+
+Starlette parses the multipart body into a SpooledTemporaryFile (memory up
+to 1 MiB, then disk) before the route runs. ``spool`` copies it in
+fixed-size chunks to a temp file the CPU pool can open by path, computing
+the SHA-256 on the way and aborting with ``UploadTooLarge`` past
+``MAX_UPLOAD_BYTES``. Memory use is one chunk, whatever the upload size.
+
+``BodyLimit`` enforces the limit while the body arrives, before Starlette
+has parsed it: from the Content-Length header when there is one, otherwise
+by counting chunks, so a chunked upload is cut off once it is too large
+rather than buffered whole first.
+"""
+import hashlib
+import json
+import os
+import tempfile
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, BinaryIO, Optional
+
+import executors
+import metrics
+
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", str(200 * 1024 * 1024)))
+CHUNK_BYTES = 1024 * 1024
+# Multipart boundaries and part headers on top of the file itself
+_MULTIPART_OVERHEAD = 64 * 1024
+
+
+class UploadTooLarge(Exception):
+    def __init__(self, limit: int):
+        super().__init__(f"upload exceeds the {limit // (1024 * 1024)} MiB limit")
+        self.limit = limit
+
+
+@dataclass
+class SpooledUpload:
+    path: str
+    size: int
+    sha256: str
+
+
+def too_large(content_length: Optional[str], limit: Optional[int] = None) -> bool:
+    try:
+        return int(content_length) > (limit or MAX_UPLOAD_BYTES) + _MULTIPART_OVERHEAD
+    except (TypeError, ValueError):
+        return False
+
+
+class BodyLimit:
+    """ASGI middleware answering 413 to POST bodies over the upload limit."""
+
+    def __init__(self, app: Any):
+        self.app = app
+
+    async def __call__(self, scope: Any, receive: Any, send: Any) -> None:
+        if scope["type"] != "http" or scope["method"] != "POST":
+            await self.app(scope, receive, send)
+            return
+        headers = dict(scope["headers"])
+        if too_large((headers.get(b"content-length") or b"").decode("latin-1") or None):
+            await _reject(send)
+            return
+        limit = MAX_UPLOAD_BYTES + _MULTIPART_OVERHEAD
+        received = 0
+        exceeded = False
+        responded = False
+
+        async def limited_receive() -> Any:
+            nonlocal received, exceeded
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    exceeded = True
+                    raise UploadTooLarge(MAX_UPLOAD_BYTES)
+            return message
+
+        async def guarded_send(message: Any) -> None:
+            nonlocal responded
+            # The app turns the aborted read into an error of its own; answer 413 instead
+            if exceeded:
+                if not responded:
+                    responded = True
+                    await _reject(send)
+                return
+            responded = True
+            await send(message)
+
+        try:
+            await self.app(scope, limited_receive, guarded_send)
+        except UploadTooLarge:
+            if not responded:
+                await _reject(send)
+
+
+async def _reject(send: Any) -> None:
+    body = json.dumps({"detail": str(UploadTooLarge(MAX_UPLOAD_BYTES))}).encode()
+    await send({"type": "http.response.start", "status": 413,
+                "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())]})
+    await send({"type": "http.response.body", "body": body})
+
+
+def _copy(src: BinaryIO, path: str, limit: int) -> SpooledUpload:
+    digest = hashlib.sha256()
+    size = 0
+    src.seek(0)
+    with open(path, "wb") as dst:
+        while True:
+            chunk = src.read(CHUNK_BYTES)
+            if not chunk:
+                break
+            size += len(chunk)
+            if size > limit:
+                raise UploadTooLarge(limit)
+            digest.update(chunk)
+            dst.write(chunk)
+    return SpooledUpload(path, size, digest.hexdigest())
+
+
+@asynccontextmanager
+async def spool(file: Any, limit: Optional[int] = None) -> AsyncIterator[SpooledUpload]:
+    """Copy an UploadFile to a temp file; yields its path, size and SHA-256."""
+    limit = limit or MAX_UPLOAD_BYTES
+    fd, path = tempfile.mkstemp(suffix=".pdf")
+    os.close(fd)
+    try:
+        with metrics.stage("spool"):
+            upload = await executors.run_io(_copy, file.file, path, limit)
+        metrics.count_bytes(upload.size, "in")
+        yield upload
+    finally:
+        os.unlink(path)
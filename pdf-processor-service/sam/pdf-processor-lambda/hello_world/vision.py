@@ -0,0 +1,261 @@
+"""Vision backends used for per-page slide analysis.
+
+``get_vision_backend()`` returns the process-wide backend selected by the
+``VISION_BACKEND`` environment variable:
+
+- ``openai`` (default): real chat completions through the OpenAI client,
+  retrying 429, 5xx and connection errors ``VISION_MAX_RETRIES`` times with
+  exponential backoff, or after the server's ``Retry-After``.
+- ``fake``: deterministic local stand-in with configurable latency, error and
+  429 rates, for load tests without network or API budget.
+- ``record`` / ``replay``: cassette mode. ``record`` wraps the OpenAI backend
+  and appends every exchange to ``VISION_CASSETTE``; ``replay`` serves those
+  exchanges back without touching the network.
+"""
+import abc
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+# Retries of throttled and failed OpenAI calls; the SDK's own retries are turned off
+MAX_RETRIES = int(os.getenv("VISION_MAX_RETRIES", "3"))
+RETRY_BASE_SECONDS = 0.5
+RETRY_MAX_SECONDS = 20.0
+
+
+class VisionError(Exception):
+    """A vision call failed."""
+
+
+class VisionRateLimited(VisionError):
+    """The backend answered 429; ``retry_after`` is in seconds when known."""
+
+    def __init__(self, message: str, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+@dataclass
+class VisionReply:
+    content: str
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+
+
+class VisionBackend(abc.ABC):
+    """Interface: one chat completion with an image, returning the reply text."""
+
+    name = "base"
+    requires_api_key = False
+
+    @abc.abstractmethod
+    def complete(
+        self,
+        model: str,
+        messages: List[Dict[str, Any]],
+        response_format: Optional[Dict[str, Any]] = None,
+        max_tokens: int = 1000,
+    ) -> VisionReply:
+        ...
+
+
+class OpenAIVisionBackend(VisionBackend):
+    name = "openai"
+    requires_api_key = True
+
+    def __init__(self, client=None, max_retries: int = MAX_RETRIES, sleep=time.sleep):
+        self._client = client
+        self.max_retries = max_retries
+        self._sleep = sleep
+
+    @property
+    def client(self):
+        if self._client is None:
+            from clients import get_openai_client
+
+            # Retried here instead, so Retry-After is honored and attempts are not multiplied
+            self._client = get_openai_client().with_options(max_retries=0)
+        return self._client
+
+    def complete(self, model, messages, response_format=None, max_tokens=1000):
+        import openai
+
+        kwargs: Dict[str, Any] = {"model": model, "messages": messages, "max_tokens": max_tokens}
+        if response_format is not None:
+            kwargs["response_format"] = response_format
+        for attempt in range(self.max_retries + 1):
+            try:
+                response = self.client.chat.completions.create(**kwargs)
+                break
+            except (openai.RateLimitError, openai.InternalServerError, openai.APIConnectionError) as e:
+                retry_after = _retry_after(e)
+                if attempt == self.max_retries:
+                    if isinstance(e, openai.RateLimitError):
+                        raise VisionRateLimited(str(e), retry_after) from e
+                    raise VisionError(str(e)) from e
+                if retry_after is None:
+                    retry_after = RETRY_BASE_SECONDS * 2 ** attempt * random.uniform(0.5, 1.0)
+                self._sleep(min(retry_after, RETRY_MAX_SECONDS))
+        usage = getattr(response, "usage", None)
+        return VisionReply(
+            content=response.choices[0].message.content or "",
+            prompt_tokens=getattr(usage, "prompt_tokens", 0) or 0,
+            completion_tokens=getattr(usage, "completion_tokens", 0) or 0,
+        )
+
+
+def _retry_after(e: Exception) -> Optional[float]:
+    try:
+        return float(e.response.headers.get("retry-after"))
+    except (AttributeError, TypeError, ValueError):
+        return None
+
+
+def _request_key(model: str, messages: List[Dict[str, Any]], response_format: Optional[Dict[str, Any]]) -> str:
+    blob = json.dumps({"model": model, "messages": messages, "response_format": response_format}, sort_keys=True)
+    return hashlib.sha256(blob.encode()).hexdigest()
+
+
+def _fake_value(prop: Dict[str, Any], name: str, rng: random.Random) -> Any:
+    if prop.get("type") == "array":
+        return [f"{name} item {i + 1}" for i in range(rng.randint(1, 4))]
+    if prop.get("type") == "string":
+        return f"Synthetic {name} {rng.randint(1000, 9999)}"
+    return None
+
+
+class FakeVisionBackend(VisionBackend):
+    """Deterministic offline backend.
+
+    The outcome of each call (latency, error, 429, reply body) is derived from
+    a hash of the request and ``seed``, so repeated runs over the same corpus
+    produce the same results regardless of call order or concurrency.
+    """
+
+    name = "fake"
+
+    def __init__(
+        self,
+        latency_ms: float = 800.0,
+        jitter_ms: float = 400.0,
+        error_rate: float = 0.0,
+        rate_limit_rate: float = 0.0,
+        seed: int = 0,
+        sleep=time.sleep,
+    ):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.seed = seed
+        self._sleep = sleep
+
+    @classmethod
+    def from_env(cls) -> "FakeVisionBackend":
+        return cls(
+            latency_ms=float(os.getenv("VISION_FAKE_LATENCY_MS", "800")),
+            jitter_ms=float(os.getenv("VISION_FAKE_JITTER_MS", "400")),
+            error_rate=float(os.getenv("VISION_FAKE_ERROR_RATE", "0")),
+            rate_limit_rate=float(os.getenv("VISION_FAKE_429_RATE", "0")),
+            seed=int(os.getenv("VISION_FAKE_SEED", "0")),
+        )
+
+    def complete(self, model, messages, response_format=None, max_tokens=1000):
+        key = _request_key(model, messages, response_format)
+        rng = random.Random(f"{self.seed}:{key}")
+        # Exponential-ish tail: most calls near latency_ms, a few far above it
+        delay_ms = max(0.0, self.latency_ms + rng.expovariate(1.0) * self.jitter_ms - self.jitter_ms / 2)
+        if delay_ms:
+            self._sleep(delay_ms / 1000.0)
+        roll = rng.random()
+        if roll < self.rate_limit_rate:
+            raise VisionRateLimited("fake backend: rate limited", retry_after=1.0)
+        if roll < self.rate_limit_rate + self.error_rate:
+            raise VisionError("fake backend: injected failure")
+        schema = ((response_format or {}).get("json_schema") or {}).get("schema") or {}
+        props = schema.get("properties") or {"summary": {"type": "string"}}
+        body = {name: _fake_value(prop, name, rng) for name, prop in props.items()}
+        content = json.dumps(body)
+        return VisionReply(content=content, prompt_tokens=850, completion_tokens=len(content) // 4)
+
+
+class CassetteVisionBackend(VisionBackend):
+    """Record/replay wrapper storing exchanges as JSON lines keyed by request hash."""
+
+    def __init__(self, path: str, mode: str = "replay", inner: Optional[VisionBackend] = None):
+        if mode not in ("record", "replay"):
+            raise ValueError("mode must be 'record' or 'replay'")
+        if mode == "record" and inner is None:
+            raise ValueError("record mode needs an inner backend")
+        self.path = path
+        self.mode = mode
+        self.inner = inner
+        self.name = mode
+        self.requires_api_key = mode == "record" and inner.requires_api_key
+        self._lock = threading.Lock()
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        entry = json.loads(line)
+                        self._entries[entry["key"]] = entry
+
+    def complete(self, model, messages, response_format=None, max_tokens=1000):
+        key = _request_key(model, messages, response_format)
+        entry = self._entries.get(key)
+        if self.mode == "replay":
+            if entry is None:
+                raise VisionError(f"cassette {self.path} has no recording for request {key[:12]}")
+            return VisionReply(entry["content"], entry.get("prompt_tokens", 0), entry.get("completion_tokens", 0))
+        reply = self.inner.complete(model, messages, response_format, max_tokens)
+        entry = {
+            "key": key,
+            "model": model,
+            "content": reply.content,
+            "prompt_tokens": reply.prompt_tokens,
+            "completion_tokens": reply.completion_tokens,
+        }
+        with self._lock:
+            self._entries[key] = entry
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry) + "\n")
+        return reply
+
+
+_backend: Optional[VisionBackend] = None
+_backend_lock = threading.Lock()
+
+
+def _backend_from_env() -> VisionBackend:
+    kind = os.getenv("VISION_BACKEND", "openai").lower()
+    if kind == "openai":
+        return OpenAIVisionBackend()
+    if kind == "fake":
+        return FakeVisionBackend.from_env()
+    if kind in ("record", "replay"):
+        path = os.getenv("VISION_CASSETTE", "vision-cassette.jsonl")
+        inner = OpenAIVisionBackend() if kind == "record" else None
+        return CassetteVisionBackend(path, mode=kind, inner=inner)
+    raise ValueError(f"Unknown VISION_BACKEND: {kind}")
+
+
+def get_vision_backend() -> VisionBackend:
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                _backend = _backend_from_env()
+    return _backend
+
+
+def set_vision_backend(backend: Optional[VisionBackend]) -> None:
+    """Override the process-wide backend (tests, benchmarks); None resets to env."""
+    global _backend
+    with _backend_lock:
+        _backend = backend
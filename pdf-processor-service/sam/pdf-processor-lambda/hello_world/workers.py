@@ -0,0 +1,218 @@
+"""Long-lived render worker processes with recycling and a watchdog.
+
+``WorkerPool`` is the process-backed CPU pool (see executors.py). It is
+started with the app (FastAPI lifespan) and lives as long as the service.
+Each worker imports PyMuPDF, NumPy and the render modules before taking
+work, so no request pays for the imports or the process start. Each worker
+also keeps its own cache of opened documents (render.py).
+
+A worker runs one task at a time, a page for rendering. It is replaced:
+
+- after ``WORKER_MAX_PAGES`` tasks (default 500) or once its resident memory
+  passes ``WORKER_MAX_RSS_MB`` (default 1024), because allocator
+  fragmentation from odd PDFs never goes back to the OS;
+- when a task runs longer than ``WORKER_TASK_TIMEOUT_SECONDS`` (default
+  120). The worker is killed and the caller gets ``WorkerTimeout``, so one
+  pathological page cannot hold a slot forever;
+- when it dies, e.g. MuPDF crashing on a malformed file (``WorkerLost``).
+
+Tasks are dispatched from a thread per worker slot, so the pool works with any
+event loop through ``loop.run_in_executor``, like the executor it replaces.
+"""
+import logging
+import multiprocessing
+import os
+import queue
+import threading
+from concurrent.futures import Executor, Future, ThreadPoolExecutor
+from typing import Any, Callable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+MAX_PAGES = int(os.getenv("WORKER_MAX_PAGES", "500"))
+MAX_RSS_BYTES = int(os.getenv("WORKER_MAX_RSS_MB", "1024")) * 1024 * 1024
+TASK_TIMEOUT = float(os.getenv("WORKER_TASK_TIMEOUT_SECONDS", "120"))
+# Imported by every worker before it reports ready
+PRELOAD = ("fitz", "numpy", "render", "fingerprint", "preflight")
+# How long a new worker may take to import PRELOAD
+START_TIMEOUT = 60.0
+
+
+class WorkerLost(RuntimeError):
+    """The worker process running a task died."""
+
+
+class WorkerTimeout(WorkerLost, TimeoutError):
+    """A task ran past the watchdog timeout; its worker was killed."""
+
+
+def _rss_bytes() -> int:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        import resource
+
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024  # peak, in KB on Linux
+
+
+def _worker_main(conn: Any, preload: Tuple[str, ...]) -> None:
+    import importlib
+
+    for name in preload:
+        try:
+            importlib.import_module(name)
+        except ImportError:
+            pass
+    conn.send(("ready", os.getpid()))
+    while True:
+        try:
+            task = conn.recv()
+        except (EOFError, OSError):
+            return
+        if task is None:
+            return
+        fn, args = task
+        try:
+            reply = ("ok", fn(*args))
+        except Exception as e:
+            reply = ("error", e)
+        try:
+            conn.send(reply + (_rss_bytes(),))
+        except Exception as e:
+            # The result or the exception did not pickle
+            conn.send(("error", RuntimeError(f"{type(e).__name__}: {e}"), _rss_bytes()))
+
+
+class _Worker:
+    def __init__(self, ctx: Any, preload: Tuple[str, ...]):
+        self.conn, child = ctx.Pipe()
+        self.process = ctx.Process(target=_worker_main, args=(child, preload), daemon=True)
+        self.process.start()
+        child.close()
+        self.ready = False
+        self.tasks = 0
+        self.rss = 0
+
+    def wait_ready(self) -> None:
+        if self.ready:
+            return
+        if not self.conn.poll(START_TIMEOUT):
+            raise WorkerLost("worker did not start")
+        self.conn.recv()
+        self.ready = True
+
+    def stop(self, kill: bool = False) -> None:
+        if not kill:
+            try:
+                self.conn.send(None)
+            except (OSError, ValueError):
+                kill = True
+            else:
+                self.process.join(1.0)
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join()
+        self.conn.close()
+
+
+class WorkerPool(Executor):
+    def __init__(self, size: int, max_pages: int = MAX_PAGES, max_rss_bytes: int = MAX_RSS_BYTES,
+                 task_timeout: float = TASK_TIMEOUT, preload: Tuple[str, ...] = PRELOAD):
+        self.size = max(1, size)
+        self.max_pages = max_pages
+        self.max_rss_bytes = max_rss_bytes
+        self.task_timeout = task_timeout
+        self.preload = preload
+        self.recycled = 0  # by pages or memory
+        self.killed = 0  # by the watchdog, or found dead
+        self._ctx = multiprocessing.get_context("spawn")
+        self._idle: "queue.Queue[Optional[_Worker]]" = queue.Queue()  # None once shut down
+        self._workers: List[_Worker] = []
+        self._lock = threading.Lock()
+        self._closed = False
+        for _ in range(self.size):
+            self._idle.put(self._spawn())
+        self._dispatch = ThreadPoolExecutor(self.size, thread_name_prefix="worker")
+
+    def _spawn(self) -> _Worker:
+        worker = _Worker(self._ctx, self.preload)
+        with self._lock:
+            self._workers.append(worker)
+        return worker
+
+    def _replace(self, worker: _Worker, kill: bool) -> None:
+        with self._lock:
+            if worker not in self._workers:
+                return  # already stopped by shutdown()
+            self._workers.remove(worker)
+        worker.stop(kill=kill)
+        if not self._closed:
+            self._idle.put(self._spawn())
+
+    def submit(self, fn: Callable[..., Any], /, *args: Any, **kwargs: Any) -> Future:
+        if kwargs:
+            raise TypeError("WorkerPool tasks take positional arguments only")
+        if self._closed:
+            raise RuntimeError("cannot schedule new futures after shutdown")
+        return self._dispatch.submit(self._call, fn, args)
+
+    def _call(self, fn: Callable[..., Any], args: Tuple[Any, ...]) -> Any:
+        worker = self._idle.get()
+        if worker is None:
+            self._idle.put(None)  # wake the next waiting dispatch thread too
+            raise RuntimeError("cannot run tasks after shutdown")
+        try:
+            worker.wait_ready()
+            worker.conn.send((fn, args))
+            if not worker.conn.poll(self.task_timeout):
+                raise WorkerTimeout(f"{getattr(fn, '__name__', fn)} exceeded {self.task_timeout:g}s")
+            status, value, worker.rss = worker.conn.recv()
+        except WorkerTimeout as e:
+            with self._lock:
+                self.killed += 1
+            logger.error(f"Killing worker {worker.process.pid}: {e}")
+            self._replace(worker, kill=True)
+            raise
+        except (EOFError, OSError, WorkerLost) as e:
+            with self._lock:
+                self.killed += 1
+            logger.error(f"Worker {worker.process.pid} died (exit code {worker.process.exitcode}): {e!r}")
+            self._replace(worker, kill=True)
+            raise WorkerLost(f"worker died running {getattr(fn, '__name__', fn)}") from e
+        except Exception:
+            # The task did not pickle; nothing reached the worker
+            self._idle.put(worker)
+            raise
+        worker.tasks += 1
+        if worker.tasks >= self.max_pages or worker.rss >= self.max_rss_bytes:
+            with self._lock:
+                self.recycled += 1
+            logger.info(f"Recycling worker {worker.process.pid} after {worker.tasks} tasks, "
+                        f"{worker.rss // (1024 * 1024)} MB RSS")
+            self._replace(worker, kill=False)
+        else:
+            self._idle.put(worker)
+        if status == "error":
+            raise value
+        return value
+
+    def pids(self) -> List[int]:
+        with self._lock:
+            return [w.process.pid for w in self._workers]
+
+    def shutdown(self, wait: bool = True, *, cancel_futures: bool = False) -> None:
+        self._closed = True
+        if not wait:
+            # Unblock dispatch threads stuck on busy workers
+            with self._lock:
+                workers = list(self._workers)
+            for worker in workers:
+                worker.process.kill()
+        for _ in range(self.size):
+            self._idle.put(None)
+        self._dispatch.shutdown(wait=wait, cancel_futures=cancel_futures)
+        with self._lock:
+            workers, self._workers = self._workers, []
+        for worker in workers:
+            worker.stop(kill=not wait)
@@ -0,0 +1,39 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+# Lambda packages hello_world/ as the code root, so its modules import each
+# other as top-level modules (``from main import app``).
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(__file__)), "hello_world"))
+
+os.environ.setdefault("OPENAI_API_KEY", "test-key")
+os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+os.environ.setdefault("DOCUMENT_CACHE_DIR", tempfile.mkdtemp(prefix="pdf-documents-"))
+
+
+@pytest.fixture()
+def make_pdf():
+    """Builds a text PDF from the benchmark corpus: ``make_pdf(pages=3, size="letter")``.
+    Every page has its own title and body text, so none are duplicates."""
+    from benchmarks.corpus import CorpusDoc
+
+    def make(pages: int = 3, size: str = "letter") -> bytes:
+        return CorpusDoc(f"text-{pages}p-{size}", "text", pages, size).build()
+
+    return make
+
+
+@pytest.fixture()
+def s3(monkeypatch):
+    """An in-memory S3 installed as the service's client, with ``BUCKET_NAME`` "b"."""
+    import clients
+    import main
+    from benchmarks.fakes import FakeS3Client
+
+    s3 = FakeS3Client()
+    clients.set_s3_client(s3)
+    monkeypatch.setattr(main, "BUCKET_NAME", "b")
+    yield s3
+    clients.set_s3_client(None)
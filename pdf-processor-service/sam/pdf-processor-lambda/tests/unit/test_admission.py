@@ -0,0 +1,90 @@
+import asyncio
+
+import fitz
+import pytest
+from fastapi.testclient import TestClient
+
+import admission
+import main
+from admission import AdmissionController, Overloaded
+
+
+def test_render_cost_is_pixel_area_in_megapixels():
+    # US letter at 300 DPI renders 2550 x 3300
+    assert admission.render_cost([(612, 792)] * 2, 300) == pytest.approx(2 * 2550 * 3300 / 1e6)
+
+
+def test_queued_request_is_admitted_on_release():
+    ctrl = AdmissionController(budget_mp=10, queue_seconds=5, max_queue=4)
+
+    async def go():
+        await ctrl.acquire(8)
+        waiter = asyncio.create_task(ctrl.acquire(8))
+        await asyncio.sleep(0.01)
+        assert not waiter.done()
+        ctrl.release(8, 1.0)
+        await asyncio.wait_for(waiter, 1)
+        return ctrl.in_flight_mp
+
+    assert asyncio.run(go()) == 8
+
+
+def test_rejects_with_retry_after_when_queue_times_out():
+    ctrl = AdmissionController(budget_mp=10, queue_seconds=0.01, max_queue=4)
+
+    async def go():
+        await ctrl.acquire(8)
+        await ctrl.acquire(8)
+
+    with pytest.raises(Overloaded) as exc:
+        asyncio.run(go())
+    assert exc.value.retry_after >= 1
+    assert ctrl.in_flight_mp == 8
+    assert not ctrl._waiters
+
+
+def test_oversized_request_runs_alone():
+    ctrl = AdmissionController(budget_mp=10, queue_seconds=1, max_queue=0)
+
+    asyncio.run(ctrl.acquire(50))
+
+    assert ctrl.in_flight_mp == 50
+    with pytest.raises(Overloaded):
+        asyncio.run(ctrl.acquire(1))
+
+
+
+def test_background_work_waits_behind_requests_without_rejection():
+    ctrl = AdmissionController(budget_mp=10, queue_seconds=0.01, max_queue=1)
+
+    async def go():
+        await ctrl.acquire(8)
+        background = [asyncio.create_task(ctrl.acquire(8, background=True)) for _ in range(3)]
+        await asyncio.sleep(0.05)  # well past queue_seconds
+        request = asyncio.create_task(ctrl.acquire(8))
+        await asyncio.sleep(0)
+        ctrl.release(8, 1.0)
+        await asyncio.wait_for(request, 1)
+        assert not any(t.done() for t in background)
+        for _ in background:
+            ctrl.release(8, 1.0)
+            await asyncio.sleep(0.01)
+        await asyncio.wait_for(asyncio.gather(*background), 1)
+
+    asyncio.run(go())
+    assert ctrl.in_flight_mp == 8 and not ctrl._background
+
+
+def test_convert_pdf_returns_429_when_over_budget():
+    doc = fitz.open()
+    doc.new_page()
+    ctrl = AdmissionController(budget_mp=1, queue_seconds=0.01, max_queue=0)
+    asyncio.run(ctrl.acquire(1))
+    admission.set_controller(ctrl)
+    try:
+        resp = TestClient(main.app).post("/convert-pdf", files={"file": ("a.pdf", doc.tobytes(), "application/pdf")})
+    finally:
+        admission.set_controller(None)
+
+    assert resp.status_code == 429
+    assert int(resp.headers["Retry-After"]) >= 1
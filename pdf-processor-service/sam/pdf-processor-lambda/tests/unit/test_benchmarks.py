@@ -0,0 +1,36 @@
+import fitz
+
+from benchmarks.corpus import CORPORA
+from benchmarks.run import compare, percentile, run
+from clients import set_s3_client
+from vision import set_vision_backend
+
+
+def test_corpus_is_deterministic():
+    doc = CORPORA["smoke"][1]
+
+    first, second = doc.build(seed=3), doc.build(seed=3)
+
+    assert first == second
+    assert fitz.open(stream=first, filetype="pdf").page_count == doc.pages
+
+
+def test_percentile_nearest_rank():
+    values = list(range(1, 101))
+
+    assert percentile(values, 50) == 50
+    assert percentile(values, 99) == 99
+    assert percentile([], 95) == 0.0
+
+
+def test_smoke_run_and_compare():
+    try:
+        result = run(corpus="smoke", endpoints=["process-from-s3"], repeat=1, log=lambda line: None)
+    finally:
+        set_s3_client(None)
+        set_vision_backend(None)
+
+    assert all(r["errors"] == 0 for r in result["results"])
+    slower = {"results": [dict(r, pages_per_sec=r["pages_per_sec"] * 10) for r in result["results"]]}
+    assert compare(result, result) == []
+    assert compare(result, slower)
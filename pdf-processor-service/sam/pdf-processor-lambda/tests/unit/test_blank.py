@@ -0,0 +1,54 @@
+import fitz
+import numpy as np
+from fastapi.testclient import TestClient
+
+import blank
+import dedup
+import main
+from fingerprint import fingerprint_pages
+from tests.unit.test_dedup import CountingBackend
+from vision import set_vision_backend
+
+
+def test_classify_ignores_background_level():
+    off_white = np.full((100, 100), 230, dtype=np.float32)
+    dark_cover = np.full((100, 100), 25, dtype=np.float32)
+    text = off_white.copy()
+    text[40:50, 10:90] = 20
+
+    assert blank.classify(off_white).blank
+    assert blank.classify(dark_cover).blank
+    assert not blank.classify(text).blank
+
+
+def test_page_number_alone_is_blank_but_a_heading_is_not(tmp_path):
+    doc = fitz.open()
+    doc.new_page()
+    doc.new_page().insert_text((300, 760), "17", fontsize=10)
+    doc.new_page().insert_text((72, 72), "Notes", fontsize=14)
+    path = str(tmp_path / "doc.pdf")
+    doc.save(path)
+
+    assert [fp.blank for fp in fingerprint_pages(path, [0, 1, 2])] == [True, True, False]
+
+
+def test_blank_pages_get_placeholders_without_vision_calls():
+    doc = fitz.open()
+    doc.new_page().insert_text((72, 200), "Work zone layout", fontsize=30)
+    doc.new_page()
+    doc.new_page().insert_text((72, 200), "Flagger positions", fontsize=30)
+    backend = CountingBackend()
+    set_vision_backend(backend)
+    dedup.set_store(None)
+    try:
+        body = TestClient(main.app).post(
+            "/process-pdf-with-ai", files={"file": ("a.pdf", doc.tobytes(), "application/pdf")}).json()
+    finally:
+        set_vision_backend(None)
+        dedup.set_store(None)
+
+    assert backend.calls == 2
+    assert body["blank_pages"] == [2]
+    assert body["results"][1]["blank"] is True
+    assert body["results"][1]["analysis"]["topic"] == "Blank Page"
+    assert [r["page"] for r in body["results"]] == [1, 2, 3]
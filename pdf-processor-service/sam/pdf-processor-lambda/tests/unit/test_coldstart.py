@@ -0,0 +1,16 @@
+from benchmarks.coldstart import parse_importtime, profile
+
+
+def test_health_cold_start_skips_heavy_modules():
+    result = profile()
+
+    assert result["status"] == 200
+    assert result["heavy_loaded"] == []
+
+
+def test_parse_importtime():
+    stderr = "import time: self [us] | cumulative | imported package\nimport time:       120 |        450 |   fastapi.routing\n"
+
+    rows = parse_importtime(stderr)
+
+    assert rows == [{"module": "fastapi.routing", "self_us": 120, "cumulative_us": 450, "depth": 1}]
@@ -0,0 +1,94 @@
+import fitz
+from fastapi.testclient import TestClient
+
+import deadline
+import dedup
+import main
+from vision import FakeVisionBackend, set_vision_backend
+
+
+class _LambdaContext:
+    def __init__(self, remaining_ms):
+        self.remaining_ms = remaining_ms
+
+    def get_remaining_time_in_millis(self):
+        return self.remaining_ms
+
+
+class _CountingBackend(FakeVisionBackend):
+    def __init__(self):
+        super().__init__(latency_ms=0, jitter_ms=0)
+        self.calls = 0
+
+    def complete(self, *args, **kwargs):
+        self.calls += 1
+        return super().complete(*args, **kwargs)
+
+
+def test_deadline_takes_the_earlier_limit(monkeypatch):
+    monkeypatch.setattr(deadline, "MARGIN_SECONDS", 1.0)
+
+    assert deadline.from_request({}, {}).at is None
+    by_context = deadline.from_request({"aws.context": _LambdaContext(30_000)}, {})
+    both = deadline.from_request({"aws.context": _LambdaContext(30_000)}, {"x-deadline-ms": "5000"})
+
+    assert 28 < by_context.remaining() <= 29
+    assert 3 < both.remaining() <= 4
+    assert not both.allows(10)
+
+
+def test_token_round_trip_and_rejection():
+    token = deadline.encode_token({"key": "uploads/a.pdf", "pages": "3-9"})
+
+    assert deadline.decode_token(token) == {"key": "uploads/a.pdf", "pages": "3-9"}
+    for bad in ("not-a-token", deadline.encode_token({"x": 1})[:-4]):
+        try:
+            deadline.decode_token(bad)
+        except ValueError:
+            continue
+        raise AssertionError(bad)
+
+
+def test_format_pages_round_trips_through_parse():
+    assert main._format_pages([0, 1, 2, 5, 7, 8]) == "1-3,6,8-9"
+    assert main._parse_pages(main._format_pages([4, 9, 10]), 12) == [4, 9, 10]
+
+
+def test_process_from_s3_stops_at_deadline_and_resumes(monkeypatch, s3, make_pdf):
+    s3.put_object(Bucket="b", Key="uploads/long.pdf", Body=make_pdf(6))
+    monkeypatch.setattr(main, "DEADLINE_CHUNK_PAGES", 2)
+    monkeypatch.setattr(deadline, "MARGIN_SECONDS", 0.0)
+    set_vision_backend(FakeVisionBackend(latency_ms=300, jitter_ms=0))
+    client = TestClient(main.app)
+    try:
+        first = client.post("/process-from-s3", json={"payload": {"key": "uploads/long.pdf", "dedupe": False}},
+                            headers={"X-Deadline-Ms": "450"}).json()
+        rest = client.post("/process-from-s3", json={"payload": {"continuation": first["continuation"]}}).json()
+    finally:
+        set_vision_backend(None)
+
+    assert first["complete"] is False and first["page_count"] == 2 and first["remaining_pages"] == 4
+    assert [r["page"] for r in first["results"]] == [1, 2]
+    assert rest["complete"] is True and "continuation" not in rest
+    assert [r["page"] for r in rest["results"]] == [3, 4, 5, 6]
+
+
+def test_duplicates_in_different_chunks_are_analyzed_once(monkeypatch, s3):
+    doc = fitz.open()
+    for title in ["Agenda", "Safety first", "Questions?", "Lunch break", "Questions?", "Safety first"]:
+        doc.new_page().insert_text((72, 300), title, fontsize=30)
+    s3.put_object(Bucket="b", Key="uploads/dupes.pdf", Body=doc.tobytes())
+    monkeypatch.setattr(main, "DEADLINE_CHUNK_PAGES", 2)
+    backend = _CountingBackend()
+    set_vision_backend(backend)
+    dedup.set_store(dedup.AnalysisStore())
+    try:
+        body = TestClient(main.app).post("/process-from-s3", json={"payload": {"key": "uploads/dupes.pdf"}},
+                                         headers={"X-Deadline-Ms": "60000"}).json()
+    finally:
+        set_vision_backend(None)
+        dedup.set_store(None)
+
+    assert body["complete"] is True and backend.calls == 4
+    assert body["dedupe"]["groups"] == [[2, 6], [3, 5]]
+    assert body["results"][5]["duplicate_of"] == 2
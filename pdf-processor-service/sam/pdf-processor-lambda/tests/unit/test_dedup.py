@@ -0,0 +1,110 @@
+import fitz
+from fastapi.testclient import TestClient
+
+import dedup
+import main
+from fingerprint import PageFingerprint, fingerprint_pages
+from vision import FakeVisionBackend, set_vision_backend
+
+
+class CountingBackend(FakeVisionBackend):
+    def __init__(self):
+        super().__init__(latency_ms=0, jitter_ms=0)
+        self.calls = 0
+
+    def complete(self, *args, **kwargs):
+        self.calls += 1
+        return super().complete(*args, **kwargs)
+
+
+def _deck(titles, footers=None):
+    doc = fitz.open()
+    for i, title in enumerate(titles):
+        page = doc.new_page(width=960, height=540)
+        page.insert_text((300, 270), title, fontsize=40)
+        if footers:
+            page.insert_text((900, 520), footers[i], fontsize=10)
+    return doc
+
+
+def test_group_merges_exact_and_near_duplicates():
+    fps = [
+        PageFingerprint(1, "a", 0b0000, 0b0000, "t"),
+        PageFingerprint(2, "b", 0xFF00, 0xFF00, "t"),
+        PageFingerprint(3, "a", 0b0000, 0b0000, "t"),
+        PageFingerprint(4, "c", 0b0011, 0b0001, "t"),
+        PageFingerprint(5, "d", 0b0000, 0b0000, "other text"),
+    ]
+
+    assert dedup.group(fps, max_distance=2) == [[1, 3, 4], [2], [5]]
+    assert dedup.group(fps, max_distance=-1) == [[1, 3], [2], [4], [5]]
+
+
+def test_fingerprints_ignore_page_numbers_but_not_titles(tmp_path):
+    path = str(tmp_path / "deck.pdf")
+    _deck(["Section 1", "Section 2", "Welcome", "Questions?", "Questions?"],
+          footers=["1", "2", "3", "4", "5"]).save(path)
+
+    groups = dedup.group(fingerprint_pages(path, [0, 1, 2, 3, 4]))
+
+    assert groups == [[1], [2], [3], [4, 5]]
+
+
+def test_duplicate_pages_are_analyzed_once():
+    pdf = _deck(["Welcome", "Questions?", "Safety first", "Questions?", "Questions?"]).tobytes()
+    backend = CountingBackend()
+    set_vision_backend(backend)
+    dedup.set_store(None)
+    client = TestClient(main.app)
+    try:
+        first = client.post("/process-pdf-with-ai", files={"file": ("deck.pdf", pdf, "application/pdf")}).json()
+        calls_after_first = backend.calls
+        second = client.post("/process-pdf-with-ai", files={"file": ("deck.pdf", pdf, "application/pdf")}).json()
+    finally:
+        set_vision_backend(None)
+        dedup.set_store(None)
+
+    assert calls_after_first == 3
+    assert [r["page"] for r in first["results"]] == [1, 2, 3, 4, 5]
+    assert first["results"][3]["duplicate_of"] == 2
+    assert first["results"][3]["analysis"] == first["results"][1]["analysis"]
+    assert first["dedupe"]["groups"] == [[2, 4, 5]]
+    assert first["dedupe"]["ratio"] == 0.4
+    # The second upload is served from the store without vision calls
+    assert backend.calls == calls_after_first
+    assert second["dedupe"]["store_hits"] == 3
+    assert second["results"][0]["from_store"] is True
+
+
+def test_pages_placed_from_other_pdfs_are_not_exact_duplicates(tmp_path):
+    # show_pdf_page gives every page the same "/fzFrm0 Do" content stream
+    source = _deck(["Revenue 2021", "Revenue 2022", "Revenue 2023", "Revenue 2021"])
+    doc = fitz.open()
+    for i in range(len(source)):
+        page = doc.new_page(width=960, height=540)
+        page.show_pdf_page(page.rect, source, i)
+    path = str(tmp_path / "placed.pdf")
+    doc.save(path)
+
+    fps = fingerprint_pages(path, [0, 1, 2, 3])
+
+    assert len({fp.exact for fp in fps[:3]}) == 3
+    assert fps[3].exact == fps[0].exact
+    assert dedup.group(fps, max_distance=-1) == [[1, 4], [2], [3]]
+
+
+def test_scanned_pages_are_merged_on_exact_matches_only(tmp_path):
+    titles = ["Section 1", "Questions?", "Section 2", "Section 3", "Questions?"]
+    slides = _deck(titles)
+    scan = fitz.open()
+    for page in slides:
+        scanned = scan.new_page(width=960, height=540)
+        scanned.insert_image(scanned.rect, pixmap=page.get_pixmap(dpi=72))
+    path = str(tmp_path / "scan.pdf")
+    scan.save(path)
+
+    fps = fingerprint_pages(path, list(range(len(titles))))
+
+    assert not any(fp.has_text for fp in fps)
+    # The two "Questions?" scans are the same image
+    assert dedup.group(fps) == [[1], [2, 5], [3], [4]]
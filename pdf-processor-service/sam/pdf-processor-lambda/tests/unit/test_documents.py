@@ -0,0 +1,138 @@
+import hashlib
+import io
+import os
+import time
+
+import fitz
+import pytest
+from botocore.exceptions import ClientError
+from fastapi.testclient import TestClient
+
+import documents
+import main
+
+
+def _wait_for(check, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while not check() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return check()
+
+
+def test_page_served_after_upload_with_etag(monkeypatch, tmp_path, make_pdf):
+    monkeypatch.setattr(documents, "CACHE_DIR", str(tmp_path))
+    pdf = make_pdf()
+    client = TestClient(main.app)
+
+    body = client.post("/convert-pdf", files={"file": ("a.pdf", pdf, "application/pdf")}).json()
+    assert body["digest"] == hashlib.sha256(pdf).hexdigest()
+
+    resp = client.get(f"/documents/{body['digest']}/pages/2?profile=png")
+    assert resp.status_code == 200
+    assert resp.headers["content-type"] == "image/png"
+    assert "immutable" in resp.headers["cache-control"]
+    assert fitz.Pixmap(resp.content).width == 2550  # letter at 300 DPI
+
+    again = client.get(f"/documents/{body['digest']}/pages/2?profile=png",
+                       headers={"If-None-Match": resp.headers["etag"]})
+    assert again.status_code == 304
+    assert again.content == b""
+
+
+def test_page_range_limits_convert(monkeypatch, tmp_path, make_pdf):
+    monkeypatch.setattr(documents, "CACHE_DIR", str(tmp_path))
+    client = TestClient(main.app)
+
+    body = client.post("/convert-pdf?pages=2-3", files={"file": ("a.pdf", make_pdf(5), "application/pdf")}).json()
+    assert [img["page"] for img in body["images"]] == [2, 3]
+
+    bad = client.post("/convert-pdf?pages=4-9", files={"file": ("a.pdf", make_pdf(3), "application/pdf")})
+    assert bad.status_code == 400
+
+
+def test_parse_pages():
+    assert main._parse_pages(None, 3) == [0, 1, 2]
+    assert main._parse_pages("3,1-2,2", 5) == [0, 1, 2]
+    assert main._parse_pages("4-", 6) == [3, 4, 5]
+
+
+def test_unknown_document_and_page_are_not_found(monkeypatch, tmp_path, make_pdf):
+    monkeypatch.setattr(documents, "CACHE_DIR", str(tmp_path))
+    monkeypatch.setattr(main, "BUCKET_NAME", None)
+    client = TestClient(main.app)
+
+    assert client.get(f"/documents/{'0' * 64}/pages/1").status_code == 404
+    assert client.get("/documents/not-a-digest/pages/1").status_code == 404
+
+    digest = client.post("/convert-pdf", files={"file": ("a.pdf", make_pdf(2), "application/pdf")}).json()["digest"]
+    assert client.get(f"/documents/{digest}/pages/3").status_code == 404
+    assert client.get(f"/documents/{digest}/pages/1?profile=tiff").status_code == 400
+
+
+def test_s3_document_is_copied_and_served_on_another_instance(monkeypatch, tmp_path, s3, make_pdf):
+    pdf = make_pdf(2)
+    s3.put_object(Bucket="b", Key="uploads/deck.pdf", Body=pdf)
+    monkeypatch.setattr(documents, "CACHE_DIR", str(tmp_path / "one"))
+
+    # The copy to S3 runs in the background, on the client's event loop
+    with TestClient(main.app) as client:
+        body = client.post("/convert-from-s3", json={"payload": {"key": "uploads/deck.pdf", "pages": "2"}}).json()
+        assert body["page_count"] == 1
+        stored = _wait_for(lambda: s3.objects.get(documents.s3_key(body["digest"])))
+        assert stored["Body"] == pdf and stored["ContentType"] == "application/pdf"
+
+        # Same key and ETag: served from the store without another download
+        downloaded = s3.bytes_out
+        again = client.post("/convert-from-s3", json={"payload": {"key": "uploads/deck.pdf"}}).json()
+        assert again["page_count"] == 2 and again["digest"] == body["digest"]
+        assert s3.bytes_out - downloaded < len(pdf)  # only the output manifest
+
+        # A fresh local tier fetches the document back from S3
+        monkeypatch.setattr(documents, "CACHE_DIR", str(tmp_path / "two"))
+        resp = client.get(f"/documents/{body['digest']}/pages/1")
+        assert resp.status_code == 200
+        assert os.path.exists(documents.local_path(body["digest"]))
+
+
+def test_local_tier_links_uploads_and_caps_by_free_space(monkeypatch, tmp_path, make_pdf):
+    monkeypatch.setattr(documents, "CACHE_DIR", str(tmp_path / "cache"))
+    monkeypatch.setattr(documents, "CACHE_BYTES", None)
+    upload = tmp_path / "upload.pdf"
+    upload.write_bytes(make_pdf())
+
+    stored = documents.put(str(upload), "a" * 64)
+
+    assert os.stat(stored).st_ino == upload.stat().st_ino
+    free = documents.shutil.disk_usage(documents.CACHE_DIR).free
+    assert documents.cache_limit(1000) == int((free + 1000) * documents.CACHE_DISK_SHARE)
+    monkeypatch.setattr(documents, "CACHE_BYTES", 1)
+    documents.put(str(upload), "b" * 64)
+    assert os.listdir(documents.CACHE_DIR) == []
+
+
+def test_s3_download_pins_the_etag(s3, make_pdf, tmp_path):
+    pdf = make_pdf(1)
+    etag = s3.put_object(Bucket="b", Key="uploads/deck.pdf", Body=pdf)["ETag"]
+    path = str(tmp_path / "deck.pdf")
+
+    assert main._s3_download("uploads/deck.pdf", path, etag) == (len(pdf), hashlib.sha256(pdf).hexdigest())
+    with pytest.raises(ClientError):
+        main._s3_download("uploads/deck.pdf", path, '"stale"')
+    # Like s3transfer, the fake refuses arguments a managed download cannot send
+    with pytest.raises(ValueError):
+        s3.download_fileobj("b", "uploads/deck.pdf", io.BytesIO(), ExtraArgs={"IfMatch": etag})
+
+
+def test_eviction_skips_pinned_documents(monkeypatch, tmp_path, make_pdf):
+    monkeypatch.setattr(documents, "CACHE_DIR", str(tmp_path / "cache"))
+    monkeypatch.setattr(documents, "CACHE_BYTES", 1)
+    upload = tmp_path / "upload.pdf"
+    upload.write_bytes(make_pdf())
+
+    with documents.pinned("a" * 64):
+        stored = documents.put(str(upload), "a" * 64)
+        documents.put(str(upload), "b" * 64)
+        assert os.listdir(documents.CACHE_DIR) == [os.path.basename(stored)]
+    assert not documents.is_pinned("a" * 64)
+    documents.put(str(upload), "b" * 64)
+    assert os.listdir(documents.CACHE_DIR) == []
@@ -0,0 +1,48 @@
+import asyncio
+import contextvars
+import json
+import os
+
+import app
+import executors
+from benchmarks.concurrency import health_under_load
+from benchmarks.corpus import CorpusDoc
+
+_var = contextvars.ContextVar("_var", default="unset")
+
+
+def test_run_io_propagates_context():
+    async def go():
+        _var.set("request-1")
+        return await executors.run_io(_var.get)
+
+    assert asyncio.run(go()) == "request-1"
+
+
+def test_health_stays_responsive_while_rendering():
+    pdf = CorpusDoc("load-6p", "text", 6, "letter").build()
+
+    result = asyncio.run(health_under_load(pdf, concurrent=2))
+
+    assert result["load_status"] == [200, 200]
+    assert result["health_samples"] > 10
+    assert result["max_stall_ms"] < 250
+
+
+def test_lambda_invocations_keep_the_pools(monkeypatch):
+    monkeypatch.setattr(executors, "CPU_POOL_KIND", "thread")
+    with open(os.path.join(os.path.dirname(__file__), "..", "..", "events", "event.json")) as f:
+        event = json.load(f)
+    event["path"] = "/health"
+    pools = executors.cpu_pool(), executors.io_pool()
+    # Mangum runs on the thread's current loop, which an earlier asyncio.run() cleared
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    try:
+        for _ in range(2):
+            assert app.handler(event, None)["statusCode"] == 200
+    finally:
+        asyncio.set_event_loop(None)
+        loop.close()
+
+    assert (executors.cpu_pool(), executors.io_pool()) == pools
@@ -0,0 +1,139 @@
+import json
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+import admission
+import documents
+import jobs
+import main
+from vision import FakeVisionBackend, set_vision_backend
+
+
+@pytest.fixture()
+def client(monkeypatch, tmp_path):
+    monkeypatch.setattr(documents, "CACHE_DIR", str(tmp_path))
+    monkeypatch.setattr(main, "BUCKET_NAME", None)
+    jobs.set_registry(jobs.JobRegistry())
+    set_vision_backend(FakeVisionBackend(latency_ms=0, jitter_ms=0))
+    # The job task runs on the client's event loop, which lives as long as the context
+    with TestClient(main.app) as client:
+        yield client
+    set_vision_backend(None)
+    jobs.set_registry(None)
+
+
+def _wait(client, job_id, until, timeout=20.0):
+    deadline = time.monotonic() + timeout
+    while True:
+        body = client.get(f"/jobs/{job_id}").json()
+        if until(body) or time.monotonic() > deadline:
+            return body
+        time.sleep(0.02)
+
+
+def test_job_publishes_preview_pages_first(client, make_pdf, monkeypatch):
+    order = []
+    publish = jobs.Job.publish
+    monkeypatch.setattr(jobs.Job, "publish", lambda self, result: (order.append(result["page"]), publish(self, result)))
+
+    resp = client.post("/jobs", files={"file": ("deck.pdf", make_pdf(6), "application/pdf")},
+                       data={"preview_pages": "2", "dedupe": "false"})
+    assert resp.status_code == 202
+    created = resp.json()
+
+    body = _wait(client, created["job_id"], lambda b: b["state"] != "running")
+
+    assert body["state"] == "done" and body["preview_ready"]
+    assert [r["page"] for r in body["results"]] == [1, 2, 3, 4, 5, 6]
+    assert sorted(order[:2]) == [1, 2]
+    assert body["results"][0]["image_url"] == f"/documents/{created['digest']}/pages/1"
+    assert client.get(body["results"][0]["image_url"]).status_code == 200
+
+
+def test_job_page_range_and_missing_job(client, make_pdf):
+    created = client.post("/jobs", files={"file": ("deck.pdf", make_pdf(5), "application/pdf")},
+                          data={"pages": "4-5"}).json()
+    body = _wait(client, created["job_id"], lambda b: b["state"] != "running")
+
+    assert created["page_count"] == 2
+    assert [r["page"] for r in body["results"]] == [4, 5]
+    assert client.get("/jobs/unknown").status_code == 404
+
+
+def _sse(text):
+    events = []
+    for block in text.strip().split("\n\n"):
+        fields = dict(line.split(": ", 1) for line in block.splitlines() if not line.startswith(":"))
+        if fields:
+            events.append(json.loads(fields["data"]))
+    return events
+
+
+def test_job_events_stream_page_progress(client, make_pdf):
+    created = client.post("/jobs", files={"file": ("deck.pdf", make_pdf(3), "application/pdf")},
+                          data={"dedupe": "false"}).json()
+
+    with client.stream("GET", f"/jobs/{created['job_id']}/events") as resp:
+        assert resp.headers["content-type"].startswith("text/event-stream")
+        events = _sse(resp.read().decode())
+
+    kinds = [e["type"] for e in events]
+    assert kinds.count("rendered") == 3 and kinds.count("analyzed") == 3
+    assert kinds[-1] == "done"
+    assert [e["seq"] for e in events] == list(range(1, len(events) + 1))
+    assert all(e["ms"] >= 0 for e in events if e["type"] == "rendered")
+
+    # Reconnecting with Last-Event-ID replays only what came after it
+    resumed = client.get(f"/jobs/{created['job_id']}/events", headers={"Last-Event-ID": str(len(events) - 1)})
+    assert [e["type"] for e in _sse(resumed.text)] == ["done"]
+
+
+def test_failed_vision_call_is_reported(client, make_pdf):
+    set_vision_backend(FakeVisionBackend(latency_ms=0, jitter_ms=0, error_rate=1.0))
+    created = client.post("/jobs", files={"file": ("deck.pdf", make_pdf(2), "application/pdf")},
+                          data={"dedupe": "false"}).json()
+
+    events = _sse(client.get(f"/jobs/{created['job_id']}/events").text)
+
+    assert sorted(e["page"] for e in events if e["type"] == "failed") == [1, 2]
+    assert events[-1]["type"] == "done"
+
+
+def test_batch_runs_one_job_per_key(client, s3, make_pdf):
+    for i in range(3):
+        s3.put_object(Bucket="b", Key=f"uploads/deck-{i}.pdf", Body=make_pdf(i + 2))
+
+    keys = [f"uploads/deck-{i}.pdf" for i in range(3)] + ["uploads/missing.pdf"]
+    created = client.post("/batches", json={"payload": {"keys": keys}}).json()
+    assert set(created["jobs"]) == set(keys[:3]) and list(created["errors"]) == ["uploads/missing.pdf"]
+
+    deadline = time.monotonic() + 20
+    while (body := client.get(f"/batches/{created['batch_id']}").json())["state"] == "running":
+        assert time.monotonic() < deadline
+        time.sleep(0.02)
+
+    assert body["page_count"] == body["completed"] == 2 + 3 + 4
+    assert {j["state"] for j in body["jobs"]} == {"done"}
+    assert client.post("/batches", json={"payload": {"keys": []}}).status_code == 400
+
+
+def test_batch_larger_than_render_budget_waits_instead_of_failing(client, s3, make_pdf):
+    keys = [f"uploads/deck-{i}.pdf" for i in range(8)]
+    for i, key in enumerate(keys):
+        s3.put_object(Bucket="b", Key=key, Body=make_pdf(2 + i % 3))
+    # Room for two pages at a time, no queue, and a timeout far below one job's run time
+    budget = admission.render_cost([(612, 792)] * 2, main.RENDER_DPI)
+    admission.set_controller(admission.AdmissionController(budget_mp=budget, queue_seconds=0.001, max_queue=0))
+    try:
+        created = client.post("/batches", json={"payload": {"keys": keys}}).json()
+        deadline = time.monotonic() + 30
+        while (body := client.get(f"/batches/{created['batch_id']}").json())["state"] == "running":
+            assert time.monotonic() < deadline
+            time.sleep(0.02)
+    finally:
+        admission.set_controller(None)
+
+    assert {j["state"] for j in body["jobs"]} == {"done"}
+    assert body["completed"] == body["page_count"]
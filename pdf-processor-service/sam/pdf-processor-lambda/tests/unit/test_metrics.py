@@ -0,0 +1,47 @@
+import fitz
+from fastapi.testclient import TestClient
+
+import main
+import metrics
+from vision import FakeVisionBackend, set_vision_backend
+
+
+def test_histogram_renders_cumulative_buckets():
+    hist = metrics.Histogram("test_seconds", "Test.", ("stage",), buckets=(0.1, 1.0))
+    hist.observe(0.05, stage="a")
+    hist.observe(0.5, stage="a")
+    hist.observe(5.0, stage="a")
+
+    lines = hist.render()
+
+    assert 'test_seconds_bucket{stage="a",le="0.1"} 1' in lines
+    assert 'test_seconds_bucket{stage="a",le="1"} 2' in lines
+    assert 'test_seconds_bucket{stage="a",le="+Inf"} 3' in lines
+    assert 'test_seconds_count{stage="a"} 3' in lines
+
+
+def test_stage_timer_uses_explicit_endpoint():
+    before = metrics.STAGE_SECONDS.count(endpoint="/unit", stage="noop")
+
+    with metrics.stage("noop", endpoint="/unit"):
+        pass
+
+    assert metrics.STAGE_SECONDS.count(endpoint="/unit", stage="noop") == before + 1
+
+
+def test_metrics_endpoint_reports_stages():
+    doc = fitz.open()
+    doc.new_page().insert_text((72, 72), "Hello")
+    set_vision_backend(FakeVisionBackend(latency_ms=0, jitter_ms=0))
+    client = TestClient(main.app)
+    try:
+        client.post("/process-pdf-with-ai", files={"file": ("a.pdf", doc.tobytes(), "application/pdf")})
+    finally:
+        set_vision_backend(None)
+
+    body = client.get("/metrics").text
+
+    for stage in ("fitz_open", "render", "png_encode", "base64", "vision"):
+        assert f'pdf_stage_duration_seconds_count{{endpoint="/process-pdf-with-ai",stage="{stage}"}}' in body
+    assert 'pdf_pages_total{endpoint="/process-pdf-with-ai"}' in body
+    assert 'pdf_vision_tokens_total{endpoint="/process-pdf-with-ai",kind="prompt"}' in body
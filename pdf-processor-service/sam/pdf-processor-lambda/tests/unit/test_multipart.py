@@ -0,0 +1,55 @@
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+import s3_multipart
+
+MiB = 1024 * 1024
+
+
+def test_part_size_recommendation():
+    assert s3_multipart.part_size(200 * MiB) == s3_multipart.PART_BYTES
+    # Past 10,000 parts the size grows, in whole MiB
+    big = s3_multipart.part_size(400 * 1024 * MiB)
+    assert big % MiB == 0 and s3_multipart.part_count(400 * 1024 * MiB, big) <= s3_multipart.MAX_PARTS
+    assert s3_multipart.part_count(1, s3_multipart.PART_BYTES) == 1
+    with pytest.raises(ValueError):
+        s3_multipart.part_size(60 * 1024 * 1024 * MiB)
+
+
+def test_resumed_multipart_upload_is_processed(s3, make_pdf, monkeypatch):
+    monkeypatch.setattr(s3_multipart, "PART_BYTES", 1024)
+    pdf = make_pdf(3)
+    client = TestClient(main.app)
+
+    created = client.post("/multipart-uploads", json={"payload": {"filename": "scan.pdf", "size": len(pdf)}}).json()
+    key, upload_id, size = created["key"], created["upload_id"], created["part_size"]
+    assert key.startswith("uploads/") and created["part_count"] == len(created["parts"]) == -(-len(pdf) // size)
+    assert "op=upload_part" in created["parts"][0]["url"]
+
+    # The client uploads the first part, drops, and asks what is left
+    s3.upload_part(Bucket="b", Key=key, UploadId=upload_id, PartNumber=1, Body=pdf[:size])
+    ids = {"key": key, "upload_id": upload_id}
+    resumed = client.post("/multipart-uploads/parts",
+                          json={"payload": {**ids, "part_numbers": list(range(2, created["part_count"] + 1))}}).json()
+    assert [p["part_number"] for p in resumed["uploaded"]] == [1]
+    for part in resumed["parts"]:
+        n = part["part_number"]
+        s3.upload_part(Bucket="b", Key=key, UploadId=upload_id, PartNumber=n, Body=pdf[(n - 1) * size:n * size])
+
+    done = client.post("/multipart-uploads/complete", json={"payload": ids}).json()
+    assert done["etag"] and s3.objects[key]["Body"] == pdf
+
+    converted = client.post("/convert-from-s3", json={"payload": {"key": key}}).json()
+    assert converted["page_count"] == 3
+
+
+def test_abort_and_unknown_upload(s3):
+    client = TestClient(main.app)
+    created = client.post("/multipart-uploads", json={"payload": {"filename": "scan.pdf", "size": 10 * MiB}}).json()
+    ids = {"key": created["key"], "upload_id": created["upload_id"]}
+
+    assert client.post("/multipart-uploads/abort", json={"payload": ids}).status_code == 200
+    assert not s3.uploads
+    assert client.post("/multipart-uploads/complete", json={"payload": ids}).status_code == 404
+    assert client.post("/multipart-uploads", json={"payload": {"filename": "scan.pdf"}}).status_code == 400
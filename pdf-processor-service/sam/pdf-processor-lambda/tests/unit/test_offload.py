@@ -0,0 +1,40 @@
+import base64
+import json
+
+from fastapi.testclient import TestClient
+
+import main
+import offload
+
+
+def test_inline_estimate_tracks_the_real_body(make_pdf):
+    body = TestClient(main.app).post("/convert-pdf", files={"file": ("a.pdf", make_pdf(3), "application/pdf")}).json()
+    sizes = [len(base64.b64decode(img["image"])) for img in body["images"]]
+
+    estimate = offload.inline_bytes(sizes)
+    actual = len(json.dumps(body))
+    assert actual <= estimate < actual * 1.01
+
+
+def test_large_response_is_offloaded_to_s3(monkeypatch, s3, make_pdf):
+    monkeypatch.setattr(offload, "THRESHOLD_BYTES", 1024)
+
+    body = TestClient(main.app).post("/convert-pdf", files={"file": ("a.pdf", make_pdf(3), "application/pdf")}).json()
+
+    assert body["offloaded"] is True and body["page_count"] == 3
+    assert [img["page"] for img in body["images"]] == [1, 2, 3]
+    assert all("image" not in img and img["url"].startswith("https://") for img in body["images"])
+    assert {img["key"] for img in body["images"]} <= set(s3.objects)
+
+
+def test_offload_falls_back_inline_without_bucket(monkeypatch, make_pdf):
+    monkeypatch.setattr(main, "BUCKET_NAME", None)
+    monkeypatch.setattr(offload, "THRESHOLD_BYTES", 1024)
+    client = TestClient(main.app)
+
+    pdf = make_pdf(3)
+    body = client.post("/convert-pdf", files={"file": ("a.pdf", pdf, "application/pdf")}).json()
+    forced = client.post("/convert-pdf?offload=always", files={"file": ("a.pdf", pdf, "application/pdf")})
+
+    assert body["offloaded"] is False and all(img["image"] for img in body["images"])
+    assert forced.status_code == 500
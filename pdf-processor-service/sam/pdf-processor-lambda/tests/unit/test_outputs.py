@@ -0,0 +1,61 @@
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+import outputs
+import render
+from benchmarks.fakes import FakeS3Client
+
+
+@pytest.fixture()
+def s3(s3, make_pdf):
+    s3.put_object(Bucket="b", Key="uploads/deck.pdf", Body=make_pdf(3))
+    return s3
+
+
+def _convert(pages=None):
+    payload = {"key": "uploads/deck.pdf", **({"pages": pages} if pages else {})}
+    return TestClient(main.app).post("/convert-from-s3", json={"payload": payload}).json()
+
+
+def test_reprocessing_reuses_stored_pages(s3, monkeypatch):
+    first = _convert("1-2")
+    renderer = render.renderer_version()
+    assert first["output_prefix"] == f"outputs/{first['digest']}/default/{renderer}" and first["reused"] == 0
+    page_key = first["images"][0]["key"]
+    assert page_key == f"{first['output_prefix']}/page-1.png"
+    assert s3.objects[page_key]["CacheControl"] == outputs.CACHE_CONTROL
+
+    rendered = []
+    render_pages = main._render_pages
+    monkeypatch.setattr(main, "_render_pages",
+                        lambda path, indices, *a, **kw: (rendered.extend(indices), render_pages(path, indices, *a, **kw))[1])
+    again = _convert()
+
+    assert rendered == [2]  # only the page not stored before
+    assert again["reused"] == 2 and [i["page"] for i in again["images"]] == [1, 2, 3]
+    manifest = outputs.load_manifest(s3, "b", first["digest"], "default", render.renderer_version())
+    assert sorted(manifest) == [1, 2, 3]
+
+
+def test_new_renderer_writes_new_keys(s3, monkeypatch):
+    first = _convert("1")
+    stored = dict(s3.objects[first["images"][0]["key"]])
+    monkeypatch.setattr(render, "renderer_version", lambda: "next")
+
+    again = _convert("1")
+
+    assert again["reused"] == 0
+    assert again["images"][0]["key"] == f"outputs/{first['digest']}/default/next/page-1.png"
+    assert s3.objects[again["images"][0]["key"]]["Metadata"] == {"renderer": "next"}
+    # The old object is left as it was: immutable means never overwritten
+    assert s3.objects[first["images"][0]["key"]] == stored
+
+
+def test_put_page_skips_existing_object():
+    s3 = FakeS3Client()
+    assert outputs.put_page(s3, "b", "outputs/d/default/1.0/page-1.png", b"png", "png", "1.0")
+    uploaded = s3.bytes_in
+
+    assert not outputs.put_page(s3, "b", "outputs/d/default/1.0/page-1.png", b"png", "png", "1.0")
+    assert s3.bytes_in == uploaded
@@ -0,0 +1,46 @@
+import fitz
+from fastapi.testclient import TestClient
+
+import main
+from benchmarks.corpus import CorpusDoc
+
+
+def test_preflight_upload_reports_structure_without_rendering():
+    pdf = CorpusDoc("scanned-2p-a4", "scanned", 2, "a4").build()
+    doc = fitz.open(stream=pdf)
+    doc.insert_pdf(fitz.open(stream=CorpusDoc("text-1p-letter", "text", 1, "letter").build()))
+
+    resp = TestClient(main.app).post("/preflight", files={"file": ("mixed.pdf", doc.tobytes(), "application/pdf")})
+
+    body = resp.json()
+    assert resp.status_code == 200
+    assert body["page_count"] == 3
+    assert body["encrypted"] is False
+    assert body["has_text_layer"] is True
+    assert [p["has_text"] for p in body["pages"]] == [False, False, True]
+    assert body["image_count"] == 2
+    assert (body["pages"][2]["width"], body["pages"][2]["height"]) == (612, 792)
+    # Full-page scans cost more than a text page of similar size
+    assert body["pages"][0]["est_render_ms"] > body["pages"][2]["est_render_ms"]
+
+
+def test_preflight_encrypted_document():
+    doc = fitz.open()
+    doc.new_page()
+    pdf = doc.tobytes(encryption=fitz.PDF_ENCRYPT_AES_256, owner_pw="o", user_pw="u")
+
+    body = TestClient(main.app).post("/preflight", files={"file": ("locked.pdf", pdf, "application/pdf")}).json()
+
+    assert body["encrypted"] is True
+    assert body["needs_password"] is True
+    assert body["pages"] == []
+
+
+def test_preflight_from_s3_key(s3, make_pdf):
+    s3.put_object(Bucket="b", Key="uploads/deck.pdf", Body=make_pdf(10, "slide_16_9"))
+
+    body = TestClient(main.app).post("/preflight", data={"key": "uploads/deck.pdf"}).json()
+
+    assert body["filename"] == "uploads/deck.pdf"
+    assert body["page_count"] == 10
+    assert body["render_cost_mp"] > 0
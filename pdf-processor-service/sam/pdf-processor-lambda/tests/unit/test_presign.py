@@ -0,0 +1,63 @@
+import datetime
+from urllib.parse import parse_qs, urlsplit
+
+import pytest
+from fastapi.testclient import TestClient
+
+import clients
+import main
+import presign
+
+
+@pytest.fixture()
+def production_client(monkeypatch):
+    """The service's own S3 client from clients.py, with static credentials."""
+
+    def make(region, token=None):
+        monkeypatch.setenv("AWS_DEFAULT_REGION", region)
+        monkeypatch.setenv("AWS_ACCESS_KEY_ID", "AKIDEXAMPLE")
+        monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "secret")
+        if token:
+            monkeypatch.setenv("AWS_SESSION_TOKEN", token)
+        else:
+            monkeypatch.delenv("AWS_SESSION_TOKEN", raising=False)
+        clients.set_s3_client(None)
+        return clients.get_s3_client()
+
+    yield make
+    clients.set_s3_client(None)
+
+
+@pytest.mark.parametrize("region,bucket,key,token", [
+    ("us-east-1", "my-bucket", "outputs/ab cd/page-1.png", None),
+    ("eu-west-1", "my.bucket", "outputs/é+x/page~2.jpg", "TOKEN/+="),
+])
+def test_urls_match_botocore(production_client, region, bucket, key, token):
+    client = production_client(region, token)
+    expected = client.generate_presigned_url("get_object", Params={"Bucket": bucket, "Key": key}, ExpiresIn=900)
+    signed_at = datetime.datetime.strptime(parse_qs(urlsplit(expected).query)["X-Amz-Date"][0], "%Y%m%dT%H%M%SZ")
+
+    url = presign.UrlSigner(client).sign(bucket, [key], 900, now=signed_at)[0]
+
+    assert urlsplit(url)[:3] == urlsplit(expected)[:3]
+    assert parse_qs(urlsplit(url).query) == parse_qs(urlsplit(expected).query)
+
+
+def test_signer_is_rebuilt_for_a_new_client(production_client):
+    first, second = production_client("us-east-1"), production_client("us-east-1")
+    assert presign.get_signer(first) is presign.get_signer(first)
+    assert presign.get_signer(second).client is second
+    presign.set_signer(None)
+
+
+def test_presign_batch(s3):
+    client = TestClient(main.app)
+    keys = [f"outputs/d/default/1.0/page-{n}.png" for n in range(1, 301)] + ["uploads/private.pdf"]
+
+    body = client.post("/presign-batch", json={"payload": {"keys": keys, "expires": 600}}).json()
+
+    assert len(body["urls"]) == 300 and list(body["errors"]) == ["uploads/private.pdf"]
+    assert body["urls"][keys[0]].endswith("expires=600")
+    too_many = ["outputs/x"] * (presign.MAX_KEYS + 1)
+    assert client.post("/presign-batch", json={"payload": {"keys": too_many}}).status_code == 400
+    assert client.post("/presign-batch", json={"payload": {"keys": keys[:1], "expires": 0}}).status_code == 400
@@ -0,0 +1,73 @@
+import fitz
+from fastapi.testclient import TestClient
+
+import main
+import render
+from benchmarks.corpus import CorpusDoc
+
+
+def _scan(tmp_path, dpi=150, text=None):
+    doc = fitz.open()
+    page = doc.new_page(width=612, height=792)
+    pix = fitz.Pixmap(fitz.csRGB, fitz.IRect(0, 0, int(612 * dpi / 72), int(792 * dpi / 72)), False)
+    pix.clear_with(200)
+    page.insert_image(page.rect, stream=pix.tobytes("jpeg"))
+    if text:
+        page.insert_text((72, 72), text)
+    path = str(tmp_path / f"scan-{dpi}-{bool(text)}.pdf")
+    doc.save(path)
+    return path
+
+
+def test_embedded_scan_is_served_as_stored(tmp_path):
+    path = _scan(tmp_path)
+    doc = fitz.open(path)
+    stored = doc.extract_image(doc[0].get_images()[0][0])["image"]
+
+    page = render.render_page(path, 0, render.PROFILES["default"])
+
+    assert page.embedded and page.format == "jpeg"
+    assert page.data == stored
+    assert (page.width, page.height) == (1275, 1650)
+
+
+def test_png_profile_and_unsuitable_pages_are_rendered(tmp_path):
+    strict = render.render_page(_scan(tmp_path), 0, render.PROFILES["png"])
+    too_large = render.render_page(_scan(tmp_path, dpi=400), 0, render.PROFILES["default"])
+    with_text = render.render_page(_scan(tmp_path, text="OCR layer"), 0, render.PROFILES["default"])
+
+    for page in (strict, too_large, with_text):
+        assert not page.embedded and page.format == "png"
+        assert (page.width, page.height) == (2550, 3300)
+
+
+def test_convert_pdf_reports_embedded_format():
+    pdf = CorpusDoc("scanned-2p-a4", "scanned", 2, "a4").build()
+
+    body = TestClient(main.app).post("/convert-pdf", files={"file": ("scan.pdf", pdf, "application/pdf")}).json()
+
+    assert [img["format"] for img in body["images"]] == ["jpeg", "jpeg"]
+
+
+def test_document_cache_reuses_and_bounds_open_documents(tmp_path):
+    paths = [_scan(tmp_path, dpi=dpi) for dpi in (100, 110, 120)]
+    cache = render.DocumentCache(max_entries=2)
+    render.set_cache(cache)
+    try:
+        for _ in range(3):
+            render.render_page(paths[0], 0, render.PROFILES["png"])
+        assert (cache.hits, cache.misses) == (2, 1)
+
+        with cache.open(paths[0]) as held:
+            render.page_sizes(paths[1])
+            render.page_sizes(paths[2])
+        # The document in use was kept; the idle least recently used one went
+        assert not held.is_closed
+        assert [key[0] for key in cache._entries] == [paths[0], paths[2]]
+
+        small = render.DocumentCache(max_bytes=1)
+        with small.open(paths[0]):
+            pass
+        assert not small._entries
+    finally:
+        render.set_cache(None)
@@ -0,0 +1,56 @@
+import asyncio
+import time
+
+import pytest
+
+from scheduler import FairScheduler
+
+
+def test_slots_are_granted_round_robin_between_owners():
+    order = []
+
+    async def work(scheduler, owner, i):
+        async with scheduler.slot(owner):
+            order.append(f"{owner}{i}")
+            await asyncio.sleep(0)
+
+    async def main():
+        scheduler = FairScheduler(max_in_flight=1)
+        # "a" queues its whole document before "b" and "c" arrive
+        await asyncio.gather(*(work(scheduler, "a", i) for i in range(4)),
+                             *(work(scheduler, "b", i) for i in range(2)),
+                             *(work(scheduler, "c", i) for i in range(2)))
+        assert scheduler.in_flight == 0 and scheduler.waiting == 0
+
+    asyncio.run(main())
+
+    assert order == ["a0", "a1", "b0", "c0", "a2", "b1", "c1", "a3"]
+
+
+def test_cancelled_waiter_gives_up_its_place():
+    async def main():
+        scheduler = FairScheduler(max_in_flight=1)
+        async with scheduler.slot("a"):
+            waiting = asyncio.ensure_future(scheduler.slot("b").__aenter__())
+            await asyncio.sleep(0)
+            waiting.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await waiting
+        async with scheduler.slot("c"):
+            assert scheduler.in_flight == 1
+        assert scheduler.in_flight == 0 and scheduler.waiting == 0
+
+    asyncio.run(main())
+
+
+def test_rate_limit_spaces_out_calls():
+    async def main():
+        scheduler = FairScheduler(max_in_flight=8, rate_per_second=50)
+        started = time.monotonic()
+        for _ in range(6):
+            async with scheduler.slot("a"):
+                pass
+        return time.monotonic() - started
+
+    # One call is allowed at once, then one every 20 ms
+    assert asyncio.run(main()) >= 0.09
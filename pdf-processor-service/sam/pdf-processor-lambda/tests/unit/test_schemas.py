@@ -0,0 +1,47 @@
+import json
+from pathlib import Path
+
+import schemas
+
+from schemas import ANALYSIS_RESPONSE_FORMAT, SlideAnalysis, SlideExtraction, parse_model
+
+
+def test_response_format_is_strict():
+    schema = ANALYSIS_RESPONSE_FORMAT["json_schema"]["schema"]
+
+    assert ANALYSIS_RESPONSE_FORMAT["json_schema"]["strict"] is True
+    assert schema["additionalProperties"] is False
+    assert set(schema["required"]) == {"title", "key_points", "data_points", "topic", "action_items", "summary"}
+    assert all("default" not in prop for prop in schema["properties"].values())
+
+
+def test_parse_model_direct():
+    text = json.dumps({"title": "Intro", "key_points": ["a"], "data_points": [], "topic": "t", "action_items": [], "summary": "s"})
+
+    obj, diags = parse_model(SlideAnalysis, text)
+
+    assert obj.title == "Intro"
+    assert diags["direct_parse_ok"] is True
+
+
+def test_parse_model_fenced():
+    text = 'Here you go:\n```json\n{"title": "T", "content": "C", "type": "regular", "links": []}\n```'
+
+    obj, diags = parse_model(SlideExtraction, text)
+
+    assert obj.content == "C"
+    assert diags["brace_slice_parse_ok"] is True
+
+
+def test_parse_model_malformed():
+    obj, diags = parse_model(SlideAnalysis, '{"title": ["not", "a", "string"]}')
+
+    assert obj is None
+    assert diags["error"].startswith("title")
+
+
+def test_streamlit_copy_matches():
+    # The repository root's Streamlit importer ships its own copy of this module
+    copy = Path(__file__).resolve().parents[5] / "schemas.py"
+
+    assert copy.read_text() == Path(schemas.__file__).read_text()
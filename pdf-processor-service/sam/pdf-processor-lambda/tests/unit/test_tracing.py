@@ -0,0 +1,41 @@
+from fastapi.testclient import TestClient
+
+import dedup
+import main
+import tracing
+from vision import FakeVisionBackend, set_vision_backend
+
+
+def test_trace_id_from_traceparent():
+    trace = tracing.trace_from_headers({"traceparent": "00-4bf92f3577b34da6a3ce929d0e0e4736-00f067aa0ba902b7-01"})
+
+    assert trace.trace_id == "4bf92f3577b34da6a3ce929d0e0e4736"
+    assert trace.parent_id == "00f067aa0ba902b7"
+
+
+def test_trace_id_from_amzn_header():
+    trace = tracing.trace_from_headers({"x-amzn-trace-id": "Root=1-5759e988-bd862e3fe1be46a994272793;Sampled=1"})
+
+    assert trace.trace_id == "5759e988bd862e3fe1be46a994272793"
+
+
+def test_process_from_s3_debug_reports_slowest_spans(s3, make_pdf):
+    s3.put_object(Bucket="b", Key="uploads/traced.pdf", Body=make_pdf(1))
+    set_vision_backend(FakeVisionBackend(latency_ms=0, jitter_ms=0))
+    dedup.set_store(dedup.AnalysisStore())  # analyses from other tests would skip render and vision
+    try:
+        resp = TestClient(main.app).post(
+            "/process-from-s3",
+            json={"payload": {"key": "uploads/traced.pdf", "debug": True}},
+            headers={"traceparent": "00-4bf92f3577b34da6a3ce929d0e0e4736-00f067aa0ba902b7-01"},
+        )
+    finally:
+        set_vision_backend(None)
+        dedup.set_store(None)
+
+    debug = resp.json()["debug"]
+    assert resp.headers["X-Trace-Id"] == "4bf92f3577b34da6a3ce929d0e0e4736"
+    assert debug["trace_id"] == "4bf92f3577b34da6a3ce929d0e0e4736"
+    names = {span["name"] for span in debug["slowest_spans"]}
+    assert {"s3_get", "fitz_open", "render", "vision"} <= names
+    assert all("page" in span for span in debug["slowest_spans"] if span["name"] == "render")
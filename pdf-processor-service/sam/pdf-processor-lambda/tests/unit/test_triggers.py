@@ -0,0 +1,92 @@
+import json
+import os
+
+import pytest
+
+import app
+import clients
+import deadline
+import main
+import triggers
+from benchmarks.fakes import FakeSQSClient
+from vision import FakeVisionBackend, set_vision_backend
+
+EVENTS = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), "events")
+
+
+def _event(name):
+    with open(os.path.join(EVENTS, name)) as f:
+        return json.load(f)
+
+
+@pytest.fixture()
+def s3(s3, make_pdf):
+    s3.put_object(Bucket="b", Key="uploads/safety briefing.pdf", Body=make_pdf(2))
+    return s3
+
+
+def test_s3_upload_event_is_preflighted_and_rendered(s3):
+    out = app.s3_handler(_event("s3-upload.json"), None)
+
+    # The .txt upload is ignored; the URL-encoded key is decoded
+    assert out == {"processed": ["uploads/safety briefing.pdf"]}
+    result = json.loads(s3.objects["results/safety briefing.json"]["Body"])
+    assert result["preflight"]["page_count"] == 2
+    assert [img["page"] for img in result["convert"]["images"]] == [1, 2]
+    assert all(img["key"] in s3.objects for img in result["convert"]["images"])
+
+
+def test_s3_event_failure_is_raised_for_retry(s3):
+    event = _event("s3-upload.json")
+    event["Records"][0]["s3"]["object"]["key"] = "uploads/gone.pdf"
+
+    with pytest.raises(Exception):
+        app.s3_handler(event, None)
+
+
+def test_sqs_batch_reports_only_retryable_failures(s3):
+    out = app.sqs_handler(_event("sqs-batch.json"), None)
+
+    # The missing object may still arrive, so it is retried; the unknown action is dropped
+    assert out == {"batchItemFailures": [{"itemIdentifier": "2e1424d4-f796-459a-8184-9c92662be6da"}]}
+    assert json.loads(s3.objects["results/safety briefing.json"]["Body"])["page_count"] == 2
+
+
+def test_sqs_message_wrapping_an_s3_notification(s3):
+    event = {"Records": [{"messageId": "m1", "body": json.dumps(_event("s3-upload.json"))}]}
+
+    assert app.sqs_handler(event, None) == {"batchItemFailures": []}
+    assert "results/safety briefing.json" in s3.objects
+
+
+class _LambdaContext:
+    def __init__(self, remaining_ms):
+        self.remaining_ms = remaining_ms
+
+    def get_remaining_time_in_millis(self):
+        return self.remaining_ms
+
+
+def test_analysis_out_of_time_continues_through_the_queue(s3, make_pdf, monkeypatch):
+    s3.put_object(Bucket="b", Key="uploads/long.pdf", Body=make_pdf(6))
+    sqs = FakeSQSClient()
+    monkeypatch.setattr(clients, "_sqs_client", sqs)
+    monkeypatch.setattr(triggers, "WORK_QUEUE_URL", "https://sqs.local/work")
+    monkeypatch.setattr(main, "DEADLINE_CHUNK_PAGES", 2)
+    monkeypatch.setattr(deadline, "MARGIN_SECONDS", 0.0)
+    set_vision_backend(FakeVisionBackend(latency_ms=300, jitter_ms=0))
+    message = {"key": "uploads/long.pdf", "action": "analyze", "dedupe": False}
+    try:
+        app.sqs_handler({"Records": [{"messageId": "m1", "body": json.dumps(message)}]}, _LambdaContext(450))
+        partial = json.loads(s3.objects["results/long.json"]["Body"])
+        follow_up = json.loads(sqs.messages[0])
+        app.sqs_handler({"Records": [{"messageId": "m2", "body": sqs.messages[0]}]}, _LambdaContext(60_000))
+    finally:
+        set_vision_backend(None)
+
+    assert partial["complete"] is False and [r["page"] for r in partial["results"]] == [1, 2]
+    assert follow_up["key"] == "uploads/long.pdf" and follow_up["continuation"] == partial["continuation"]
+    final = json.loads(s3.objects["results/long.json"]["Body"])
+    assert final["complete"] is True and "continuation" not in final
+    assert [r["page"] for r in final["results"]] == [1, 2, 3, 4, 5, 6] and final["page_count"] == 6
+    assert len(sqs.messages) == 1
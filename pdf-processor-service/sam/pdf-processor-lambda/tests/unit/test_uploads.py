@@ -0,0 +1,74 @@
+import asyncio
+import hashlib
+
+from fastapi.testclient import TestClient
+
+import main
+import uploads
+from benchmarks.corpus import CorpusDoc
+
+
+def test_preflight_reports_upload_digest():
+    pdf = CorpusDoc("text-1p-letter", "text", 1, "letter").build()
+
+    body = TestClient(main.app).post("/preflight", files={"file": ("a.pdf", pdf, "application/pdf")}).json()
+
+    assert body["size_bytes"] == len(pdf)
+    assert body["digest"] == hashlib.sha256(pdf).hexdigest()
+
+
+def test_upload_over_limit_is_rejected(monkeypatch):
+    pdf = CorpusDoc("text-5p-tiny", "text", 5, "tiny").build()
+    monkeypatch.setattr(uploads, "MAX_UPLOAD_BYTES", len(pdf) - 1)
+    monkeypatch.setattr(uploads, "CHUNK_BYTES", 256)
+
+    resp = TestClient(main.app).post("/convert-pdf", files={"file": ("a.pdf", pdf, "application/pdf")})
+
+    assert resp.status_code == 413
+
+
+def test_content_length_over_limit_is_rejected_before_parsing(monkeypatch):
+    monkeypatch.setattr(uploads, "MAX_UPLOAD_BYTES", 1024)
+
+    resp = TestClient(main.app).post(
+        "/convert-pdf", files={"file": ("a.pdf", b"%PDF" + b"0" * 200_000, "application/pdf")})
+
+    assert resp.status_code == 413
+
+
+def test_chunked_upload_is_cut_off_while_it_arrives(monkeypatch):
+    monkeypatch.setattr(uploads, "MAX_UPLOAD_BYTES", 1024)
+    chunks = [b"0" * 64 * 1024] * 100
+    read, sent = [], []
+
+    async def receive():
+        read.append(chunks.pop())
+        return {"type": "http.request", "body": read[-1], "more_body": bool(chunks)}
+
+    async def send(message):
+        sent.append(message)
+
+    async def app(scope, receive, send):
+        while (await receive()).get("more_body"):
+            pass
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b""})
+
+    # No Content-Length: the size is only known by counting what arrives
+    scope = {"type": "http", "method": "POST", "headers": [(b"transfer-encoding", b"chunked")]}
+    asyncio.run(uploads.BodyLimit(app)(scope, receive, send))
+
+    assert sent[0]["status"] == 413
+    assert len(read) == 2
+
+
+def test_chunked_upload_over_limit_is_rejected(monkeypatch):
+    monkeypatch.setattr(uploads, "MAX_UPLOAD_BYTES", 1024)
+    head = b'--x\r\nContent-Disposition: form-data; name="file"; filename="a.pdf"\r\n\r\n%PDF'
+
+    resp = TestClient(main.app).post(
+        "/convert-pdf", content=iter([head, b"0" * 200_000, b"\r\n--x--\r\n"]),
+        headers={"Content-Type": "multipart/form-data; boundary=x"})
+
+    assert "content-length" not in resp.request.headers
+    assert resp.status_code == 413
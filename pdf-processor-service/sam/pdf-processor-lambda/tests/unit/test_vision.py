@@ -0,0 +1,121 @@
+from types import SimpleNamespace
+
+import fitz
+import httpx
+import openai
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from schemas import ANALYSIS_RESPONSE_FORMAT, SlideAnalysis
+from vision import (CassetteVisionBackend, FakeVisionBackend, OpenAIVisionBackend, VisionBackend, VisionError,
+                    VisionRateLimited, set_vision_backend)
+
+MESSAGES = [{"role": "user", "content": [{"type": "text", "text": "Analyze"}]}]
+
+
+def _pdf_bytes(pages=2):
+    doc = fitz.open()
+    for i in range(pages):
+        doc.new_page().insert_text((72, 72), f"Slide {i + 1}")
+    data = doc.tobytes()
+    doc.close()
+    return data
+
+
+@pytest.fixture()
+def fake_backend():
+    backend = FakeVisionBackend(latency_ms=0, jitter_ms=0, seed=7)
+    set_vision_backend(backend)
+    yield backend
+    set_vision_backend(None)
+
+
+def test_fake_backend_is_deterministic_and_schema_valid():
+    backend = FakeVisionBackend(latency_ms=0, jitter_ms=0, seed=1)
+
+    first = backend.complete("gpt-4o-mini", MESSAGES, ANALYSIS_RESPONSE_FORMAT)
+    second = backend.complete("gpt-4o-mini", MESSAGES, ANALYSIS_RESPONSE_FORMAT)
+
+    assert first.content == second.content
+    SlideAnalysis.model_validate_json(first.content)
+
+
+def test_fake_backend_rate_limits():
+    backend = FakeVisionBackend(latency_ms=0, jitter_ms=0, rate_limit_rate=1.0)
+
+    with pytest.raises(VisionRateLimited):
+        backend.complete("gpt-4o-mini", MESSAGES, ANALYSIS_RESPONSE_FORMAT)
+
+
+def test_cassette_record_then_replay(tmp_path):
+    path = str(tmp_path / "cassette.jsonl")
+    recorder = CassetteVisionBackend(path, mode="record", inner=FakeVisionBackend(latency_ms=0, jitter_ms=0))
+    recorded = recorder.complete("gpt-4o-mini", MESSAGES, ANALYSIS_RESPONSE_FORMAT)
+
+    replayed = CassetteVisionBackend(path, mode="replay").complete("gpt-4o-mini", MESSAGES, ANALYSIS_RESPONSE_FORMAT)
+
+    assert replayed.content == recorded.content
+
+
+def test_process_pdf_with_ai_uses_backend(fake_backend):
+    client = TestClient(main.app)
+
+    resp = client.post("/process-pdf-with-ai", files={"file": ("deck.pdf", _pdf_bytes(), "application/pdf")})
+
+    assert resp.status_code == 200
+    results = resp.json()["results"]
+    assert [r["page"] for r in results] == [1, 2]
+    assert results[0]["analysis"]["title"].startswith("Synthetic title")
+
+
+class _FlakyCompletions:
+    def __init__(self, errors):
+        self.errors = list(errors)
+        self.calls = 0
+
+    def create(self, **kwargs):
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content="{}"))], usage=None)
+
+
+def _status_error(cls, status, headers=None):
+    response = httpx.Response(status, headers=headers, request=httpx.Request("POST", "https://api.openai.test"))
+    return cls("failed", response=response, body=None)
+
+
+def _openai_backend(errors, max_retries=3):
+    completions = _FlakyCompletions(errors)
+    sleeps = []
+    client = SimpleNamespace(chat=SimpleNamespace(completions=completions))
+    return OpenAIVisionBackend(client, max_retries=max_retries, sleep=sleeps.append), completions, sleeps
+
+
+def test_openai_backend_retries_429_and_5xx():
+    backend, completions, sleeps = _openai_backend([
+        _status_error(openai.RateLimitError, 429, {"retry-after": "2"}),
+        _status_error(openai.InternalServerError, 503),
+    ])
+
+    assert backend.complete("gpt-4o-mini", MESSAGES).content == "{}"
+    assert completions.calls == 3
+    assert sleeps[0] == 2.0 and 0 < sleeps[1] <= 1.0
+
+
+def test_openai_backend_gives_up_after_max_retries():
+    backend, completions, _ = _openai_backend([_status_error(openai.RateLimitError, 429)] * 3, max_retries=2)
+
+    with pytest.raises(VisionRateLimited):
+        backend.complete("gpt-4o-mini", MESSAGES)
+    assert completions.calls == 3
+
+    backend, _, _ = _openai_backend([_status_error(openai.InternalServerError, 500)], max_retries=0)
+    with pytest.raises(VisionError):
+        backend.complete("gpt-4o-mini", MESSAGES)
+
+
+def test_backend_interface_is_abstract():
+    with pytest.raises(TypeError):
+        VisionBackend()
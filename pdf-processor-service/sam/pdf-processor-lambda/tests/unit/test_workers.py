@@ -0,0 +1,59 @@
+import os
+import time
+
+import pytest
+
+import workers
+
+
+@pytest.fixture()
+def make_pool():
+    pools = []
+
+    def make(**kwargs):
+        pools.append(workers.WorkerPool(1, preload=(), **kwargs))
+        return pools[-1]
+
+    yield make
+    for pool in pools:
+        pool.shutdown(wait=False)
+
+
+def test_worker_is_recycled_after_max_pages(make_pool):
+    pool = make_pool(max_pages=2)
+
+    pids = [pool.submit(os.getpid).result() for _ in range(3)]
+
+    assert pids[0] == pids[1] != pids[2]
+    assert pool.recycled == 1 and pool.pids() == [pids[2]]
+
+
+def test_worker_is_recycled_over_memory_limit(make_pool):
+    pool = make_pool(max_rss_bytes=1)
+
+    first, second = pool.submit(os.getpid).result(), pool.submit(os.getpid).result()
+
+    assert first != second and pool.recycled == 2
+
+
+def test_watchdog_kills_hung_worker(make_pool):
+    pool = make_pool(task_timeout=0.5)
+    hung_pid = pool.submit(os.getpid).result()
+
+    started = time.monotonic()
+    with pytest.raises(workers.WorkerTimeout):
+        pool.submit(time.sleep, 30).result()
+
+    assert time.monotonic() - started < 5
+    assert pool.killed == 1
+    assert pool.submit(os.getpid).result() != hung_pid
+
+
+def test_crashed_worker_is_replaced_and_errors_propagate(make_pool):
+    pool = make_pool()
+
+    with pytest.raises(workers.WorkerLost):
+        pool.submit(os._exit, 3).result()
+    with pytest.raises(ValueError):
+        pool.submit(int, "not a number").result()
+    assert pool.submit(sum, [1, 2, 3]).result() == 6
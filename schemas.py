@@ -0,0 +1,114 @@
+"""Structured-output schemas for the vision analysis calls.
+
+The models double as the JSON-schema ``response_format`` sent to OpenAI and as
+the validator for the model's reply, so a well-formed response is parsed in a
+single ``model_validate_json`` pass instead of a chain of string repairs.
+"""
+from typing import Any, Dict, List, Optional, Tuple, Type
+
+from pydantic import BaseModel, ConfigDict, ValidationError
+
+
+class SlideAnalysis(BaseModel):
+    """Per-page analysis returned by /process-pdf-with-ai and /process-from-s3."""
+
+    model_config = ConfigDict(extra="ignore")
+
+    title: str = ""
+    key_points: List[str] = []
+    data_points: List[str] = []
+    topic: str = ""
+    action_items: List[str] = []
+    summary: str = ""
+
+
+class SlideExtraction(BaseModel):
+    """Slide text extraction used by the CMS import (title/content/type/links)."""
+
+    model_config = ConfigDict(extra="ignore")
+
+    title: str = ""
+    content: str = ""
+    type: str = "regular"
+    links: List[str] = []
+
+
+def _strict_schema(model: Type[BaseModel]) -> Dict[str, Any]:
+    """Return the model's JSON schema in the shape strict structured outputs accept:
+    every property required, no extra properties, no defaults or titles."""
+    schema = model.model_json_schema()
+    properties = {}
+    for name, prop in schema["properties"].items():
+        prop = {k: v for k, v in prop.items() if k not in ("title", "default")}
+        if isinstance(prop.get("items"), dict):
+            prop["items"] = {k: v for k, v in prop["items"].items() if k != "title"}
+        properties[name] = prop
+    return {
+        "type": "object",
+        "properties": properties,
+        "required": list(properties),
+        "additionalProperties": False,
+    }
+
+
+def response_format(model: Type[BaseModel]) -> Dict[str, Any]:
+    """Build a strict ``json_schema`` response_format for a chat completion."""
+    return {
+        "type": "json_schema",
+        "json_schema": {
+            "name": model.__name__,
+            "schema": _strict_schema(model),
+            "strict": True,
+        },
+    }
+
+
+ANALYSIS_RESPONSE_FORMAT = response_format(SlideAnalysis)
+EXTRACTION_RESPONSE_FORMAT = response_format(SlideExtraction)
+
+
+def parse_model(model: Type[BaseModel], text: Optional[str]) -> Tuple[Optional[BaseModel], Dict[str, Any]]:
+    """Validate model text into ``model``; return (instance or None, diagnostics).
+
+    The fast path is a direct ``model_validate_json``. If the text carries
+    stray prose or a code fence around the object, the outermost ``{...}`` is
+    validated once more before giving up.
+    """
+    diags: Dict[str, Any] = {"direct_parse_ok": False, "brace_slice_parse_ok": False, "error": None}
+    if not text:
+        diags["error"] = "empty response"
+        return None, diags
+    try:
+        obj = model.model_validate_json(text)
+        diags["direct_parse_ok"] = True
+        return obj, diags
+    except ValidationError as e:
+        diags["error"] = _short_error(e)
+    first = text.find("{")
+    last = text.rfind("}")
+    if first != -1 and last > first and (first, last) != (0, len(text) - 1):
+        try:
+            obj = model.model_validate_json(text[first:last + 1])
+            diags["brace_slice_parse_ok"] = True
+            return obj, diags
+        except ValidationError as e:
+            diags["error"] = _short_error(e)
+    return None, diags
+
+
+def _short_error(e: ValidationError) -> str:
+    err = e.errors()[0]
+    loc = ".".join(str(p) for p in err.get("loc", ())) or "<root>"
+    return f"{loc}: {err.get('msg')}"
+
+
+def reask_message(error: Optional[str]) -> Dict[str, Any]:
+    """Follow-up user turn asking the model to repair a malformed reply."""
+    return {
+        "role": "user",
+        "content": (
+            "Your previous reply was not valid JSON for the required schema "
+            f"({error}). Reply again with only the JSON object."
+        ),
+    }
+